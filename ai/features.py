@@ -0,0 +1,39 @@
+import re
+import zlib
+import numpy as np
+
+DIM = 2048
+NGRAM_RANGE = (3, 5)
+
+_GUID_RE = re.compile(r"\{?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\}?")
+_HEX_RE = re.compile(r"\b(0x)?[0-9a-f]{16,}\b")
+_NUM_RE = re.compile(r"\d+")
+_WS_RE = re.compile(r"\s+")
+
+
+def canonical_text(text: str) -> str:
+    """Lower-cases and masks GUIDs, long hex strings and numbers so they don't dominate similarity."""
+    text = _WS_RE.sub(" ", text.strip().lower())
+    text = _GUID_RE.sub("<guid>", text)
+    text = _HEX_RE.sub("<hex>", text)
+    return _NUM_RE.sub("0", text)
+
+
+def hashed_ngrams(text: str, dim: int = DIM, ngram_range=NGRAM_RANGE) -> np.ndarray:
+    """
+    L2-normalized bag of hashed character n-grams plus whole words.
+    crc32 is used instead of hash() so vectors are stable across runs.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    text = canonical_text(text)
+    padded = f" {text} "
+    lo, hi = ngram_range
+    for n in range(lo, hi + 1):
+        for i in range(len(padded) - n + 1):
+            vec[zlib.crc32(padded[i:i + n].encode()) % dim] += 1.0
+    for word in text.split():
+        vec[zlib.crc32(b"w:" + word.encode()) % dim] += 1.0
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
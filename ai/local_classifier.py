@@ -0,0 +1,280 @@
+"""
+CPU-only verdict classifier trained from past LLM verdicts.
+
+Hashed character n-gram features (ai.features) feed a logistic regression
+trained in NumPy. At runtime it answers in microseconds and only confident
+predictions are used; everything else still goes to Mistral.
+
+    python -m ai.local_classifier train [--ai-log PATH] [--guardrail-log PATH] [--out PATH]
+    python -m ai.local_classifier evaluate [--model PATH] [--ai-log PATH] [--guardrail-log PATH]
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+from datetime import datetime
+import numpy as np
+from utils.logger import log_event
+from ai.features import hashed_ngrams, DIM, NGRAM_RANGE
+from ai.verdict_cache import normalize_prompt, prompt_source
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+MODEL_PATH = os.path.join(ROOT, 'models', 'local_classifier.npz')
+DEFAULT_AI_LOG = os.path.join(ROOT, 'logs', 'ai_interactions.log')
+DEFAULT_GUARDRAIL_LOG = os.path.join(ROOT, 'logs', 'guardrail_log.txt')
+
+MODEL_VERSION = 1
+CONFIDENCE = 0.95   # below this the event is forwarded to the LLM
+
+_LOG_LINE_RE = re.compile(r"^\[(?P<ts>[^\]]+)\] \[(?P<type>[A-Z_]+)\] (?P<detail>.*)$")
+# Fallback verdicts produced on errors carry no signal and must not be learned.
+# Streamed verdicts ("streamed": True) do: only their reason is a placeholder.
+_FALLBACK_MARKERS = ("Treated as safe.", "assumed safe.")
+# The prompt sources load_dataset learns from; other events always go to the LLM.
+SOURCES = frozenset({"CMD", "PROCESS_CREATION", "SHORT_LIVED"})
+
+
+def _is_model_verdict(verdict) -> bool:
+    """Only verdicts the LLM wrote: not rules, fallbacks, semantic reuses or this classifier's own output."""
+    if not isinstance(verdict, dict) or not isinstance(verdict.get("DANGEROUS"), bool):
+        return False
+    if "rule" in verdict or verdict.get("local_model") or verdict.get("reused"):
+        return False
+    return not str(verdict.get("reason", "")).endswith(_FALLBACK_MARKERS)
+
+
+def _prompt_from_interaction(entry: dict) -> str:
+    if entry.get("prompt"):
+        return entry["prompt"]
+    # Entries written before the prompt was logged: rebuild it the way process_monitor does.
+    info = entry.get("process_info", {})
+    to_ai = f"NewProcess Name: {info.get('name', 'Unknown')} PID: {info.get('pid', 0)}"
+    if entry.get("type") == "SHORT_LIVED_ANALYSIS":
+        return f"SHORT_LIVED from {info.get('parent_name', 'Unknown')}: {to_ai}"
+    return f"PROCESS_CREATION: {to_ai}"
+
+
+def load_ai_interactions(path: str):
+    """Yields (prompt, label) from process_monitor's ai_interactions.log."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            verdict = entry.get("ai_response")
+            if _is_model_verdict(verdict):
+                yield _prompt_from_interaction(entry), int(verdict["DANGEROUS"])
+
+
+def load_guardrail_commands(path: str):
+    """
+    Yields (prompt, label) from the CMD_AI_RESPONSE entries of guardrail_log.txt.
+    CMD_SAFE / CMD_FLAGGED are not used: they are also written for rule
+    verdicts and for commands let through while the model was unavailable.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            m = _LOG_LINE_RE.match(line.rstrip("\n"))
+            if not m:
+                continue
+            kind, detail = m.group("type"), m.group("detail")
+            if kind == "CMD_AI_RESPONSE" and " | AI: " in detail:
+                command, raw = detail.rsplit(" | AI: ", 1)
+                try:
+                    verdict = ast.literal_eval(raw)
+                except (ValueError, SyntaxError):
+                    continue
+                if _is_model_verdict(verdict):
+                    yield f"CMD: {command}", int(verdict["DANGEROUS"])
+
+
+def load_dataset(ai_log: str, guardrail_log: str):
+    """Deduplicated by normalized prompt; the most recent label wins."""
+    labels = {}
+    prompts = {}
+    for source in (load_ai_interactions(ai_log), load_guardrail_commands(guardrail_log)):
+        for prompt, label in source:
+            key = normalize_prompt(prompt)
+            labels[key] = label
+            prompts[key] = prompt
+    keys = sorted(labels)
+    return [prompts[k] for k in keys], np.array([labels[k] for k in keys], dtype=np.float32)
+
+
+def featurize(prompts) -> np.ndarray:
+    X = np.zeros((len(prompts), DIM), dtype=np.float32)
+    for i, p in enumerate(prompts):
+        X[i] = hashed_ngrams(p)
+    return X
+
+
+class LocalClassifier:
+    def __init__(self, weights: np.ndarray, bias: float, meta: dict = None):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.meta = meta or {}
+
+    @classmethod
+    def train(cls, X: np.ndarray, y: np.ndarray, epochs: int = 500, lr: float = 4.0, l2: float = 1e-4):
+        """Full-batch gradient descent on class-balanced logistic loss."""
+        n, dim = X.shape
+        w = np.zeros(dim, dtype=np.float32)
+        b = 0.0
+        pos = max(float(y.sum()), 1.0)
+        neg = max(float(n - y.sum()), 1.0)
+        sample_w = np.where(y > 0, n / (2 * pos), n / (2 * neg)).astype(np.float32)
+        for _ in range(epochs):
+            p = _sigmoid(X @ w + b)
+            g = (p - y) * sample_w
+            w -= lr * (X.T @ g / n + l2 * w)
+            b -= lr * float(g.mean())
+        return cls(w, b, {"epochs": epochs, "lr": lr, "l2": l2})
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _sigmoid(X @ self.weights + self.bias)
+
+    def probability(self, prompt: str) -> float:
+        return float(_sigmoid(float(hashed_ngrams(prompt) @ self.weights) + self.bias))
+
+    def classify(self, prompt: str, confidence: float = CONFIDENCE):
+        """Returns a verdict dict when confident enough, otherwise None (always for sources it never saw)."""
+        if prompt_source(prompt) not in SOURCES:
+            return None
+        p = self.probability(prompt)
+        if max(p, 1.0 - p) < confidence:
+            return None
+        return {
+            "DANGEROUS": p >= 0.5,
+            "reason": f"[local model p={p:.2f}] Matches previously {'flagged' if p >= 0.5 else 'safe'} events.",
+            "local_model": True,
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = dict(self.meta, version=MODEL_VERSION, dim=DIM, ngram_range=list(NGRAM_RANGE))
+        # np.savez appends .npz unless the name already ends with it.
+        np.savez(path, weights=self.weights, bias=np.array([self.bias], dtype=np.float32),
+                 meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != MODEL_VERSION or meta.get("dim") != DIM \
+                    or tuple(meta.get("ngram_range", ())) != tuple(NGRAM_RANGE):
+                raise ValueError(f"Incompatible classifier model {path}: {meta}")
+            return cls(data["weights"], float(data["bias"][0]), meta)
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def evaluate(model: LocalClassifier, X: np.ndarray, y: np.ndarray, confidence: float = CONFIDENCE) -> dict:
+    p = model.predict_proba(X)
+    pred = (p >= 0.5).astype(np.float32)
+    tp = int(((pred == 1) & (y == 1)).sum())
+    tn = int(((pred == 0) & (y == 0)).sum())
+    fp = int(((pred == 1) & (y == 0)).sum())
+    fn = int(((pred == 0) & (y == 1)).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    confident = np.maximum(p, 1 - p) >= confidence
+    covered = int(confident.sum())
+    return {
+        "samples": int(len(y)),
+        "dangerous": int(y.sum()),
+        "accuracy": (tp + tn) / len(y) if len(y) else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "confusion": {"tp": tp, "tn": tn, "fp": fp, "fn": fn},
+        "confidence_threshold": confidence,
+        # Share of events the classifier would decide without the LLM, and how often it agrees there.
+        "coverage": covered / len(y) if len(y) else 0.0,
+        "accuracy_when_confident": float((pred[confident] == y[confident]).mean()) if covered else 0.0,
+        "missed_dangerous_when_confident": int(((pred == 0) & (y == 1) & confident).sum()),
+    }
+
+
+def _split(n: int, holdout: float, seed: int):
+    idx = np.random.default_rng(seed).permutation(n)
+    cut = int(n * (1 - holdout))
+    return idx[:cut], idx[cut:]
+
+
+def _print_report(title: str, report: dict):
+    print(f"== {title}")
+    for k, v in report.items():
+        print(f"  {k:32} {v:.4f}" if isinstance(v, float) else f"  {k:32} {v}")
+
+
+def _cmd_train(args):
+    prompts, y = load_dataset(args.ai_log, args.guardrail_log)
+    if len(prompts) < 10 or y.sum() == 0 or y.sum() == len(y):
+        print(f"Not enough labelled data to train ({len(prompts)} samples, {int(y.sum())} dangerous).")
+        return 1
+    X = featurize(prompts)
+    train_idx, test_idx = _split(len(y), args.holdout, args.seed)
+    model = LocalClassifier.train(X[train_idx], y[train_idx], args.epochs, args.lr, args.l2)
+    report = evaluate(model, X[test_idx], y[test_idx], args.confidence)
+    _print_report(f"held-out LLM verdicts ({len(test_idx)} of {len(y)})", report)
+
+    # Ship a model trained on everything; the report above is the held-out estimate.
+    model = LocalClassifier.train(X, y, args.epochs, args.lr, args.l2)
+    model.meta.update(trained_at=datetime.utcnow().isoformat(), samples=int(len(y)), holdout_report=report)
+    model.save(args.out)
+    print(f"Model written to {args.out}")
+    return 0
+
+
+def _cmd_evaluate(args):
+    model = LocalClassifier.load(args.model)
+    prompts, y = load_dataset(args.ai_log, args.guardrail_log)
+    if not prompts:
+        print("No labelled data found.")
+        return 1
+    _print_report(f"{args.model} on {len(y)} logged LLM verdicts", evaluate(model, featurize(prompts), y, args.confidence))
+    return 0
+
+
+def load_default():
+    """The runtime model, or None if none has been trained yet."""
+    if not os.path.exists(MODEL_PATH):
+        return None
+    try:
+        return LocalClassifier.load(MODEL_PATH)
+    except Exception as e:
+        log_event("LOCAL_MODEL_LOAD_ERROR", str(e))
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("train", "evaluate"):
+        p = sub.add_parser(name)
+        p.add_argument("--ai-log", default=DEFAULT_AI_LOG)
+        p.add_argument("--guardrail-log", default=DEFAULT_GUARDRAIL_LOG)
+        p.add_argument("--confidence", type=float, default=CONFIDENCE)
+    train = sub.choices["train"]
+    train.add_argument("--out", default=MODEL_PATH)
+    train.add_argument("--holdout", type=float, default=0.2)
+    train.add_argument("--epochs", type=int, default=500)
+    train.add_argument("--lr", type=float, default=4.0)
+    train.add_argument("--l2", type=float, default=1e-4)
+    train.add_argument("--seed", type=int, default=0)
+    sub.choices["evaluate"].add_argument("--model", default=MODEL_PATH)
+    args = ap.parse_args(argv)
+    return _cmd_train(args) if args.command == "train" else _cmd_evaluate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
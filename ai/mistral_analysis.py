@@ -1,31 +1,173 @@
-import threading
+import collections
 import json
-import ollama
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from utils.logger import log_event
+from utils.metrics import metrics
+from utils.tracing import span, current as current_trace
+from ai.verdict_cache import verdict_cache, prompt_source
+from ai.scheduler import (scheduler, priority_for_source, PRIORITY_DEADLINES, PRIORITY_INTERACTIVE,
+                          StaleRequestError, stop_requested)
+from ai.model_client import model_client
+from ai.semantic_index import semantic_index
+from ai.local_classifier import load_default as _load_local_classifier
+
+_DANGEROUS_RE = re.compile(r'"DANGEROUS"\s*:\s*(true|false)', re.IGNORECASE)
+_REASON_RE = re.compile(r'"reason"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _build_prompt(prompt: str) -> str:
+    return (
+        "You are a security monitoring AI. Carefully analyze the following command.\n"
+        "Respond ONLY in this strict JSON format:\n"
+        '{ "DANGEROUS": true/false, "reason": "Short explanation of the risk or why it is safe." }\n\n'
+        "Command:\n" + prompt
+    )
 
-_lock = threading.Lock()
 
-def analyze_text(prompt: str) -> dict:
+# Optional; trained offline with `python -m ai.local_classifier train`.
+local_classifier = _load_local_classifier()
+
+_UNAVAILABLE = {
+    "DANGEROUS": False,
+    "reason": "AI service unavailable. Treated as safe."
+}
+
+# Speculative analyses of input that is still being typed; see speculate().
+SPECULATION_DEADLINE = 10.0
+_speculations = {}      # prompt → (Future, stop Event), while in flight
+_speculation_lock = threading.Lock()
+# Speculative verdicts stay out of the semantic index until the same prompt is
+# submitted: a verdict for "del C:\Users\me\Doc" must not answer "del C:\Users\me\*".
+MAX_UNINDEXED = 256
+_unindexed = collections.OrderedDict()    # prompt → speculative verdict
+
+
+def _await_speculation(prompt: str, timeout: float):
+    """The verdict of an in-flight speculative analysis of `prompt`, or None."""
+    with _speculation_lock:
+        entry = _speculations.get(prompt)
+    if entry is None:
+        return None
     try:
-        full_prompt = (
-            "You are a security monitoring AI. Carefully analyze the following command.\n"
-            "Respond ONLY in this strict JSON format:\n"
-            '{ "DANGEROUS": true/false, "reason": "Short explanation of the risk or why it is safe." }\n\n'
-            "Command:\n" + prompt
-        )
+        return entry[0].result(timeout=timeout)
+    except Exception:
+        return None
+
+
+def _index_submitted(prompt: str, verdict: dict):
+    """Indexes a speculative verdict once `prompt` turns out to be the submitted input."""
+    with _speculation_lock:
+        if _unindexed.pop(prompt, None) is None:
+            return
+    semantic_index.add(prompt, verdict)
+
+
+TIERS = ("cache", "speculation", "semantic", "local", "model", "unavailable", "stale", "error")
+
+
+class _SourceMetrics:
+    """One source's stage histograms and per-tier verdict counters, so a call does one lookup."""
+    __slots__ = ("cache", "inference", "verdicts")
+
+    def __init__(self, source: str):
+        self.cache = metrics.histogram("guardrail_stage_seconds", stage="cache", source=source)
+        self.inference = metrics.histogram("guardrail_stage_seconds", stage="inference", source=source)
+        self.verdicts = {tier: metrics.counter("guardrail_verdicts_total", source=source, tier=tier)
+                         for tier in TIERS}
+
+
+_by_source = {}   # source → _SourceMetrics
 
-        with _lock:
-            response = ollama.chat(
-                model="mistral:7b-instruct-q4_K_M",  # Or your actual model tag
-                messages=[{"role": "user", "content": full_prompt}]
-            )
+
+def _source_metrics(source: str) -> _SourceMetrics:
+    stats = _by_source.get(source)
+    if stats is None:
+        stats = _by_source[source] = _SourceMetrics(source)
+    return stats
+
+
+def _counted(stats: _SourceMetrics, tier: str, verdict: dict) -> dict:
+    stats.verdicts[tier].inc()
+    return verdict
+
+
+def _answer_without_model(prompt: str, stats: _SourceMetrics):
+    """(verdict, tier) from the cheapest tier that has one, or (None, None); see _lookup_tiers."""
+    started = time.perf_counter()
+    try:
+        with span("cache"):
+            return _lookup_tiers(prompt)
+    finally:
+        stats.cache.observe(time.perf_counter() - started)
+
+
+def _chat(messages, stream: bool = False):
+    with span("ollama.chat"):
+        return model_client.chat(messages, stream=stream)
+
+
+def _lookup_tiers(prompt: str):
+    cached = verdict_cache.get(prompt)
+    if cached is not None:
+        if _unindexed:
+            _index_submitted(prompt, cached)
+        return cached, "cache"
+    # Typed-ahead input may already be on its way through the model.
+    speculated = _await_speculation(prompt, SPECULATION_DEADLINE)
+    if speculated is not None:
+        _index_submitted(prompt, speculated)
+        return speculated, "speculation"
+    # Near-duplicates (same command, different arguments) reuse an earlier verdict.
+    reused = semantic_index.lookup(prompt)
+    if reused is not None:
+        return reused, "semantic"
+    # Confident local predictions skip the LLM; low-confidence ones fall through.
+    if local_classifier is not None:
+        local = local_classifier.classify(prompt)
+        if local is not None:
+            return local, "local"
+    return None, None
+
+
+def analyze_text(prompt: str, priority: int = None) -> dict:
+    source = prompt_source(prompt)
+    stats = _source_metrics(source)
+    verdict, tier = _answer_without_model(prompt, stats)
+    if verdict is not None:
+        return _counted(stats, tier, verdict)
+
+    # Fail fast while the model server is known to be down.
+    if not model_client.breaker.allow():
+        return _counted(stats, "unavailable", dict(_UNAVAILABLE))
+
+    content = ""
+    try:
+        full_prompt = _build_prompt(prompt)
+
+        if priority is None:
+            priority = priority_for_source(source)
+
+        started = time.perf_counter()
+        response = scheduler.run(
+            lambda: _chat([{"role": "user", "content": full_prompt}]),
+            priority=priority
+        )
+        stats.inference.observe(time.perf_counter() - started)
+        model_client.breaker.record_success()
 
         content = response.get("message", {}).get("content", "").strip()
 
         # Parse AI response strictly as JSON
-        parsed = json.loads(content)
+        with span("json.parse"):
+            parsed = json.loads(content)
         if isinstance(parsed, dict) and "DANGEROUS" in parsed and "reason" in parsed:
-            return parsed
+            # Only genuine model verdicts are cached, never the fallbacks below.
+            verdict_cache.put(prompt, parsed)
+            semantic_index.add(prompt, parsed)
+            return _counted(stats, "model", parsed)
         else:
             log_event("AI_BAD_RESPONSE", f"Unexpected format: {content}")
             return {
@@ -40,9 +182,227 @@ def analyze_text(prompt: str) -> dict:
             "reason": "Malformed AI response. Treated as safe."
         }
 
+    except StaleRequestError as e:
+        log_event("AI_STALE", f"Dropped stale analysis ({e}): {prompt}")
+        stats.verdicts["stale"].inc()
+        return {
+            "DANGEROUS": False,
+            "reason": "AI analysis timed out in queue. Treated as safe."
+        }
+
     except Exception as e:
+        model_client.breaker.record_failure()
         log_event("AI_ERROR", f"Ollama exception: {e}")
+        stats.verdicts["error"].inc()
         return {
             "DANGEROUS": False,
             "reason": "AI error. Command assumed safe."
         }
+
+
+class _StreamingVerdictParser:
+    """
+    Incrementally scans streamed model output for the DANGEROUS flag and the
+    reason string, without waiting for the closing brace.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.dangerous = None
+        self.reason = None
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        if self.dangerous is None:
+            m = _DANGEROUS_RE.search(self.text)
+            if m:
+                self.dangerous = m.group(1).lower() == "true"
+        if self.reason is None:
+            m = _REASON_RE.search(self.text)
+            if m:
+                try:
+                    self.reason = json.loads('"' + m.group(1) + '"')
+                except json.JSONDecodeError:
+                    self.reason = m.group(1)
+
+
+def analyze_text_streaming(prompt: str, on_reason=None, priority: int = None) -> dict:
+    """
+    Streaming variant of analyze_text. Returns as soon as the DANGEROUS token
+    has been generated instead of waiting for the whole completion.
+
+    - Safe verdicts close the stream immediately; their reason is dropped and
+      the verdict is marked "streamed": True (its reason is a placeholder).
+    - Dangerous verdicts are returned with "provisional": True and the stream
+      keeps running in the scheduler slot until the reason is complete, then
+      `on_reason(final_verdict)` is called (if given) and the verdict is cached.
+    """
+    source = prompt_source(prompt)
+    stats = _source_metrics(source)
+    verdict, tier = _answer_without_model(prompt, stats)
+    if verdict is not None:
+        return _counted(stats, tier, verdict)
+    if not model_client.breaker.allow():
+        return _counted(stats, "unavailable", dict(_UNAVAILABLE))
+
+    if priority is None:
+        priority = priority_for_source(source)
+    timeout = PRIORITY_DEADLINES.get(priority, 60.0)
+    provisional = Future()
+
+    def _stream():
+        parser = _StreamingVerdictParser()
+        trace = current_trace()
+        opened = time.perf_counter()
+        stream = model_client.chat([{"role": "user", "content": _build_prompt(prompt)}], stream=True)
+        try:
+            for chunk in stream:
+                if stop_requested():
+                    # Superseded (e.g. timed out): free the slot now instead of when the model finishes.
+                    return
+                if not parser.text:
+                    model_client.breaker.record_success()
+                parser.feed(chunk.get("message", {}).get("content", ""))
+                if parser.dangerous is not None and not provisional.done():
+                    if trace is not None:
+                        trace.add("ollama.verdict", opened, time.perf_counter())
+                    if not parser.dangerous:
+                        verdict = {"DANGEROUS": False, "reason": parser.reason or "Streamed verdict: safe.", "streamed": True}
+                        provisional.set_result(verdict)
+                        verdict_cache.put(prompt, verdict)
+                        semantic_index.add(prompt, verdict)
+                        return
+                    provisional.set_result({"DANGEROUS": True, "reason": parser.reason or "Flagged by AI; explanation pending (see log).",
+                                             "provisional": True, "streamed": True})
+                if parser.dangerous is not None and parser.reason is not None:
+                    break
+        finally:
+            # Closing the generator closes the HTTP response, which stops generation server-side.
+            stream.close()
+            if trace is not None:
+                trace.add("ollama.stream", opened, time.perf_counter())
+
+        if parser.dangerous is None:
+            log_event("AI_JSON_FAIL", f"No DANGEROUS flag in streamed response: {parser.text.strip()}")
+            provisional.set_result({"DANGEROUS": False, "reason": "Malformed AI response. Treated as safe."})
+            return
+
+        final = {"DANGEROUS": True, "reason": parser.reason or "No reason provided."}
+        verdict_cache.put(prompt, final)
+        semantic_index.add(prompt, final)
+        if on_reason is not None:
+            try:
+                on_reason(final)
+            except Exception as e:
+                log_event("AI_REASON_CALLBACK_ERROR", str(e))
+
+    job = scheduler.submit(_stream, priority, time.monotonic() + timeout)
+
+    def _propagate_failure(f):
+        if not provisional.done():
+            exc = f.exception() if not f.cancelled() else StaleRequestError("Cancelled")
+            provisional.set_exception(exc or RuntimeError("Stream ended without a verdict"))
+
+    job.add_done_callback(_propagate_failure)
+
+    started = time.perf_counter()
+    try:
+        verdict = provisional.result(timeout=timeout)
+        stats.inference.observe(time.perf_counter() - started)
+        return _counted(stats, "model", verdict)
+    except (FutureTimeout, StaleRequestError) as e:
+        job.cancel()
+        log_event("AI_STALE", f"Dropped stale streaming analysis ({e or 'timeout'}): {prompt}")
+        stats.verdicts["stale"].inc()
+        return {
+            "DANGEROUS": False,
+            "reason": "AI analysis timed out in queue. Treated as safe."
+        }
+    except Exception as e:
+        model_client.breaker.record_failure()
+        log_event("AI_ERROR", f"Ollama streaming exception: {e}")
+        stats.verdicts["error"].inc()
+        return {
+            "DANGEROUS": False,
+            "reason": "AI error. Command assumed safe."
+        }
+
+
+def speculate(prompt: str) -> Future:
+    """
+    Starts analysing `prompt` ahead of time, e.g. a command that is still
+    being typed. The verdict lands in the verdict cache, and analyze_text /
+    analyze_text_streaming for the same prompt wait for the in-flight request
+    instead of asking the model again. Resolves to the verdict, or None if
+    the speculation was cancelled or failed.
+    """
+    done = Future()
+    cached = verdict_cache.get(prompt)
+    if cached is not None:
+        done.set_result(cached)
+        return done
+    with _speculation_lock:
+        entry = _speculations.get(prompt)
+        if entry is not None:
+            return entry[0]
+        if not model_client.breaker.allow():
+            done.set_result(None)
+            return done
+        stop = threading.Event()
+        future = scheduler.submit(lambda: _speculative_verdict(prompt, stop), PRIORITY_INTERACTIVE,
+                                  time.monotonic() + SPECULATION_DEADLINE)
+        _speculations[prompt] = (future, stop)
+
+    def _forget(f):
+        with _speculation_lock:
+            if _speculations.get(prompt, (None,))[0] is f:
+                del _speculations[prompt]
+
+    future.add_done_callback(_forget)
+    return future
+
+
+def cancel_speculation(prompt: str):
+    """Drops a speculative analysis: unqueued if it hasn't started, its stream closed if it has."""
+    with _speculation_lock:
+        entry = _speculations.pop(prompt, None)
+    if entry is not None:
+        future, stop = entry
+        stop.set()
+        future.cancel()
+
+
+def _speculative_verdict(prompt: str, stop: threading.Event):
+    if stop.is_set():
+        return None
+    parser = _StreamingVerdictParser()
+    try:
+        stream = model_client.chat([{"role": "user", "content": _build_prompt(prompt)}], stream=True)
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    return None
+                if not parser.text:
+                    model_client.breaker.record_success()
+                parser.feed(chunk.get("message", {}).get("content", ""))
+                # Safe verdicts are done at the flag; dangerous ones need their reason.
+                if parser.dangerous is False or (parser.dangerous and parser.reason is not None):
+                    break
+        finally:
+            stream.close()
+    except Exception as e:
+        model_client.breaker.record_failure()
+        log_event("AI_SPECULATION_ERROR", f"{e}: {prompt}")
+        return None
+    if parser.dangerous is None:
+        return None
+    verdict = {"DANGEROUS": parser.dangerous,
+               "reason": parser.reason or ("Streamed verdict: safe." if not parser.dangerous else "No reason provided.")}
+    if not parser.dangerous:
+        verdict["streamed"] = True
+    verdict_cache.put(prompt, verdict)
+    with _speculation_lock:
+        _unindexed[prompt] = verdict
+        while len(_unindexed) > MAX_UNINDEXED:
+            _unindexed.popitem(last=False)
+    return verdict
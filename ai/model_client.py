@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from utils.logger import log_event
+from ai.scheduler import MAX_IN_FLIGHT
+
+MODEL = "mistral:7b-instruct-q4_K_M"  # Or your actual model tag
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST")  # None → ollama's default (localhost:11434)
+KEEP_ALIVE = "30m"        # keep the model resident between events
+REQUEST_TIMEOUT = 120.0
+PROBE_TIMEOUT = 3.0
+
+FAILURE_THRESHOLD = 3     # consecutive failures before the breaker opens
+RESET_TIMEOUT = 15.0      # seconds the breaker stays open before a probe is allowed
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. While open, callers fail fast instead of
+    queueing inferences against a dead server; after RESET_TIMEOUT a single
+    health probe decides whether to close it again.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        True if the caller may try the server. Half-open lets one trial
+        through and refuses the rest until its record_success/record_failure;
+        a trial that never reports back (dropped as stale, cancelled) is
+        replaced by another after reset_timeout.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == STATE_OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = STATE_HALF_OPEN
+            elif now - self.trial_at < self.reset_timeout:
+                return False
+            self.trial_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                log_event("AI_CIRCUIT_CLOSED", "Model server healthy again.")
+            self.state = STATE_CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    log_event("AI_CIRCUIT_OPEN", f"Model server failing ({self.failures} errors); pausing AI calls.")
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+
+
+class ModelClient:
+    """
+    One process-wide Ollama client shared by every monitor: pooled keep-alive
+    HTTP connections, model preloading and a cheap health probe. The HTTP
+    clients are created on first use: importing ollama alone takes a few
+    hundred milliseconds, which startup shouldn't wait for.
+    """
+
+    def __init__(self, host: str = OLLAMA_HOST, model: str = MODEL):
+        self.host = host
+        self.model = model
+        self._client = None
+        self._probe_client = None
+        self._connect_lock = threading.Lock()
+        self.breaker = CircuitBreaker()
+        self._probe_lock = threading.Lock()
+        self._last_probe = 0.0
+        self._last_probe_ok = False
+
+    def _connect(self):
+        import httpx
+        import ollama
+        with self._connect_lock:
+            if self._client is not None:
+                return
+            # Separate short-timeout client so a probe never hangs behind a slow inference.
+            self._probe_client = ollama.Client(host=self.host, timeout=PROBE_TIMEOUT)
+            self._client = ollama.Client(
+                host=self.host,
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=MAX_IN_FLIGHT + 2,
+                    max_keepalive_connections=MAX_IN_FLIGHT + 2,
+                    keepalive_expiry=300.0,
+                ),
+            )
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._connect()
+        return self._client
+
+    @property
+    def _probe(self):
+        if self._client is None:
+            self._connect()
+        return self._probe_client
+
+    def chat(self, messages, stream: bool = False):
+        return self.client.chat(model=self.model, messages=messages, stream=stream, keep_alive=KEEP_ALIVE)
+
+    def preload(self) -> bool:
+        """Load the model into memory so the first real event doesn't pay for it."""
+        try:
+            t0 = time.monotonic()
+            # An empty prompt makes Ollama load the model without generating anything.
+            self.client.generate(model=self.model, prompt="", keep_alive=KEEP_ALIVE)
+            self.breaker.record_success()
+            log_event("AI_MODEL_PRELOADED", f"{self.model} loaded in {time.monotonic() - t0:.1f}s")
+            return True
+        except Exception as e:
+            self.breaker.record_failure()
+            log_event("AI_MODEL_PRELOAD_FAILED", str(e))
+            return False
+
+    def preload_async(self):
+        threading.Thread(target=self.preload, name="model-preload", daemon=True).start()
+
+    def health_check(self, min_interval: float = 2.0) -> bool:
+        """
+        Cheap liveness probe (GET /api/ps, no inference). Concurrent callers
+        share one probe, and results are reused for `min_interval` seconds so an
+        outage doesn't turn into a stack of probes from every monitor.
+        """
+        with self._probe_lock:
+            if time.monotonic() - self._last_probe < min_interval:
+                return self._last_probe_ok
+            try:
+                running = self._probe.ps()
+                loaded = any(m.get("model") == self.model or m.get("name") == self.model
+                             for m in running.get("models", []) or [])
+                self._last_probe_ok = True
+                self.breaker.record_success()
+                if not loaded:
+                    log_event("AI_MODEL_NOT_LOADED", f"{self.model} not resident; preloading.")
+                    self.preload_async()
+            except Exception as e:
+                self._last_probe_ok = False
+                self.breaker.record_failure()
+                log_event("AI_HEALTH_CHECK_FAILED", str(e))
+            self._last_probe = time.monotonic()
+            return self._last_probe_ok
+
+
+model_client = ModelClient()
@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import threading
+from utils.logger import log_event
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'triage_rules.json')
+
+ACTION_DENY = "deny"        # dangerous, no LLM call
+ACTION_ANALYZE = "analyze"  # ambiguous, must go to the LLM
+ACTION_ALLOW = "allow"      # safe, no LLM call
+
+# Evaluation order: a deny match always wins, then a forced analyze, then allow.
+_ACTION_ORDER = (ACTION_DENY, ACTION_ANALYZE, ACTION_ALLOW)
+
+# Process rules see the executable path with this prefix spelled "%systemroot%",
+# so an allow rule can require the real Windows directory instead of just a name.
+SYSTEM_ROOT = os.environ.get("SystemRoot", r"C:\Windows")
+
+
+class _Category:
+    """
+    All rules of one category, compiled into a single alternation per action.
+    Each rule becomes a named group so one `search` tells us which rule fired.
+    """
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.default = spec.get("default", ACTION_ANALYZE)
+        self.rules = {}    # group name → rule dict
+        self.matchers = [] # [(action, compiled pattern)] in _ACTION_ORDER
+
+        by_action = {action: [] for action in _ACTION_ORDER}
+        for i, rule in enumerate(spec.get("rules", [])):
+            action = rule.get("action", ACTION_ANALYZE)
+            if action not in by_action:
+                raise ValueError(f"Rule {rule.get('id')} has unknown action '{action}'")
+            if "regex" in rule:
+                body = rule["regex"]
+            else:
+                literals = rule.get("literal", [])
+                if isinstance(literals, str):
+                    literals = [literals]
+                # Longest first so the alternation prefers the most specific literal.
+                body = "|".join(re.escape(l.lower()) for l in sorted(literals, key=len, reverse=True))
+            group = f"r{i}"
+            self.rules[group] = rule
+            by_action[action].append(f"(?P<{group}>{body})")
+
+        for action in _ACTION_ORDER:
+            if by_action[action]:
+                self.matchers.append((action, re.compile("|".join(by_action[action]))))
+
+    def match(self, text: str):
+        """Returns (action, rule or None)."""
+        for action, pattern in self.matchers:
+            m = pattern.search(text)
+            if m:
+                return action, self.rules[m.lastgroup]
+        return self.default, None
+
+
+class RuleEngine:
+    """
+    Local triage tier in front of analyze_text. Decides obvious events from
+    config/triage_rules.json and only leaves ambiguous ones for the model.
+    """
+
+    def __init__(self, path: str = RULES_PATH):
+        self.path = path
+        self._categories = {}
+        self._stats = {}   # rule id → matches
+        self._stats_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+            categories = {name: _Category(name, cat) for name, cat in spec.get("categories", {}).items()}
+        except Exception as e:
+            log_event("RULES_LOAD_ERROR", f"Failed to load triage rules from {self.path}: {e}")
+            return False
+        self._categories = categories
+        log_event("RULES_LOADED", f"{sum(len(c.rules) for c in categories.values())} triage rules "
+                                  f"in {len(categories)} categories")
+        return True
+
+    def triage(self, category: str, text: str, count: bool = True):
+        """
+        Returns a verdict dict shaped like analyze_text's, or None when the
+        event is ambiguous and needs the model. count=False leaves the per-rule
+        hit counters alone (lookups that are not events, e.g. speculation).
+        """
+        cat = self._categories.get(category)
+        if cat is None:
+            return None
+        action, rule = cat.match(text.strip().lower())
+        rule_id = rule["id"] if rule else f"{category}:default"
+        if count:
+            with self._stats_lock:
+                self._stats[rule_id] = self._stats.get(rule_id, 0) + 1
+
+        if action == ACTION_ANALYZE:
+            return None
+        reason = rule.get("reason", "") if rule else "No rule matched; category default."
+        return {
+            "DANGEROUS": action == ACTION_DENY,
+            "reason": f"[rule {rule_id}] {reason}",
+            "rule": rule_id,
+        }
+
+    def triage_process(self, name: str, parent_name: str = "", exe: str = ""):
+        """
+        Parent/child pairs are checked before the process on its own. The
+        process is matched by its executable path (see SYSTEM_ROOT), or by
+        its name when the path is unknown.
+        """
+        process = _process_text(name, exe)
+        if parent_name and parent_name.lower() != "unknown":
+            verdict = self.triage("parent_child", f"{parent_name}>{process}")
+            if verdict is not None:
+                return verdict
+        return self.triage("process", process)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+def _process_text(name: str, exe: str) -> str:
+    if not exe:
+        return name
+    exe = exe.strip().lower()
+    root = SYSTEM_ROOT.lower().rstrip("\\") + "\\"
+    return "%systemroot%\\" + exe[len(root):] if exe.startswith(root) else exe
+
+
+rule_engine = RuleEngine()
+triage = rule_engine.triage
+triage_process = rule_engine.triage_process
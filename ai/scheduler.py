@@ -0,0 +1,210 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from utils.metrics import metrics
+from utils.tracing import propagate
+
+PRIORITY_INTERACTIVE = 0   # secure_shell, console and keyboard input
+PRIORITY_PROCESS = 1       # process creation / short-lived analysis
+PRIORITY_BACKGROUND = 2    # registry and settings changes
+
+SOURCE_PRIORITIES = {
+    "CMD": PRIORITY_INTERACTIVE,
+    "NON-CMD_WINDOW": PRIORITY_INTERACTIVE,
+    "PROCESS_CREATION": PRIORITY_PROCESS,
+    "SHORT_LIVED": PRIORITY_PROCESS,
+    "REGISTRY_CHANGE": PRIORITY_BACKGROUND,
+    "SETTINGS_CHANGE": PRIORITY_BACKGROUND,
+}
+
+# Seconds a request may wait (queued + running) before it is considered stale.
+PRIORITY_DEADLINES = {
+    PRIORITY_INTERACTIVE: 30.0,
+    PRIORITY_PROCESS: 60.0,
+    PRIORITY_BACKGROUND: 120.0,
+}
+
+MAX_IN_FLIGHT = int(os.environ.get("GUARDRAIL_MAX_IN_FLIGHT", "2"))
+
+
+class StaleRequestError(Exception):
+    """Raised for a request whose deadline passed before the model picked it up."""
+
+
+class RequestFuture(Future):
+    """
+    Future of a scheduled request. Cancelling a queued request drops it;
+    cancelling a running one still returns False, but sets `stop`, which the
+    request sees through stop_requested() and can end early on to free its
+    slot. A request that never checks (a non-streaming call) runs to the end.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stop = threading.Event()
+
+    def cancel(self) -> bool:
+        self.stop.set()
+        return super().cancel()
+
+
+_running = threading.local()
+
+
+def stop_requested() -> bool:
+    """True once the request running on this worker thread has been cancelled."""
+    stop = getattr(_running, "stop", None)
+    return stop is not None and stop.is_set()
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "deadline", "fn", "future")
+
+    def __init__(self, priority, seq, deadline, fn):
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.fn = fn
+        self.future = RequestFuture()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class InferenceScheduler:
+    """
+    Priority queue in front of the model. Up to `max_in_flight` requests run
+    concurrently; lower priority numbers are always dispatched first and any
+    request that is past its deadline when dequeued is dropped as stale.
+    A running request holds a slot; see share_slots for a limit that spans
+    processes.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT):
+        self.max_in_flight = max(1, max_in_flight)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._held = 0
+        self._slots_returned = False
+        self._heap = []
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._workers = []
+        self.submitted = 0
+        self.completed = 0
+        self.stale = 0
+        self.cancelled = 0
+
+    def submit(self, fn, priority: int = PRIORITY_PROCESS, deadline: float = None) -> RequestFuture:
+        if deadline is None:
+            deadline = time.monotonic() + PRIORITY_DEADLINES.get(priority, 60.0)
+        job = _Job(priority, next(self._seq), deadline, propagate(fn, "scheduler.wait"))
+        with self._cond:
+            self._ensure_workers()
+            heapq.heappush(self._heap, job)
+            self.submitted += 1
+            self._cond.notify()
+        return job.future
+
+    def run(self, fn, priority: int = PRIORITY_PROCESS, timeout: float = None):
+        """Submit `fn` and block for its result, cancelling it if `timeout` expires first."""
+        if timeout is None:
+            timeout = PRIORITY_DEADLINES.get(priority, 60.0)
+        future = self.submit(fn, priority, time.monotonic() + timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # Still queued → drop it; already running → asked to stop (see RequestFuture).
+            future.cancel()
+            raise StaleRequestError(f"No result within {timeout:.0f}s")
+
+    def share_slots(self, slots):
+        """
+        Takes running slots from `slots` (a multiprocessing semaphore) instead,
+        so one limit holds across every process sharing it. Priorities still
+        order requests only within a process.
+        """
+        self._slots = slots
+
+    def release_slots(self):
+        """Gives back the slots of running requests; for a process about to exit with them."""
+        with self._cond:
+            held, self._held = self._held, 0
+            self._slots_returned = True
+        for _ in range(held):
+            self._slots.release()
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._heap),
+                "running": self._held,
+                "max_in_flight": self.max_in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "stale": self.stale,
+                "cancelled": self.cancelled,
+            }
+
+    def _ensure_workers(self):
+        while len(self._workers) < self.max_in_flight:
+            t = threading.Thread(target=self._worker, name=f"inference-{len(self._workers)}", daemon=True)
+            self._workers.append(t)
+            t.start()
+
+    def _next_job(self):
+        """Waits for a queued request; pops the most urgent live one, or None if others got there first."""
+        with self._cond:
+            while not self._heap:
+                self._cond.wait()
+        slots = self._slots
+        slots.acquire()
+        with self._cond:
+            while self._heap:
+                job = heapq.heappop(self._heap)
+                if job.future.cancelled():
+                    self.cancelled += 1
+                    continue
+                if job.deadline <= time.monotonic():
+                    self.stale += 1
+                    job.future.set_exception(StaleRequestError("Deadline passed while queued"))
+                    continue
+                if not job.future.set_running_or_notify_cancel():
+                    self.cancelled += 1
+                    continue
+                self._held += 1
+                return job, slots
+        slots.release()
+        return None, None
+
+    def _worker(self):
+        while True:
+            job, slots = self._next_job()
+            if job is None:
+                continue
+            _running.stop = job.future.stop
+            try:
+                job.future.set_result(job.fn())
+            except BaseException as e:
+                job.future.set_exception(e)
+            _running.stop = None
+            with self._cond:
+                self.completed += 1
+                if self._slots_returned:
+                    continue
+                self._held -= 1
+            slots.release()
+
+
+def priority_for_source(source: str) -> int:
+    return SOURCE_PRIORITIES.get(source, PRIORITY_PROCESS)
+
+
+scheduler = InferenceScheduler()
+metrics.collect("guardrail_scheduler", scheduler.stats)
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+import numpy as np
+from utils.logger import log_event, log_line
+from utils.metrics import metrics
+from ai.features import hashed_ngrams, canonical_text, DIM
+from ai.verdict_cache import prompt_source
+
+AUDIT_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'logs', 'semantic_reuse.log')
+
+CAPACITY = 4096
+SIMILARITY_THRESHOLD = float(os.environ.get("GUARDRAIL_SIMILARITY_THRESHOLD", "0.80"))
+
+# Only sources whose events mostly differ in their arguments benefit from reuse.
+# Process prompts are not among them: their shared "NewProcess Name: X PID: N"
+# template makes notepad.exe and mimikatz.exe near neighbours (cosine ~0.85).
+SEMANTIC_SOURCES = {"CMD", "NON-CMD_WINDOW"}
+
+
+def _shape(prompt: str) -> int:
+    """
+    Coarse structure of an event: its source, first word, switches and word
+    count. Only events of the same shape may share a verdict, so `del a.log`
+    can reuse `del b.log` but never `del /s /q a.log`, `del /f b.log` or `type a.log`.
+    """
+    body = canonical_text(prompt.split(":", 1)[-1])
+    words = body.split()
+    switches = " ".join(w for w in words[1:] if w[:1] in "/-")
+    return zlib.crc32(f"{prompt_source(prompt)}|{words[0] if words else ''}|{switches}|{len(words)}".encode())
+
+
+class SemanticIndex:
+    """
+    Nearest-neighbour index of past verdicts. Prompts are embedded as hashed
+    character n-grams into a fixed ring buffer of unit vectors, so a lookup is
+    a single matrix-vector product. Near-duplicates above `threshold` cosine
+    similarity (same source and shape only) reuse the earlier verdict.
+    """
+
+    def __init__(self, capacity: int = CAPACITY, threshold: float = SIMILARITY_THRESHOLD,
+                 audit_path: str = AUDIT_LOG_PATH):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.audit_path = audit_path
+        self._vectors = np.zeros((capacity, DIM), dtype=np.float32)
+        self._shapes = np.zeros(capacity, dtype=np.int64)
+        self._prompts = [None] * capacity
+        self._verdicts = [None] * capacity
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.lookups = 0
+
+    def add(self, prompt: str, verdict: dict):
+        if prompt_source(prompt) not in SEMANTIC_SOURCES:
+            return
+        vec = hashed_ngrams(prompt)
+        shape = _shape(prompt)
+        with self._lock:
+            slot = self._next
+            self._vectors[slot] = vec
+            self._shapes[slot] = shape
+            self._prompts[slot] = prompt
+            self._verdicts[slot] = dict(verdict)
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def lookup(self, prompt: str):
+        """Returns a reused verdict dict or None."""
+        if prompt_source(prompt) not in SEMANTIC_SOURCES:
+            return None
+        vec = hashed_ngrams(prompt)
+        shape = _shape(prompt)
+        with self._lock:
+            self.lookups += 1
+            n = self._size
+            if not n:
+                return None
+            scores = self._vectors[:n] @ vec
+            scores[self._shapes[:n] != shape] = -1.0
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                return None
+            self.reused += 1
+            matched_prompt = self._prompts[best]
+            verdict = dict(self._verdicts[best])
+            verdict["reused"] = True    # keeps reuses out of the local classifier's training data
+
+        self._audit(prompt, matched_prompt, similarity, verdict)
+        return verdict
+
+    def _audit(self, prompt: str, matched_prompt: str, similarity: float, verdict: dict):
+        try:
+            entry = {
+                "timestamp": datetime.utcnow().isoformat(),
+                "prompt": prompt,
+                "matched_prompt": matched_prompt,
+                "similarity": round(similarity, 4),
+                "verdict": verdict,
+            }
+            log_line(self.audit_path, json.dumps(entry))
+        except Exception as e:
+            log_event("SEMANTIC_AUDIT_ERROR", f"Failed to write reuse audit: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": self._size, "lookups": self.lookups, "reused": self.reused,
+                    "threshold": self.threshold}
+
+
+semantic_index = SemanticIndex()
+metrics.collect("guardrail_semantic_index", semantic_index.stats)
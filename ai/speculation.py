@@ -0,0 +1,56 @@
+import os
+import threading
+from ai.mistral_analysis import speculate, cancel_speculation
+from ai.rules import triage
+
+# Seconds of no typing after which the partial input is analysed ahead of Enter.
+DEBOUNCE = float(os.environ.get("GUARDRAIL_SPECULATION_DEBOUNCE", "0.3"))
+MIN_CHARS = 3
+
+
+class Speculator:
+    """
+    Speculative analysis for one input line (a console, the secure shell).
+    Each typing pause sends the partial command ahead; the previous
+    speculation is cancelled, so at most one is in flight per line. Only an
+    exact match with the final command reuses the result (through the
+    verdict cache): a verdict for a prefix says nothing about what follows.
+    """
+
+    def __init__(self, source: str = "CMD", category: str = "command"):
+        self.source = source
+        self.category = category
+        self._prompt = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.cancelled = 0
+
+    def _prompt_for(self, text: str) -> str:
+        return f"{self.source}: {text}"
+
+    def update(self, text: str):
+        """Called when typing pauses, with the line as typed so far."""
+        text = text.strip()
+        # Lines the rules decide locally never need the model. A pause is not an
+        # event, so it must not count towards the rule hit counters.
+        prompt = (self._prompt_for(text) if len(text) >= MIN_CHARS
+                  and triage(self.category, text, count=False) is None else None)
+        with self._lock:
+            if prompt == self._prompt:
+                return
+            stale, self._prompt = self._prompt, prompt
+        if stale is not None:
+            cancel_speculation(stale)
+            self.cancelled += 1
+        if prompt is not None:
+            speculate(prompt)
+            self.started += 1
+
+    def finish(self, text: str):
+        """Called with the submitted line; a speculation for any other text is cancelled."""
+        final = self._prompt_for(text.strip())
+        with self._lock:
+            stale, self._prompt = self._prompt, None
+        if stale is not None and stale != final:
+            cancel_speculation(stale)
+            self.cancelled += 1
@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from utils.logger import log_event
+from utils.metrics import metrics
+
+CACHE_PATH = os.environ.get("GUARDRAIL_VERDICT_CACHE",
+                            os.path.join(os.path.dirname(__file__), '..', 'cache', 'verdict_cache.json'))
+
+MAX_ENTRIES = 20000
+SAVE_EVERY = 50          # persist after this many new verdicts...
+SAVE_INTERVAL = 30.0     # ...or after this many seconds, whichever comes first
+
+# Seconds a verdict stays valid, keyed by the prompt's source tag.
+SOURCE_TTLS = {
+    "CMD": 24 * 3600,
+    "NON-CMD_WINDOW": 3600,
+    "PROCESS_CREATION": 6 * 3600,
+    "SHORT_LIVED": 6 * 3600,
+    "REGISTRY_CHANGE": 600,
+    "SETTINGS_CHANGE": 600,
+}
+DEFAULT_TTL = 3600
+
+_SOURCE_RE = re.compile(r"^\s*([A-Za-z_\-]+)")
+_WS_RE = re.compile(r"\s+")
+# Values that differ between otherwise identical events (PIDs, handles, ...).
+_VOLATILE_RE = re.compile(r"\b(pid|parent_pid|ppid|handle)(\s*[:=]\s*)\d+", re.IGNORECASE)
+
+
+def prompt_source(prompt: str) -> str:
+    m = _SOURCE_RE.match(prompt)
+    return m.group(1).upper() if m else ""
+
+
+def normalize_prompt(prompt: str) -> str:
+    text = _WS_RE.sub(" ", prompt.strip()).lower()
+    return _VOLATILE_RE.sub(r"\1\2#", text)
+
+
+class VerdictCache:
+    """
+    LRU cache of AI verdicts keyed on the normalized prompt.
+    Entries expire after a per-source TTL and are persisted to disk so
+    warm verdicts survive restarts.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key → (expires_at, verdict)
+        self._lock = threading.Lock()
+        # Saves come from the periodic path and atexit on different threads; one writes at a time.
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        self._last_save = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, prompt: str):
+        key = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, verdict = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(verdict)
+
+    def put(self, prompt: str, verdict: dict):
+        key = normalize_prompt(prompt)
+        ttl = SOURCE_TTLS.get(prompt_source(prompt), DEFAULT_TTL)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, dict(verdict))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty += 1
+            due = self._dirty >= SAVE_EVERY or time.time() - self._last_save >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def _read(self) -> list:
+        """[[key, expires_at, verdict]] stored on disk, oldest first."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            log_event("VERDICT_CACHE_LOAD_ERROR", f"Failed to load {self.path}: {e}")
+            return []
+
+    def load(self):
+        entries = self._read()
+        now = time.time()
+        with self._lock:
+            # Stored oldest → newest, so insertion order restores the LRU order.
+            for key, expires_at, verdict in entries:
+                if expires_at > now and isinstance(verdict, dict):
+                    self._entries[key] = (expires_at, verdict)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        log_event("VERDICT_CACHE_LOADED", f"{len(self._entries)} cached verdicts from {self.path}")
+
+    def _merge_saved(self):
+        """
+        Adopts verdicts another process saved since this one loaded, as least
+        recently used, so rewriting the file doesn't drop them. Call with
+        _save_lock held. Monitors isolated in their own processes (see
+        utils.watchdog_timer) share the file this way.
+        """
+        entries = self._read()
+        now = time.time()
+        with self._lock:
+            for key, expires_at, verdict in reversed(entries):
+                if key not in self._entries and expires_at > now and isinstance(verdict, dict):
+                    self._entries[key] = (expires_at, verdict)
+                    self._entries.move_to_end(key, last=False)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+            self._merge_saved()
+            with self._lock:
+                entries = [[k, exp, v] for k, (exp, v) in self._entries.items()]
+                self._dirty = 0
+                self._last_save = time.time()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = f"{self.path}.{os.getpid()}.tmp"    # isolated monitors save from several processes
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({"version": 1, "entries": entries}, f)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                log_event("VERDICT_CACHE_SAVE_ERROR", f"Failed to save {self.path}: {e}")
+
+
+verdict_cache = VerdictCache()
+verdict_cache.load()
+metrics.collect("guardrail_verdict_cache", verdict_cache.stats)
+atexit.register(verdict_cache.save)
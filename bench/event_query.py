@@ -0,0 +1,102 @@
+"""
+Investigation queries over a synthetic guardrail_log.txt: scanning the flat
+text log (what grep does) vs the day-partitioned, indexed event store.
+
+    python bench/event_query.py --lines 500000 --days 30
+"""
+import argparse
+import datetime
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.event_store import EventStore, import_log
+
+TYPES = ["KEY_EVENT", "CMD_SAFE", "CMD_ANALYZE", "PROCESS_SAFE", "REGISTRY_CHANGE", "SETTINGS_POLL"]
+
+
+def write_log(path: str, lines: int, days: int, seed: int = 7) -> float:
+    """Writes the log and returns the timestamp of its first line."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 6, 1).timestamp()
+    step = days * 86400 / lines
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            stamp = datetime.datetime.fromtimestamp(start + i * step).strftime('%Y-%m-%d %H:%M:%S')
+            kind = rng.random()
+            if kind < 0.2:
+                pid = rng.randint(1000, 60000)
+                sha = "%064x" % rng.getrandbits(256)
+                f.write(f"[{stamp}] [NEW_PROCESS_FLAGGED] PID: {pid} Parent: explorer.exe "
+                        f"Cmd: tool.exe /run {i} SHA256: {sha} | AI: {{'DANGEROUS': False}}\n")
+            elif kind < 0.4:
+                f.write(f"[{stamp}] [CMD_FLAGGED] Command: del C:\\data\\{i} | AI Response: {{'DANGEROUS': True}}\n")
+            else:
+                f.write(f"[{stamp}] [{rng.choice(TYPES)}] routine detail {i}\n")
+    return start
+
+
+def grep(path: str, pattern) -> int:
+    hits = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if pattern.search(line):
+                hits += 1
+    return hits
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=500000)
+    ap.add_argument("--days", type=int, default=30)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-events-")
+    log = os.path.join(tmp, "guardrail_log.txt")
+    start = write_log(log, args.lines, args.days)
+    print(f"log: {args.lines} lines, {os.path.getsize(log) / 1e6:.0f} MB over {args.days} days")
+
+    store = EventStore(os.path.join(tmp, "events"))
+    n, ms = timed(lambda: import_log(store, log))
+    store.close()
+    print(f"import: {n} events in {ms / 1000:.1f} s ({len(store.segments())} segments)")
+
+    # One PID seen mid-range, a one-hour window on day 10, and a day-long aggregate.
+    probe = next(store.query(start + 15 * 86400, type="NEW_PROCESS_FLAGGED", limit=1))
+    hour = start + 10 * 86400 + 9 * 3600
+    hour_prefix = datetime.datetime.fromtimestamp(hour).strftime('[%Y-%m-%d %H:')
+    day_prefix = datetime.datetime.fromtimestamp(hour).strftime('[%Y-%m-%d ')
+    cases = [
+        ("pid lookup",
+         lambda: grep(log, re.compile(rf"\bPID: {probe['pid']}\b")),
+         lambda: sum(1 for _ in store.query(pid=probe["pid"]))),
+        ("sha256 lookup",
+         lambda: grep(log, re.compile(probe["sha256"])),
+         lambda: sum(1 for _ in store.query(sha256=probe["sha256"]))),
+        ("flagged cmds, 1 hour",
+         lambda: grep(log, re.compile(re.escape(hour_prefix) + r".*\[CMD_FLAGGED\]")),
+         lambda: sum(1 for _ in store.query(hour, hour + 3599, type="CMD_FLAGGED"))),
+        ("count by type, 1 day",
+         lambda: grep(log, re.compile(re.escape(day_prefix))),
+         lambda: sum(store.count("type", hour - 9 * 3600, hour + 15 * 3600 - 1).values())),
+    ]
+    for name, scan, indexed in cases:
+        scan_hits, scan_ms = timed(scan)
+        hits, query_ms = timed(indexed)
+        print(f"{name:22s} scan {scan_ms:8.1f} ms ({scan_hits:6d}) | store {query_ms:7.1f} ms ({hits:6d})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Local stand-in for the Ollama HTTP API, for benchmarks and manual testing
+without a GPU or the real model.
+
+Serves /api/chat (streaming and non-streaming), /api/generate, /api/tags and
+/api/ps. Prompts containing any of DANGEROUS_MARKERS get a dangerous verdict.
+
+    python bench/fake_ollama.py --port 11435 --token-delay 0.02
+    set OLLAMA_HOST=http://127.0.0.1:11435
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DANGEROUS_MARKERS = ("del ", "format ", "rmdir", "vssadmin", "mimikatz", "-encodedcommand", "reg delete")
+REASON_SAFE = "The command is a routine operation with no destructive or privileged side effects."
+REASON_DANGEROUS = ("The command can delete data, disable protections or run hidden code, "
+                    "which is typical of destructive or malicious activity.")
+
+
+def fake_verdict(prompt: str) -> dict:
+    # Only look at the event itself, not the instructions wrapped around it.
+    event = prompt.rsplit("Command:\n", 1)[-1].lower()
+    dangerous = any(m in event for m in DANGEROUS_MARKERS)
+    return {"DANGEROUS": dangerous, "reason": REASON_DANGEROUS if dangerous else REASON_SAFE}
+
+
+def _tokens(text: str):
+    # Roughly token-sized pieces: split on spaces but keep them attached.
+    piece = ""
+    for ch in text:
+        piece += ch
+        if ch in ' ,:{"' and len(piece) > 1:
+            yield piece
+            piece = ""
+    if piece:
+        yield piece
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOllama/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"model": self.server.model, "name": self.server.model}]})
+        elif self.path == "/api/ps":
+            loaded = [{"model": self.server.model, "name": self.server.model}] if self.server.loaded else []
+            self._send_json({"models": loaded})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        req = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests += 1
+        if not self.server.loaded:
+            time.sleep(self.server.load_delay)
+            self.server.loaded = True
+
+        if self.path == "/api/generate":
+            self._send_json(self._final(req, "response", ""))
+            return
+        if self.path != "/api/chat":
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        prompt = "".join(m.get("content", "") for m in req.get("messages", []))
+        content = json.dumps(fake_verdict(prompt))
+        if not req.get("stream", True):
+            time.sleep(self.server.token_delay * sum(1 for _ in _tokens(content)))
+            self._send_json(self._final(req, "message", {"role": "assistant", "content": content}))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for tok in _tokens(content):
+                time.sleep(self.server.token_delay)
+                self._write_chunk({"model": req.get("model"), "created_at": _now(),
+                                   "message": {"role": "assistant", "content": tok}, "done": False})
+            self._write_chunk(self._final(req, "message", {"role": "assistant", "content": ""}))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client closed the stream early (early verdict exit).
+            self.server.aborted_streams += 1
+            self.close_connection = True
+
+    def _write_chunk(self, obj):
+        data = json.dumps(obj).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _final(req, key, value):
+        return {"model": req.get("model"), "created_at": _now(), key: value,
+                "done": True, "done_reason": "stop"}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def start_server(port: int = 0, token_delay: float = 0.02, load_delay: float = 0.0,
+                 model: str = "mistral:7b-instruct-q4_K_M"):
+    """Starts the server on a daemon thread and returns it; `server.url` is the base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.token_delay = token_delay
+    server.load_delay = load_delay
+    server.model = model
+    server.loaded = load_delay <= 0
+    server.requests = 0
+    server.aborted_streams = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--token-delay", type=float, default=0.02, help="seconds per generated token")
+    ap.add_argument("--load-delay", type=float, default=0.0, help="seconds to 'load' the model on first use")
+    args = ap.parse_args()
+    srv = start_server(args.port, args.token_delay, args.load_delay)
+    print(f"Fake Ollama listening on {srv.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        srv.shutdown()
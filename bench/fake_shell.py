@@ -0,0 +1,34 @@
+"""
+Stand-in for the PowerShell query worker: speaks the same JSON line
+protocol but answers each query by name from a JSON state file, re-read on
+every request so tests can flip settings while it runs.
+
+    python bench/fake_shell.py state.json
+
+A query named "crash" makes the process exit, to exercise restarts.
+"""
+import json
+import os
+import sys
+
+
+def main():
+    state_path = sys.argv[1]
+    for line in sys.stdin:
+        request = json.loads(line)
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        results = {}
+        for name in request["queries"]:
+            if name == "crash":
+                os._exit(1)
+            if name in state:
+                results[name] = {"ok": True, "value": state[name]}
+            else:
+                results[name] = {"ok": False, "error": f"unknown query '{name}'"}
+        sys.stdout.write(json.dumps({"id": request["id"], "results": results}) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Keyboard hook latency while heavy monitors run: with no load, with the load
+monitors as threads in this interpreter, and with each one isolated in its
+own process by the Watchdog. The load stands in for the process, registry
+and settings monitors (hashing, snapshot diffs, JSON). Win32 calls are faked.
+
+    python bench/hook_isolation.py --monitors 3 --seconds 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+KEY_INTERVAL = 0.01     # a fast typist: 100 keys a second
+
+
+def heavy_monitor():
+    """Snapshot, diff, serialise and hash in a loop, holding the GIL most of the time."""
+    previous = {}
+    generation = 0
+    while True:
+        generation += 1
+        snapshot = {f"HKLM\\Software\\Vendor{i % 97}\\Key{i}": {"value": i * generation % 7, "type": "REG_DWORD"}
+                    for i in range(5000)}
+        changed = [k for k, v in snapshot.items() if previous.get(k) != v]
+        blob = json.dumps({"changed": changed, "snapshot": snapshot})
+        json.loads(blob)
+        for i in range(0, len(blob), 512):
+            hashlib.sha256(blob[i:i + 512].encode()).hexdigest()
+        previous = snapshot
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return f"p50 {pick(0.5):8.1f} us | p99 {pick(0.99):9.1f} us | max {ordered[-1]:9.1f} us"
+
+
+def measure(dispatcher, seconds: float) -> list:
+    """Keys due every KEY_INTERVAL; latency is from when the key was due until on_key returned."""
+    samples = []
+    keys = "dir C:\\Users\\bench"
+    due = time.perf_counter() + KEY_INTERVAL
+    end = due + seconds
+    i = 0
+    while due < end:
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name = keys[i % len(keys)] if i % (len(keys) + 1) else "enter"
+        dispatcher.on_key(SimpleNamespace(name=name, event_type="down"))
+        samples.append((time.perf_counter() - due) * 1e6)
+        due += KEY_INTERVAL
+        i += 1
+    return samples
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--monitors", type=int, default=3)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-isolation-")
+    os.environ["GUARDRAIL_METRICS_SNAPSHOT"] = os.path.join(tmp, "metrics.json")
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from monitor.key_dispatcher import KeyDispatcher, CONSOLE_CLASSES
+    from utils.watchdog_timer import Watchdog
+
+    dispatcher = KeyDispatcher(foreground=lambda: 1, class_name=lambda hwnd: "ConsoleWindowClass",
+                               clipboard=lambda: "", ctrl_pressed=lambda: False)
+    lines = []
+    dispatcher.subscribe("command", CONSOLE_CLASSES, lines.append)
+    dispatcher.start(hook=False)
+
+    print(f"{args.monitors} load monitors, a key every {KEY_INTERVAL * 1000:.0f} ms for {args.seconds:.0f} s")
+    print(f"no load:            {_percentiles(measure(dispatcher, args.seconds))}")
+    # Process mode first: Watchdog.stop() ends child processes, but monitor threads run until exit.
+    for isolation in ("process", "thread"):
+        wd = Watchdog(isolation)
+        for i in range(args.monitors):
+            wd.register(f"LOAD_{i}", heavy_monitor)
+        wd.start()
+        time.sleep(3 if isolation == "process" else 0.5)    # let spawned interpreters finish importing
+        print(f"{isolation + ' isolation:':19s} {_percentiles(measure(dispatcher, args.seconds))}")
+        wd.stop()
+    utils.logger.flush()
+
+
+if __name__ == "__main__":
+    main()
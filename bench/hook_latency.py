@@ -0,0 +1,112 @@
+"""
+Keyboard hook callback latency: the previous per-monitor handlers (window
+class lookup and a log write per key, analysis inline on Enter) vs the
+shared KeyDispatcher. Win32 calls are faked; analysis runs against the
+fake Ollama server.
+
+    python bench/hook_latency.py --lines 100 --token-delay 0.005
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_ollama import start_server
+
+CONSOLE_HWND, EDITOR_HWND = 1, 2
+CLASSES = {CONSOLE_HWND: "ConsoleWindowClass", EDITOR_HWND: "Notepad"}
+
+
+def _keys(lines: int):
+    """(hwnd, event) pairs: alternating console commands and editor text, one Enter per line."""
+    for i in range(lines):
+        hwnd = CONSOLE_HWND if i % 2 == 0 else EDITOR_HWND
+        text = f"dir C:\\Users\\bench{i}" if hwnd == CONSOLE_HWND else f"meeting notes {i}"
+        for ch in text:
+            yield hwnd, SimpleNamespace(name=ch, event_type="down")
+            yield hwnd, SimpleNamespace(name=ch, event_type="up")
+        yield hwnd, SimpleNamespace(name="enter", event_type="down")
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return f"p50 {pick(0.5):8.1f} us | p99 {pick(0.99):10.1f} us | max {ordered[-1]:10.1f} us"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=100)
+    ap.add_argument("--token-delay", type=float, default=0.005)
+    args = ap.parse_args()
+
+    server = start_server(token_delay=args.token_delay)
+    tmp = tempfile.mkdtemp(prefix="guardrail-hook-")
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["GUARDRAIL_HEADLESS"] = "1"
+    os.environ["GUARDRAIL_VERDICT_CACHE"] = os.path.join(tmp, "verdicts.json")
+    os.environ["GUARDRAIL_SIMILARITY_THRESHOLD"] = "2"
+    import utils.logger
+    from utils.logger import log_event
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from ai.semantic_index import semantic_index
+    semantic_index.audit_path = os.path.join(tmp, "semantic_reuse.log")
+    from monitor import cmd_monitor, keystroke_monitor
+    from monitor.key_dispatcher import KeyDispatcher, CONSOLE_CLASSES
+
+    current = [CONSOLE_HWND]
+    lookups = [0]
+
+    def class_name(hwnd):
+        lookups[0] += 1
+        return CLASSES[hwnd]
+
+    # The old cmd_monitor handler, minus the clipboard branch.
+    buffer = [""]
+
+    def legacy_on_key(event):
+        active_class = class_name(current[0])
+        log_event("KEY_EVENT", f"Key: {event.name} | WindowClass: {active_class}")
+        if active_class in CONSOLE_CLASSES and event.event_type == "down":
+            if event.name == "enter":
+                cmd, buffer[0] = buffer[0].strip(), ""
+                if cmd:
+                    cmd_monitor._analyze_and_prompt(cmd)
+            elif len(event.name) == 1:
+                buffer[0] += event.name
+
+    def run(handler):
+        samples = []
+        for hwnd, event in _keys(args.lines):
+            current[0] = hwnd
+            t0 = time.perf_counter()
+            handler(event)
+            samples.append((time.perf_counter() - t0) * 1e6)
+        return samples
+
+    legacy = run(legacy_on_key)
+    legacy_lookups, lookups[0] = lookups[0], 0
+
+    dispatcher = KeyDispatcher(foreground=lambda: current[0], class_name=class_name,
+                               clipboard=lambda: "", ctrl_pressed=lambda: False)
+    cmd_monitor._ensure_workers()
+    keystroke_monitor._ensure_workers()
+    dispatcher.subscribe("command", CONSOLE_CLASSES, cmd_monitor._on_line)
+    dispatcher.subscribe("keystroke", CONSOLE_CLASSES, keystroke_monitor._on_line, include=False)
+    dispatcher.start(hook=False)
+    shared = run(dispatcher.on_key)
+
+    keys = sum(1 for _ in _keys(args.lines))
+    print(f"{keys} key events, {args.lines} lines")
+    print(f"legacy handler:  {_percentiles(legacy)} | class lookups {legacy_lookups}")
+    print(f"key dispatcher:  {_percentiles(shared)} | class lookups {lookups[0]}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
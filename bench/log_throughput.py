@@ -0,0 +1,91 @@
+"""
+Caller-side cost of log_event: the previous implementation (open, append
+and close under a global lock on every call) vs the batched background
+writer. Several threads log at once, as the monitors do.
+
+    python bench/log_throughput.py --threads 8 --lines 5000 --queue 10000 --max-bytes 1048576
+"""
+import argparse
+import datetime
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _legacy_logger(path: str):
+    lock = threading.Lock()
+
+    def log_event(event_type: str, detail: str):
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entry = f'[{timestamp}] [{event_type}] {detail}\n'
+        with lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(entry)
+
+    return log_event
+
+
+def _hammer(log_event, threads: int, lines: int) -> tuple:
+    """Returns (wall seconds, per-call latencies in us)."""
+    samples = [[] for _ in range(threads)]
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(n):
+        out = samples[n]
+        start_gate.wait()
+        for i in range(lines):
+            t0 = time.perf_counter()
+            log_event("BENCH", f"thread {n} line {i} " + "x" * 80)
+            out.append((time.perf_counter() - t0) * 1e6)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    start_gate.wait()
+    t0 = time.perf_counter()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - t0, sorted(s for per_thread in samples for s in per_thread)
+
+
+def _report(name: str, wall: float, samples: list):
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    print(f"{name:8s} {len(samples) / wall:10.0f} lines/s | p50 {pick(0.5):7.1f} us | "
+          f"p99 {pick(0.99):8.1f} us | max {samples[-1]:9.1f} us")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--lines", type=int, default=5000, help="lines per thread")
+    ap.add_argument("--queue", type=int, default=10000, help="pending-line bound of the batched writer")
+    ap.add_argument("--max-bytes", type=int, default=1024 * 1024, help="rotation size for the batched writer")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-log-")
+    os.environ["GUARDRAIL_LOG_MAX_BYTES"] = str(args.max_bytes)
+    os.environ["GUARDRAIL_LOG_QUEUE"] = str(args.queue)
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+
+    wall, samples = _hammer(_legacy_logger(os.path.join(tmp, "legacy_log.txt")), args.threads, args.lines)
+    _report("legacy", wall, samples)
+
+    wall, samples = _hammer(utils.logger.log_event, args.threads, args.lines)
+    t0 = time.perf_counter()
+    utils.logger.flush(timeout=60)
+    drain = time.perf_counter() - t0
+    _report("batched", wall, samples)
+    segments = glob.glob(utils.logger.LOG_PATH + ".*.gz")
+    print(f"batched writer: {utils.logger.writer.stats()} | drain after last call {drain * 1000:.1f} ms | "
+          f"{len(segments)} compressed segments")
+
+
+if __name__ == "__main__":
+    main()
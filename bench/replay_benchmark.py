@@ -0,0 +1,162 @@
+"""
+Replays a recorded monitor trace (GUARDRAIL_TRACE_FILE) through the real
+analysis path against the fake Ollama server and reports throughput and
+event-to-verdict latency.
+
+    python bench/replay_benchmark.py --trace trace.jsonl --speed 10
+    python bench/replay_benchmark.py --synthetic 500 --speed 0
+
+--speed 1 replays in real time, N replays N times faster, 0 as fast as possible.
+Verdicts that never arrive were shed or coalesced by the event queues.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_ollama import start_server
+
+COMMANDS = ["dir C:\\Users\\{}", "del C:\\temp\\{}.log", "ping host{}", "format D: /label:{}",
+            "git status {}", "net user bench{} /add"]
+PROCESSES = [("notepad.exe", "explorer.exe"), ("powershell.exe", "winword.exe"),
+             ("cmd.exe", "explorer.exe"), ("bench{}.exe", "services.exe")]
+
+
+def write_synthetic_trace(path: str, count: int, rate: float = 50.0):
+    """A mixed trace of `count` events arriving at roughly `rate` per second."""
+    rng = random.Random(1)
+    t = 0.0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"trace_version": 1, "started": "synthetic"}) + '\n')
+        for i in range(count):
+            t += rng.expovariate(rate)
+            roll = rng.random()
+            if roll < 0.4:
+                name, parent = rng.choice(PROCESSES)
+                name, pid, chain = name.format(i), 10000 + i, [parent]
+                info = {"pid": pid, "name": name, "parent_pid": 4, "command_line": name,
+                        "executable": f"C:\\Program Files\\{name}", "sha256": "N/A",
+                        "username": "bench", "parent_name": parent, "parent_chain": chain}
+                # Same text as process_monitor._intake_process; the analysis adds the kind prefix.
+                to_ai = f"NewProcess Name: {name} PID: {pid} Parents: " + " > ".join(reversed(chain))
+                event = {"monitor": "process", "kind": "PROCESS_CREATION",
+                         "data": {"process_info": info, "to_ai": to_ai}}
+            elif roll < 0.7:
+                event = {"monitor": "command", "kind": "CMD",
+                         "data": {"command": rng.choice(COMMANDS).format(i)}}
+            elif roll < 0.9:
+                event = {"monitor": "keystroke", "kind": "NON-CMD_WINDOW",
+                         "data": {"content": f"typed text {i} {rng.choice(COMMANDS).format(i)}"}}
+            else:
+                event = {"monitor": "registry", "kind": "REGISTRY_CHANGE",
+                         "data": {"detail": f"Value changed in HKCU\\Software\\Bench: v{i}"}}
+            f.write(json.dumps({"t": round(t, 6), **event}) + '\n')
+
+
+def _event_key(event):
+    data = event["data"]
+    if event["monitor"] == "process":
+        return event["kind"], data["process_info"]["pid"]
+    return {"command": data.get("command"), "keystroke": data.get("content")}.get(
+        event["monitor"], data.get("detail"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trace", help="JSONL trace recorded with GUARDRAIL_TRACE_FILE")
+    ap.add_argument("--synthetic", type=int, default=0, help="generate a synthetic trace of N events")
+    ap.add_argument("--speed", type=float, default=1.0)
+    ap.add_argument("--token-delay", type=float, default=0.005)
+    ap.add_argument("--drain-timeout", type=float, default=30.0)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-replay-")
+    trace = args.trace
+    if not trace:
+        trace = os.path.join(tmp, "synthetic.jsonl")
+        write_synthetic_trace(trace, args.synthetic or 200)
+
+    server = start_server(token_delay=args.token_delay)
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["GUARDRAIL_HEADLESS"] = "1"
+    os.environ["GUARDRAIL_VERDICT_CACHE"] = os.path.join(tmp, "verdicts.json")
+    os.environ["GUARDRAIL_HASH_CACHE"] = os.path.join(tmp, "hashes.json")
+    os.environ.pop("GUARDRAIL_TRACE_FILE", None)
+
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from monitor.event_sources import ReplaySource, add_verdict_listener
+    from monitor import process_monitor, cmd_monitor, keystroke_monitor, registry_monitor, settings_monitor
+    monitors = {"process": process_monitor, "command": cmd_monitor, "keystroke": keystroke_monitor,
+                "registry": registry_monitor, "settings": settings_monitor}
+    from ai.semantic_index import semantic_index
+    process_monitor.AI_LOG_FILE = Path(tmp) / "ai_interactions.log"
+    semantic_index.audit_path = os.path.join(tmp, "semantic_reuse.log")
+
+    sent = {}
+    latencies = []
+    last_verdict = [0.0]
+    lock = threading.Lock()
+
+    def on_verdict(monitor, key, verdict):
+        now = time.perf_counter()
+        with lock:
+            t0 = sent.pop((monitor, key), None)
+            if t0 is not None:
+                latencies.append((now - t0) * 1000)
+                last_verdict[0] = now
+
+    add_verdict_listener(on_verdict)
+
+    # Command and settings analysis runs on the caller's thread, like their live loops.
+    dispatch = ThreadPoolExecutor(max_workers=8)
+    total = 0
+    failures = []
+    t_start = time.perf_counter()
+    for event in ReplaySource(trace, speed=args.speed):
+        module = monitors.get(event["monitor"])
+        if module is None:
+            continue
+        with lock:
+            sent[(event["monitor"], _event_key(event))] = time.perf_counter()
+        future = dispatch.submit(module.replay_event, event["kind"], event["data"])
+        future.add_done_callback(lambda f: f.exception() and failures.append(f.exception()))
+        total += 1
+    replayed_s = time.perf_counter() - t_start
+
+    deadline = time.time() + args.drain_timeout
+    while time.time() < deadline:
+        with lock:
+            if not sent:
+                break
+        time.sleep(0.05)
+    dispatch.shutdown(wait=False)
+    # Throughput runs to the last verdict, not to the end of the drain timeout.
+    elapsed = max(last_verdict[0], t_start + replayed_s) - t_start
+
+    print(f"trace: {trace}")
+    print(f"events replayed: {total} in {replayed_s:.2f}s; verdicts: {len(latencies)} "
+          f"in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} verdicts/s)")
+    if latencies:
+        ordered = sorted(latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        print(f"event-to-verdict latency: p50 {statistics.median(ordered):.1f} ms | p99 {p99:.1f} ms")
+    print(f"no verdict (shed or coalesced): {len(sent)}")
+    if failures:
+        print(f"replay errors: {len(failures)} (first: {failures[0]!r})")
+    print(f"model requests: {server.requests}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
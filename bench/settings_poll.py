@@ -0,0 +1,90 @@
+"""
+Per-poll cost of settings_monitor's state queries: one fresh shell process
+per query (the old approach) vs one round-trip to the persistent worker.
+Both run against bench/fake_shell.py, so absolute numbers understate
+PowerShell's startup cost; the ratio is the point.
+
+    python bench/settings_poll.py --polls 50
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATE = {"firewall": [{"Name": "Domain", "Enabled": 1}, {"Name": "Private", "Enabled": 1},
+                      {"Name": "Public", "Enabled": 1}],
+         "defender": {"DisableRealtimeMonitoring": False}}
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--polls", type=int, default=50)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-settings-")
+    state_path = os.path.join(tmp, "state.json")
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(STATE, f)
+    shell = [sys.executable, os.path.join(ROOT, "bench", "fake_shell.py"), state_path]
+    os.environ["GUARDRAIL_SETTINGS_SHELL"] = " ".join(shell)
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from monitor import settings_monitor
+
+    spawn_times = []
+    cpu0 = _children_cpu()
+    for i in range(args.polls):
+        t0 = time.perf_counter()
+        for name in settings_monitor.STATE_QUERIES:
+            request = json.dumps({"id": i, "queries": {name: ""}}) + "\n"
+            subprocess.run(shell, input=request, capture_output=True, text=True, check=True)
+        spawn_times.append((time.perf_counter() - t0) * 1000)
+    spawn_cpu = _children_cpu() - cpu0
+
+    worker = settings_monitor._get_worker()
+    settings_monitor._query_state()    # start the worker outside the measurement
+    proc = psutil.Process(worker._proc.pid)
+    cpu0 = sum(proc.cpu_times()[:2])
+    worker_times = []
+    for _ in range(args.polls):
+        t0 = time.perf_counter()
+        fw, defender = settings_monitor._query_state()
+        worker_times.append((time.perf_counter() - t0) * 1000)
+    worker_cpu = sum(proc.cpu_times()[:2]) - cpu0
+    assert fw == {"Domain": 1, "Private": 1, "Public": 1} and defender is True, (fw, defender)
+
+    print(f"{args.polls} polls, 2 state queries each")
+    print(f"process per query: p50 {statistics.median(spawn_times):7.2f} ms/poll, "
+          f"child CPU {spawn_cpu / args.polls * 1000:.1f} ms/poll")
+    print(f"persistent worker: p50 {statistics.median(worker_times):7.2f} ms/poll, "
+          f"worker CPU {worker_cpu / args.polls * 1000:.2f} ms/poll")
+
+    # The worker comes back after a crash.
+    try:
+        worker.query({"crash": ""})
+    except Exception as e:
+        print(f"crash: {e}")
+    import utils.shell_worker
+    utils.shell_worker.RESTART_BACKOFF = 0
+    fw, defender = settings_monitor._query_state()
+    print(f"after restart: firewall={fw} defender={defender} (worker starts: {worker.starts})")
+    worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Enter-to-verdict latency for console commands with and without speculative
+analysis of the partially typed line. Keys are fed to a KeyDispatcher with
+faked win32 functions, at a steady typing speed with one pause mid-command
+and a short pause before Enter; analysis runs against the fake Ollama server.
+
+    python bench/speculation_latency.py --commands 10 --key-delay 0.06 --token-delay 0.02
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_ollama import start_server
+
+CONSOLE_HWND = 1
+
+
+def _commands(mode: str, count: int):
+    """(first word, rest) pairs; the split is where the typist pauses mid-command."""
+    for i in range(count):
+        yield "robocopy ", f"C:\\projects\\{mode}{i} D:\\backup\\{mode}{i} /e"
+
+
+def _type(dispatcher, text: str, key_delay: float):
+    for ch in text:
+        dispatcher.on_key(SimpleNamespace(name=ch, event_type="down"))
+        time.sleep(key_delay)
+
+
+def run(mode: str, args) -> list:
+    from monitor import cmd_monitor
+    from monitor.event_sources import add_verdict_listener
+    from monitor.key_dispatcher import KeyDispatcher, CONSOLE_CLASSES
+    from ai.speculation import Speculator
+
+    dispatcher = KeyDispatcher(foreground=lambda: CONSOLE_HWND, class_name=lambda hwnd: "ConsoleWindowClass",
+                               clipboard=lambda: "", ctrl_pressed=lambda: False)
+    speculator = Speculator("CMD", "command")
+    cmd_monitor._speculator = speculator
+    on_pause = speculator.update if mode == "speculative" else None
+    dispatcher.subscribe("command", CONSOLE_CLASSES, cmd_monitor._on_line, on_pause=on_pause,
+                         debounce=args.debounce)
+    dispatcher.start(hook=False)
+
+    done = {}
+    verdict_seen = threading.Condition()
+
+    def on_verdict(monitor, key, verdict):
+        with verdict_seen:
+            done[key] = time.perf_counter()
+            verdict_seen.notify_all()
+
+    add_verdict_listener(on_verdict)
+    latencies = []
+    for first, rest in _commands(mode, args.commands):
+        command = first + rest
+        _type(dispatcher, first, args.key_delay)
+        time.sleep(args.mid_pause)
+        _type(dispatcher, rest, args.key_delay)
+        time.sleep(args.final_pause)
+        enter = time.perf_counter()
+        dispatcher.on_key(SimpleNamespace(name="enter", event_type="down"))
+        with verdict_seen:
+            if not verdict_seen.wait_for(lambda: command in done, timeout=30):
+                print(f"  no verdict for {command!r}")
+                continue
+        latencies.append((done[command] - enter) * 1000)
+    print(f"{mode:12s} speculations started {speculator.started:3d} | cancelled {speculator.cancelled:3d}")
+    return latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--commands", type=int, default=10)
+    ap.add_argument("--key-delay", type=float, default=0.06, help="seconds between keys")
+    ap.add_argument("--mid-pause", type=float, default=0.6, help="pause after the first word")
+    ap.add_argument("--final-pause", type=float, default=0.5, help="pause before Enter")
+    ap.add_argument("--debounce", type=float, default=0.3)
+    ap.add_argument("--token-delay", type=float, default=0.02)
+    args = ap.parse_args()
+
+    server = start_server(token_delay=args.token_delay)
+    tmp = tempfile.mkdtemp(prefix="guardrail-speculation-")
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["GUARDRAIL_HEADLESS"] = "1"
+    os.environ["GUARDRAIL_VERDICT_CACHE"] = os.path.join(tmp, "verdicts.json")
+    os.environ["GUARDRAIL_SIMILARITY_THRESHOLD"] = "2"
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from ai.semantic_index import semantic_index
+    semantic_index.audit_path = os.path.join(tmp, "semantic_reuse.log")
+    from monitor import cmd_monitor
+    cmd_monitor._ensure_workers()
+
+    results = {}
+    for mode in ("baseline", "speculative"):
+        before = server.requests
+        results[mode] = run(mode, args)
+        print(f"{'':12s} model requests {server.requests - before:3d}")
+    print(f"streams aborted by the client: {server.aborted_streams}")
+    for mode, samples in results.items():
+        if samples:
+            print(f"{mode:12s} Enter->verdict median {statistics.median(samples):8.1f} ms | "
+                  f"max {max(samples):8.1f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Time to first protection: from launching a fresh interpreter until the
+first monitor logs MONITOR_READY, and until every started monitor has.
+"eager" reproduces the old startup (every monitor module and the Ollama
+client imported before the watchdog starts); "lazy" is main.py as it is.
+Monitors that can't run on this platform crash and never report ready;
+on Linux that leaves the process monitor.
+
+    python bench/startup_time.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODULES = ("monitor.cmd_monitor", "monitor.keystroke_monitor", "monitor.process_monitor",
+           "monitor.registry_monitor", "monitor.settings_monitor")
+
+
+def child(mode: str, launched: float, tmp: str, monitors: str, wait: float):
+    """Runs main.main() in this fresh interpreter and prints the ready times as JSON."""
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    ready = {}
+    first = threading.Event()
+
+    def sink(events):
+        for ts, event_type, detail, _fields in events:
+            if event_type == "MONITOR_READY":
+                ready.setdefault(detail.split(":")[0], ts - launched)
+                first.set()
+
+    utils.logger.writer.add_sink(sink)
+    if mode == "eager":
+        import importlib
+        for module in MODULES:
+            importlib.import_module(module)
+        from ai.model_client import model_client
+        model_client.client
+    imported = time.time() - launched
+    import main
+    threading.Thread(target=main.main, args=(["--monitors", monitors],), daemon=True).start()
+    first.wait(30)
+    # Stragglers get `wait` seconds; the log writer delivers events every 0.5 s.
+    time.sleep(wait)
+    print(json.dumps({"imported": imported, "ready": ready}))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def run(mode: str, tmp: str, monitors: str, wait: float) -> dict:
+    env = dict(os.environ, GUARDRAIL_HEADLESS="1", GUARDRAIL_METRICS_PORT="0", GUARDRAIL_EVENT_INDEX="0",
+               OLLAMA_HOST="http://127.0.0.1:9",
+               GUARDRAIL_VERDICT_CACHE=os.path.join(tmp, "verdicts.json"),
+               GUARDRAIL_HASH_CACHE=os.path.join(tmp, "hashes.json"),
+               GUARDRAIL_REGISTRY_BASELINE=os.path.join(tmp, "registry_baseline.bin"),
+               GUARDRAIL_METRICS_SNAPSHOT=os.path.join(tmp, "metrics.json"),
+               GUARDRAIL_TRACE_PATH=os.path.join(tmp, "traces.jsonl"))
+    launched = time.time()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, "--launched", repr(launched),
+                          "--tmp", tmp, "--monitors", monitors, "--wait", str(wait)],
+                         env=env, capture_output=True, text=True, cwd=ROOT, timeout=120)
+    for line in out.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"{mode} run printed no result:\n{out.stdout}\n{out.stderr}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--wait", type=float, default=1.0)
+    ap.add_argument("--child")
+    ap.add_argument("--launched", type=float)
+    ap.add_argument("--tmp")
+    ap.add_argument("--monitors", default=",".join(m.rsplit(".", 1)[1].upper() for m in MODULES))
+    args = ap.parse_args()
+    if args.child:
+        child(args.child, args.launched, args.tmp, args.monitors, args.wait)
+        return
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-startup-")
+    cases = [("eager", args.monitors), ("lazy", args.monitors), ("lazy", "PROCESS_MONITOR")]
+    for mode, monitors in cases:
+        results = [run(mode, tmp, monitors, args.wait) for _ in range(args.runs)]
+        imported = statistics.median(r["imported"] for r in results) * 1000
+        firsts = [min(r["ready"].values()) * 1000 for r in results if r["ready"]]
+        lasts = [max(r["ready"].values()) * 1000 for r in results if r["ready"]]
+        names = sorted({name for r in results for name in r["ready"]})
+        label = f"{mode}, {len(monitors.split(','))} monitor(s)"
+        if not firsts:
+            print(f"{label:22s} no monitor reported ready")
+            continue
+        print(f"{label:22s} imports {imported:6.0f} ms | first ready {statistics.median(firsts):6.0f} ms"
+              f" | all ready {statistics.median(lasts):6.0f} ms | {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Time-to-verdict of analyze_text vs analyze_text_streaming against the fake
+Ollama server.
+
+    python bench/streaming_latency.py --runs 20 --token-delay 0.02
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fake_ollama import start_server
+
+
+def _measure(fn, prompts):
+    times = []
+    for p in prompts:
+        t0 = time.perf_counter()
+        fn(p)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--token-delay", type=float, default=0.02)
+    args = ap.parse_args()
+
+    server = start_server(token_delay=args.token_delay)
+    tmp = tempfile.mkdtemp(prefix="guardrail-bench-")
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ["GUARDRAIL_VERDICT_CACHE"] = os.path.join(tmp, "verdicts.json")
+    # Every run must reach the model: no near-duplicate reuse either.
+    os.environ["GUARDRAIL_SIMILARITY_THRESHOLD"] = "2"
+
+    import utils.logger
+    utils.logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+    from ai.mistral_analysis import analyze_text, analyze_text_streaming
+
+    for label, template in (("safe", "CMD: dir C:\\Users\\{}"), ("dangerous", "CMD: del C:\\temp\\{}.log")):
+        # Distinct prompts per run so the verdict cache never answers.
+        full = _measure(analyze_text, [template.format(f"full{i}") for i in range(args.runs)])
+        streamed = _measure(analyze_text_streaming, [template.format(f"stream{i}") for i in range(args.runs)])
+        print(f"{label:>9}: full p50 {statistics.median(full):7.1f} ms | "
+              f"streaming p50 {statistics.median(streamed):7.1f} ms")
+    print(f"streams closed early by the client: {server.aborted_streams}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
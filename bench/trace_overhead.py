@@ -0,0 +1,65 @@
+"""
+Per-event cost of the tracing hooks: a span with tracing off (the default),
+an untraced event under a 5% sample rate, and a fully traced event.
+
+    python bench/trace_overhead.py --events 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import tracing
+import utils.logger as logger
+
+
+def per_event_ns(fn, events: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(events):
+        pass
+    empty = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(events):
+        fn()
+    return max(0.0, time.perf_counter() - t0 - empty) / events * 1e9
+
+
+def event(spans: int):
+    """One queue event: start a trace, run three spans under it, finish it."""
+    def run():
+        with tracing.activate(tracing.start_trace("bench"), finish=True):
+            for _ in range(spans):
+                with tracing.span("stage"):
+                    pass
+    return run
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=200000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="guardrail-trace-")
+    tracing.TRACE_PATH = os.path.join(tmp, "traces.jsonl")
+    logger.LOG_PATH = os.path.join(tmp, "guardrail_log.txt")
+
+    def bare_span():
+        with tracing.span("stage"):
+            pass
+
+    print(f"span, no trace active:       {per_event_ns(bare_span, args.events):8.0f} ns")
+    for rate in (0.0, 0.05, 1.0):
+        tracing.SAMPLE_RATE = rate
+        ns = per_event_ns(event(3), args.events // (20 if rate == 1.0 else 1))
+        print(f"event with 3 spans, sample {rate:4.2f}: {ns:8.0f} ns")
+    logger.flush()
+    lines = sum(1 for _ in open(tracing.TRACE_PATH, encoding='utf-8'))
+    print(f"{lines} traces written to {tracing.TRACE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
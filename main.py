@@ -1,39 +1,108 @@
+import argparse
+import json
 import os
 import sys
 import threading
+import time
 from utils.logger import log_event
-from utils.watchdog_timer import Watchdog
+from utils.event_store import attach as attach_event_store
+from utils.metrics import metrics
+from utils.profiling import SamplingProfiler, MonitorProfiles, profile_dir
+from utils.watchdog_timer import Watchdog, ISOLATION
 
 # Ensure we can import from subdirectories
 root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(root)
 
-# Import monitor entrypoints
-from monitor.cmd_monitor import start_monitor as start_cmd_monitor
-from monitor.keystroke_monitor import start_monitor as start_keystroke_monitor
-from monitor.process_monitor import start_monitor as start_process_monitor
-from monitor.registry_monitor import start_monitor as start_registry_monitor
-from monitor.settings_monitor import start_monitor as start_settings_monitor
+from ai.model_client import model_client
 
-def main():
+MONITORS_PATH = os.path.join(root, 'config', 'monitors.json')
+
+# Monitor entrypoints, imported by the watchdog when each monitor starts so a
+# disabled monitor costs nothing. The keyboard monitors share one hook and stay
+# in this process; the heavy ones can leave for their own GIL (isolate=True).
+MONITORS = (
+    ("CMD_MONITOR", "monitor.cmd_monitor:start_monitor", False),
+    ("KEYSTROKE_MONITOR", "monitor.keystroke_monitor:start_monitor", False),
+    ("PROCESS_MONITOR", "monitor.process_monitor:start_monitor", True),
+    ("REGISTRY_MONITOR", "monitor.registry_monitor:start_monitor", True),
+    ("SETTINGS_MONITOR", "monitor.settings_monitor:start_monitor", True),
+)
+
+def enabled_monitors(path: str = MONITORS_PATH, only: str = None) -> list:
+    """
+    MONITORS switched on in config/monitors.json (all of them if it can't be
+    read), or exactly those named in `only` ("PROCESS_MONITOR,CMD_MONITOR").
+    """
+    known = {name for name, _, _ in MONITORS}
+    if only:
+        wanted = {name.strip().upper() for name in only.split(",") if name.strip()}
+    else:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                switches = json.load(f).get("monitors", {})
+            wanted = {name for name, on in switches.items() if on}
+        except Exception as e:
+            log_event("MONITOR_CONFIG_ERROR", f"Could not read {path}, starting every monitor: {e}")
+            wanted = known
+    for name in sorted(wanted - known):
+        log_event("MONITOR_CONFIG_ERROR", f"Unknown monitor {name}")
+    return [m for m in MONITORS if m[0] in wanted]
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Guardrail System")
+    ap.add_argument("--profile", choices=("sample", "cprofile"),
+                    help="profile the monitors: folded stacks per thread (sample) or pstats per monitor (cprofile)")
+    ap.add_argument("--profile-dir", help="output directory (default logs/profile/<timestamp>)")
+    ap.add_argument("--profile-seconds", type=float, help="stop after this many seconds instead of Ctrl+C")
+    ap.add_argument("--isolation", choices=("thread", "process"), default=ISOLATION,
+                    help="run the process, registry and settings monitors in their own processes (process)")
+    ap.add_argument("--monitors", default=os.environ.get("GUARDRAIL_MONITORS"),
+                    help="comma-separated monitors to run instead of those enabled in config/monitors.json")
+    args = ap.parse_args(argv)
+    if args.profile and args.isolation == "process":
+        ap.error("--profile only sees this process; use --isolation thread")
+    return args
+
+def main(argv=None):
+    args = _parse_args(argv)
+    # Every logged event is also indexed for `python -m utils.event_store query`.
+    if os.environ.get("GUARDRAIL_EVENT_INDEX", "1") != "0":
+        attach_event_store()
     log_event("SYSTEM_START", "Guardrail System is starting.")
-    wd = Watchdog()
+    sampler = SamplingProfiler() if args.profile == "sample" else None
+    profiles = MonitorProfiles() if args.profile == "cprofile" else None
+    wrap = profiles.wrap if profiles else (lambda name, target: target)
+    wd = Watchdog(args.isolation)
     # Register each monitor. Name must be unique.
-    wd.register("CMD_MONITOR", start_cmd_monitor)
-    wd.register("KEYSTROKE_MONITOR", start_keystroke_monitor)
-    wd.register("PROCESS_MONITOR", start_process_monitor)
-    wd.register("REGISTRY_MONITOR", start_registry_monitor)
-    wd.register("SETTINGS_MONITOR", start_settings_monitor)
+    for name, target, isolate in enabled_monitors(only=args.monitors):
+        wd.register(name, wrap(name, target), isolate=isolate)
 
+    if sampler:
+        sampler.start()
+    # Monitors import and initialise in parallel, each on its own thread (or process).
     wd.start()
+    # /metrics on localhost plus logs/metrics.json; GUARDRAIL_METRICS_PORT=0 keeps only the file.
+    metrics.start()
+    # Load the model in the background while the monitors come up.
+    model_client.preload_async()
 
     # Main thread simply sleeps; everything else is in daemon threads
+    stop_at = time.monotonic() + args.profile_seconds if args.profile_seconds else None
     try:
-        while True:
+        while stop_at is None or time.monotonic() < stop_at:
             threading.Event().wait(1)
     except KeyboardInterrupt:
-        log_event("SYSTEM_STOP", "Guardrail System is shutting down.")
-        wd.stop()
+        pass
+    log_event("SYSTEM_STOP", "Guardrail System is shutting down.")
+    wd.stop()
+    if args.profile:
+        out_dir = args.profile_dir or profile_dir()
+        if sampler:
+            sampler.stop()
+        written = (sampler or profiles).write(out_dir)
+        log_event("PROFILE_WRITTEN", f"{len(written)} profile files in {out_dir}")
+        print(f"Profile written to {out_dir}")
 
 if __name__ == "__main__":
     main()
@@ -1,78 +1,68 @@
-import threading
-import keyboard
-import pyperclip
 import time
-import ctypes
-import win32gui
 from utils.logger import log_event
-from utils.popups import show_popup
-from ai.mistral_analysis import analyze_text
+from utils.popups import show_popup, confirm_popup
+from utils.event_queue import BoundedEventQueue, start_workers
+from monitor.event_sources import record, notify_verdict
+from monitor.key_dispatcher import dispatcher, CONSOLE_CLASSES
+from ai.mistral_analysis import analyze_text_streaming
+from ai.rules import triage
+from ai.speculation import Speculator, DEBOUNCE
 
-cmd_buffer = ""
-buffer_lock = threading.Lock()
-
-def _get_active_window_class():
-    hwnd = win32gui.GetForegroundWindow()
-    if hwnd == 0:
-        return None
-    return win32gui.GetClassName(hwnd)
+# Commands typed into console windows are analysed (and prompted for) in order by one worker.
+_events = BoundedEventQueue("cmd_events", maxsize=64, policy="coalesce")
+_workers_started = False
+# Console input is analysed while it is typed, so Enter usually finds a verdict waiting.
+_speculator = Speculator("CMD", "command")
 
 def _analyze_and_prompt(command: str):
     log_event("CMD_ANALYZE", f"Analyzing command: {command}")
     try:
-        result = analyze_text(f"CMD: {command}")
+        result = triage("command", command) or analyze_text_streaming(
+            f"CMD: {command}",
+            on_reason=lambda v: log_event("CMD_AI_REASON", f"Command: {command} | AI: {v}")
+        )
     except Exception as e:
         log_event("AI_FAIL", f"AI failed: {e}")
         show_popup("Guardrail AI Failure", "AI analysis failed for command.")
         return
 
-    result_lower = result.lower()
-    if any(word in result_lower for word in ["danger", "delete", "harm", "unstable", "risk", "breach"]):
+    notify_verdict("command", command, result)
+    if "rule" not in result:
+        # The local classifier learns from these; non-model verdicts carry markers it skips.
+        log_event("CMD_AI_RESPONSE", f"{command} | AI: {result}")
+    if result.get("DANGEROUS") is True:
         log_event("CMD_FLAGGED", f"Command: {command} | AI Response: {result}")
-        response = ctypes.windll.user32.MessageBoxW(
-            0,
-            f"Dangerous Command Detected:\n\n{command}\n\nAI: {result}\n\nContinue?",
+        allowed = confirm_popup(
             "⚠️ Guardrail",
-            1
+            f"Dangerous Command Detected:\n\n{command}\n\nAI: {result.get('reason', '')}\n\nContinue?"
         )
-        if response == 2:
+        if not allowed:
             log_event("CMD_BLOCKED", f"User blocked command: {command}")
             return
         log_event("CMD_ALLOWED", f"User allowed command: {command}")
     else:
         log_event("CMD_SAFE", f"Command deemed safe: {command}")
 
-def _on_key(event):
-    global cmd_buffer
-    try:
-        active_class = _get_active_window_class()
-        log_event("KEY_EVENT", f"Key: {event.name} | WindowClass: {active_class}")
-        if active_class in ("ConsoleWindowClass", "CASCADIA_HOSTING_WINDOW_CLASS"):
-            if event.event_type == "down":
-                if event.name == "enter":
-                    with buffer_lock:
-                        cmd = cmd_buffer.strip()
-                        cmd_buffer = ""
-                    if cmd:
-                        _analyze_and_prompt(cmd)
-                elif event.name == "backspace":
-                    with buffer_lock:
-                        cmd_buffer = cmd_buffer[:-1]
-                elif event.name == "v" and keyboard.is_pressed("ctrl"):
-                    try:
-                        clip = pyperclip.paste()
-                        with buffer_lock:
-                            cmd_buffer += clip
-                    except Exception as e:
-                        log_event("CLIPBOARD_FAIL", str(e))
-                elif len(event.name) == 1:
-                    with buffer_lock:
-                        cmd_buffer += event.name
-    except Exception as e:
-        log_event("KEY_HOOK_ERROR", str(e))
+def _on_line(command: str):
+    record("command", "CMD", {"command": command})
+    _speculator.finish(command)
+    _events.put(command, key=command)
+
+def _ensure_workers():
+    global _workers_started
+    if not _workers_started:
+        start_workers(_events, lambda command, _count: _analyze_and_prompt(command), count=1)
+        _workers_started = True
+
+def replay_event(kind: str, data: dict):
+    """Feeds a recorded event into the analysis path (trace replay)."""
+    _analyze_and_prompt(data["command"])
 
 def start_monitor():
     log_event("CMD_MONITOR", "Starting keyboard hook...")
-    keyboard.hook(_on_key, suppress=False)
+    _ensure_workers()
+    dispatcher.subscribe("command", CONSOLE_CLASSES, _on_line, on_pause=_speculator.update, debounce=DEBOUNCE)
+    dispatcher.start()
+    log_event("MONITOR_READY", "CMD_MONITOR: console commands are analysed")
     while True:
         time.sleep(1)
@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from utils.logger import log_event
+
+TRACE_VERSION = 1
+# Set to a file path to record every event the monitors hand to analysis.
+TRACE_PATH = os.environ.get("GUARDRAIL_TRACE_FILE")
+
+
+class EventSource:
+    """
+    Something that produces raw monitor events. Live backends (WMI, the proc
+    connector, ...) and trace replay all implement the same iterator, so a
+    monitor loop doesn't care where its events come from.
+    """
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WmiProcessSource(EventSource):
+    """
+    Process creation events from Win32_Process. Process sources yield
+    {"pid", "parent_pid"} dicts, optionally with an "info" snapshot taken at
+    creation, and {"pid", "exited": True} if the backend reports exits.
+    """
+
+    def __init__(self):
+        import wmi  # Windows only; imported here so the module loads anywhere.
+        self._watcher = wmi.WMI().Win32_Process.watch_for("creation")
+
+    def __iter__(self):
+        while True:
+            new_proc = self._watcher()
+            yield {"pid": int(new_proc.ProcessId), "parent_pid": int(new_proc.ParentProcessId)}
+
+
+def default_process_source() -> EventSource:
+    if sys.platform == "win32":
+        return WmiProcessSource()
+    from monitor.linux_sources import linux_process_source
+    return linux_process_source()
+
+
+class TraceRecorder:
+    """
+    Appends monitor events to a JSONL trace: a header line, then one
+    {"t", "monitor", "kind", "data"} object per event with `t` in seconds
+    since recording started.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({"trace_version": TRACE_VERSION,
+                                     "started": datetime.utcnow().isoformat()}) + '\n')
+        self._file.flush()
+
+    def record(self, monitor: str, kind: str, data: dict):
+        line = json.dumps({"t": round(time.monotonic() - self._start, 6),
+                           "monitor": monitor, "kind": kind, "data": data}, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplaySource(EventSource):
+    """
+    Yields the events of a recorded trace. `speed` scales the recorded
+    inter-arrival times (1 = real time, 10 = ten times faster); 0 or less
+    replays as fast as possible.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        start = time.monotonic()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                event = json.loads(line)
+                if "trace_version" in event:
+                    if event["trace_version"] != TRACE_VERSION:
+                        raise ValueError(f"Unsupported trace version {event['trace_version']}")
+                    continue
+                if self.speed > 0:
+                    delay = event["t"] / self.speed - (time.monotonic() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                yield event
+
+
+_recorder = None
+if TRACE_PATH:
+    try:
+        _recorder = TraceRecorder(TRACE_PATH)
+        log_event("TRACE_RECORDING", f"Recording monitor events to {TRACE_PATH}")
+    except Exception as e:
+        log_event("TRACE_RECORDING_ERROR", f"Cannot record to {TRACE_PATH}: {e}")
+
+
+def record(monitor: str, kind: str, data: dict):
+    """Tap point called by monitors right before an event enters analysis."""
+    if _recorder is not None:
+        _recorder.record(monitor, kind, data)
+
+
+_verdict_listeners = []
+
+
+def add_verdict_listener(fn):
+    """`fn(monitor, key, verdict)` is called whenever a monitor reaches a verdict."""
+    _verdict_listeners.append(fn)
+
+
+def notify_verdict(monitor: str, key, verdict: dict):
+    for fn in _verdict_listeners:
+        try:
+            fn(monitor, key, verdict)
+        except Exception as e:
+            log_event("VERDICT_LISTENER_ERROR", str(e))
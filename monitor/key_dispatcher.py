@@ -0,0 +1,211 @@
+import queue
+import threading
+import time
+try:
+    import keyboard
+    import pyperclip
+    import win32gui
+except ImportError:
+    keyboard = pyperclip = win32gui = None
+from utils.logger import log_event
+
+CONSOLE_CLASSES = frozenset({"ConsoleWindowClass", "CASCADIA_HOSTING_WINDOW_CLASS"})
+MAX_LINE = 4096
+PAUSE_POLL = 0.05
+PASTE = object()    # placeholder for Ctrl+V; the clipboard is read off the hook thread
+
+
+class LineBuffer:
+    """
+    Fixed-capacity key buffer without a lock. Only the hook thread changes it;
+    the pause watcher's peek() may read a line that is one key stale, which
+    only means the next pause re-analyses it.
+    """
+    __slots__ = ("_slots", "_len")
+
+    def __init__(self, capacity: int = MAX_LINE):
+        self._slots = [None] * capacity
+        self._len = 0
+
+    def append(self, item):
+        if self._len < len(self._slots):
+            self._slots[self._len] = item
+            self._len += 1
+
+    def backspace(self):
+        if self._len:
+            self._len -= 1
+
+    def peek(self) -> list:
+        return self._slots[:self._len]
+
+    def take(self) -> list:
+        items = self._slots[:self._len]
+        self._len = 0
+        return items
+
+
+class _Sink:
+    __slots__ = ("name", "classes", "include", "on_line", "on_pause", "debounce", "buffer",
+                 "last_key", "dirty")
+
+    def __init__(self, name, classes, include, on_line, on_pause=None, debounce=0.3):
+        self.name = name
+        self.classes = frozenset(classes)
+        self.include = include
+        self.on_line = on_line
+        self.on_pause = on_pause
+        self.debounce = debounce
+        self.buffer = LineBuffer()
+        self.last_key = 0.0
+        self.dirty = False
+
+    def wants(self, window_class) -> bool:
+        return (window_class in self.classes) == self.include
+
+
+class KeyDispatcher:
+    """
+    The one keyboard hook shared by every keystroke-based monitor. The hook
+    callback only looks up the foreground window (its class is cached until
+    focus moves), appends the key to the matching sinks' buffers and, on
+    Enter, hands the finished line to a worker thread. Sinks get their
+    `on_line(text)` calls on that worker, never on the hook thread; sinks
+    with `on_pause` also get the partial line whenever typing pauses.
+    The win32/keyboard functions can be swapped for tests and benchmarks.
+    """
+
+    def __init__(self, foreground=None, class_name=None, clipboard=None, ctrl_pressed=None):
+        self._foreground = foreground
+        self._class_name = class_name
+        self._clipboard = clipboard
+        self._ctrl_pressed = ctrl_pressed
+        self._sinks = {}
+        self._hwnd = None
+        self._window_class = None
+        self._route = ()
+        self._lines = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pause_watcher = None
+        self._hooked = False
+        self.keys = 0
+        self.focus_changes = 0
+
+    def subscribe(self, name: str, classes, on_line, include: bool = True, on_pause=None,
+                  debounce: float = 0.3):
+        """
+        Lines typed into windows whose class is (include=True) or is not
+        (include=False) in `classes` go to `on_line`. `on_pause(text)` gets
+        the unfinished line after `debounce` seconds without a key. Re-subscribing
+        a name replaces it, so a restarted monitor doesn't register twice.
+        """
+        with self._lock:
+            sinks = dict(self._sinks)
+            sinks[name] = _Sink(name, classes, include, on_line, on_pause, debounce)
+            self._sinks = sinks
+            self._hwnd = None    # recompute the route on the next key
+            if on_pause is not None and self._pause_watcher is None:
+                self._pause_watcher = threading.Thread(target=self._pause_loop, name="key-pauses", daemon=True)
+                self._pause_watcher.start()
+
+    def start(self, hook: bool = True):
+        with self._lock:
+            self._foreground = self._foreground or win32gui.GetForegroundWindow
+            self._class_name = self._class_name or win32gui.GetClassName
+            self._clipboard = self._clipboard or pyperclip.paste
+            self._ctrl_pressed = self._ctrl_pressed or (lambda: keyboard.is_pressed("ctrl"))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._line_loop, name="key-lines", daemon=True)
+                self._worker.start()
+            if hook and not self._hooked:
+                keyboard.hook(self.on_key, suppress=False)
+                self._hooked = True
+                log_event("KEY_DISPATCHER", "Keyboard hook installed")
+
+    def on_key(self, event):
+        """
+        Hook callback: constant work per key, no I/O and no locks. The
+        KEY_EVENT audit line only queues on the log writer, which writes it
+        from its own thread.
+        """
+        if event.event_type != "down":
+            return
+        try:
+            hwnd = self._foreground()
+            if hwnd != self._hwnd:
+                window_class = self._class_name(hwnd) if hwnd else None
+                self._route = tuple(s for s in self._sinks.values() if s.wants(window_class))
+                self._hwnd = hwnd
+                self._window_class = window_class
+                self.focus_changes += 1
+            self.keys += 1
+            name = event.name
+            log_event("KEY_EVENT", f"Key: {name} | WindowClass: {self._window_class}")
+            if not name or not self._route:
+                return
+            if name == "enter":
+                for sink in self._route:
+                    items = sink.buffer.take()
+                    if items:
+                        self._lines.put((sink, items))
+                    sink.dirty = False
+            elif name == "backspace":
+                for sink in self._route:
+                    sink.buffer.backspace()
+                    self._typed(sink)
+            elif name == "v" and self._ctrl_pressed():
+                for sink in self._route:
+                    sink.buffer.append(PASTE)
+            elif len(name) == 1:
+                for sink in self._route:
+                    sink.buffer.append(name)
+                    self._typed(sink)
+        except Exception as e:
+            log_event("KEY_HOOK_ERROR", str(e))
+
+    @staticmethod
+    def _typed(sink):
+        if sink.on_pause is not None:
+            sink.last_key = time.monotonic()
+            sink.dirty = True
+
+    def _pause_loop(self):
+        while True:
+            time.sleep(PAUSE_POLL)
+            now = time.monotonic()
+            for sink in self._sinks.values():
+                if not sink.dirty or now - sink.last_key < sink.debounce:
+                    continue
+                sink.dirty = False
+                items = sink.buffer.peek()
+                # Pasted text is only read from the clipboard for finished lines.
+                if not items or PASTE in items:
+                    continue
+                try:
+                    sink.on_pause("".join(items))
+                except Exception as e:
+                    log_event("KEY_PAUSE_ERROR", f"{sink.name}: {e}")
+
+    def _line_loop(self):
+        while True:
+            sink, items = self._lines.get()
+            try:
+                if PASTE in items:
+                    clip = self._paste()
+                    items = [clip if item is PASTE else item for item in items]
+                text = "".join(items).strip()
+                if text:
+                    sink.on_line(text)
+            except Exception as e:
+                log_event("KEY_LINE_ERROR", f"{sink.name}: {e}")
+
+    def _paste(self) -> str:
+        try:
+            return self._clipboard() or ""
+        except Exception as e:
+            log_event("CLIPBOARD_FAIL", str(e))
+            return ""
+
+
+dispatcher = KeyDispatcher()
@@ -1,72 +1,47 @@
-import threading
-import keyboard
-import pyperclip
 import time
-import win32gui
 from utils.logger import log_event
 from utils.popups import show_popup
 from ai.mistral_analysis import analyze_text
+from ai.rules import triage
+from utils.event_queue import BoundedEventQueue, start_workers
+from monitor.event_sources import record, notify_verdict
+from monitor.key_dispatcher import dispatcher, CONSOLE_CLASSES
 
-buffer = ""
-buffer_lock = threading.Lock()
-
-def get_active_window_class():
-    try:
-        hwnd = win32gui.GetForegroundWindow()
-        return win32gui.GetClassName(hwnd) if hwnd else None
-    except:
-        return None
+# Submitted lines wait here for analysis instead of each getting its own thread.
+_events = BoundedEventQueue("keystroke_events", maxsize=64, policy="drop_lowest")
+_workers_started = False
 
 def analyze_input_async(source, content):
     try:
-        result = analyze_text(f"{source}: {content}")
-        if any(word in result.lower() for word in ["danger", "risky", "harm", "breach", "unauthorized"]):
-            show_popup(f"Guardrail Alert: Suspicious Input ({source})", result)
+        result = triage("command", content) or analyze_text(f"{source}: {content}")
+        notify_verdict("keystroke", content, result)
+        if result.get("DANGEROUS") is True:
+            show_popup(f"Guardrail Alert: Suspicious Input ({source})", result.get("reason", ""))
             log_event("KEYSTROKE_FLAGGED", f"{source}: {content} | AI_response: {result}")
     except Exception as e:
         log_event("ANALYSIS_ERROR", str(e))
 
-def flush_buffer():
-    global buffer
-    with buffer_lock:
-        content = buffer.strip()
-        buffer = ""
-    return content
-
-def handle_key(event):
-    global buffer
-    try:
-        if event.event_type != "down":
-            return
-
-        if get_active_window_class() == "ConsoleWindowClass":
-            return  # Ignore CMD input
+def _on_line(content: str):
+    record("keystroke", "NON-CMD_WINDOW", {"content": content})
+    _events.put(("NON-CMD_WINDOW", content), key=content)
 
-        key = event.name
+def _ensure_workers():
+    global _workers_started
+    if not _workers_started:
+        start_workers(_events, lambda event, _count: analyze_input_async(*event), count=1)
+        _workers_started = True
 
-        with buffer_lock:
-            if key == "enter":
-                content = flush_buffer()
-                if content:
-                    threading.Thread(
-                        target=analyze_input_async,
-                        args=("NON-CMD_WINDOW", content),
-                        daemon=True
-                    ).start()
-            elif key == "backspace":
-                buffer = buffer[:-1]
-            elif key == "v" and keyboard.is_pressed("ctrl"):
-                try:
-                    buffer += pyperclip.paste()
-                except:
-                    pass
-            elif len(key) == 1:
-                buffer += key
-    except Exception as e:
-        log_event("KEY_HANDLER_ERROR", str(e))
+def replay_event(kind: str, data: dict):
+    """Feeds a recorded event into the analysis path (trace replay)."""
+    _ensure_workers()
+    _events.put((kind, data["content"]), key=data["content"])
 
 def start_monitor():
-    keyboard.hook(handle_key, suppress=False)
+    _ensure_workers()
+    # Console windows belong to cmd_monitor.
+    dispatcher.subscribe("keystroke", CONSOLE_CLASSES, _on_line, include=False)
+    dispatcher.start()
+    log_event("MONITOR_READY", "KEYSTROKE_MONITOR: typed lines are analysed")
     print("[Guardrail] Keystroke monitor is running.")
     while True:
         time.sleep(0.2)
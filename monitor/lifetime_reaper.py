@@ -0,0 +1,95 @@
+import heapq
+import threading
+import time
+import psutil
+from utils.logger import log_event
+
+SHORT_LIVED_WINDOW = 5.0   # processes exiting sooner than this are "short-lived"
+SWEEP_INTERVAL = 0.5
+
+
+class LifetimeReaper:
+    """
+    Tracks every newly created process from a single thread. Each sweep takes
+    one psutil.pids() snapshot and checks all tracked PIDs against it; a heap
+    of deadlines retires PIDs that outlived the short-lived window. Thread
+    count and wakeups stay constant no matter how many processes are in flight.
+    """
+
+    def __init__(self, window: float = SHORT_LIVED_WINDOW, interval: float = SWEEP_INTERVAL):
+        self.window = window
+        self.interval = interval
+        self._tracked = {}    # pid → (started_at, on_short_lived)
+        self._deadlines = []  # heap of (deadline, pid, started_at)
+        self._cond = threading.Condition()
+        self._thread = None
+        self.exits_detected = 0
+        self.retired = 0
+
+    def track(self, pid: int, on_short_lived, started_at: float = None):
+        """`on_short_lived(duration)` is called from the reaper thread if `pid` exits within the window."""
+        started_at = time.time() if started_at is None else started_at
+        with self._cond:
+            self._tracked[pid] = (started_at, on_short_lived)
+            heapq.heappush(self._deadlines, (started_at + self.window, pid, started_at))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="lifetime-reaper", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def exited(self, pid: int, at: float = None):
+        """Exit reported by the event source; handled now instead of on the next sweep."""
+        at = time.time() if at is None else at
+        with self._cond:
+            entry = self._tracked.pop(pid, None)
+            if entry is None:
+                return
+            self.exits_detected += 1
+        started_at, callback = entry
+        if at - started_at < self.window:
+            try:
+                callback(at - started_at)
+            except Exception as e:
+                log_event("LIFETIME_CALLBACK_ERROR", str(e))
+
+    def tracked_count(self) -> int:
+        with self._cond:
+            return len(self._tracked)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._tracked:
+                    self._cond.wait()
+            time.sleep(self.interval)
+            try:
+                self._sweep()
+            except Exception as e:
+                log_event("LIFETIME_REAPER_ERROR", str(e))
+
+    def _sweep(self):
+        alive = set(psutil.pids())
+        now = time.time()
+        exited = []
+        with self._cond:
+            for pid, (started_at, callback) in list(self._tracked.items()):
+                if pid not in alive:
+                    del self._tracked[pid]
+                    exited.append((callback, now - started_at))
+            # Whatever is still running past its deadline can no longer be short-lived.
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, pid, started_at = heapq.heappop(self._deadlines)
+                entry = self._tracked.get(pid)
+                # The started_at check skips stale heap entries left by PID reuse.
+                if entry is not None and entry[0] == started_at:
+                    del self._tracked[pid]
+                    self.retired += 1
+            self.exits_detected += len(exited)
+
+        # Callbacks run outside the lock; they only enqueue events.
+        for callback, duration in exited:
+            if duration < self.window:
+                try:
+                    callback(duration)
+                except Exception as e:
+                    log_event("LIFETIME_CALLBACK_ERROR", str(e))
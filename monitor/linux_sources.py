@@ -0,0 +1,246 @@
+import errno
+import os
+import pwd
+import queue
+import socket
+import struct
+import threading
+import time
+from monitor.event_sources import EventSource
+from utils.logger import log_event
+
+# linux/connector.h, linux/cn_proc.h
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+_NLMSGHDR = struct.Struct("=IHHII")        # len, type, flags, seq, pid
+_CN_MSG = struct.Struct("=IIIIHH")         # idx, val, seq, ack, len, flags
+_PROC_EVENT = struct.Struct("=IIQ")        # what, cpu, timestamp_ns
+_TWO_PIDS = struct.Struct("=ii")
+_FOUR_PIDS = struct.Struct("=iiii")
+
+RECV_BUFFER = 64 * 1024
+SOCKET_RCVBUF = 8 << 20    # room for a fork storm while the consumer is busy
+SCAN_INTERVAL = 0.05
+MAX_FORK_PARENTS = 65536
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_boot_time = None
+_usernames = {}
+
+
+def _btime() -> float:
+    global _boot_time
+    if _boot_time is None:
+        with open("/proc/stat", "rb") as f:
+            for line in f:
+                if line.startswith(b"btime"):
+                    _boot_time = float(line.split()[1])
+                    break
+    return _boot_time
+
+
+def _username(uid: int) -> str:
+    name = _usernames.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _usernames[uid] = name
+    return name
+
+
+def read_proc_snapshot(pid: int):
+    """
+    Reads a process straight from /proc in the same shape as a psutil
+    snapshot (pid, ppid, name, exe, cmdline, username, create_time), or None
+    if it is already gone. Much cheaper than psutil, which matters when the
+    process may only live for a few milliseconds.
+    """
+    base = f"/proc/{pid}/"
+    try:
+        with open(base + "stat", "rb") as f:
+            stat = f.read()
+        uid = os.stat(base).st_uid
+    except OSError:
+        return None
+    # comm is parenthesised and may itself contain spaces or parentheses.
+    lpar, rpar = stat.find(b"("), stat.rfind(b")")
+    fields = stat[rpar + 2:].split()
+    info = {
+        "pid": pid,
+        "ppid": int(fields[1]),
+        "name": stat[lpar + 1:rpar].decode("utf-8", "replace"),
+        # Same arithmetic as psutil so keys match records from load_running().
+        "create_time": (float(fields[19]) / _CLK_TCK) + _btime(),
+        "username": _username(uid),
+        "exe": "",
+        "cmdline": [],
+    }
+    try:
+        with open(base + "cmdline", "rb") as f:
+            info["cmdline"] = [a.decode("utf-8", "replace") for a in f.read().split(b"\0") if a]
+    except OSError:
+        pass
+    try:
+        info["exe"] = os.readlink(base + "exe")
+    except OSError:
+        pass
+    return info
+
+
+def _partial_snapshot(pid: int, ppid: int, fork_ns: int) -> dict:
+    """
+    What the events tell us about a process that exited before /proc could be
+    read. `fork_ns` is the fork event's timestamp (nanoseconds since boot):
+    the kernel's start time is taken at fork, not exec, and rounding it to
+    clock ticks like /proc's starttime gives the create_time psutil and
+    read_proc_snapshot report for the same process.
+    """
+    return {"pid": pid, "ppid": ppid, "name": "Unknown", "exe": "", "cmdline": [], "username": None,
+            "create_time": (float(fork_ns * _CLK_TCK // 1_000_000_000) / _CLK_TCK) + _btime()}
+
+
+class ProcConnectorSource(EventSource):
+    """
+    Exec/exit events from the kernel proc connector (netlink). Needs
+    CAP_NET_ADMIN. A reader thread drains the socket and snapshots each exec
+    from /proc straight away, independent of how fast the monitor consumes
+    events; processes gone before the snapshot are still reported with what
+    the events carry (pid, parent, start time). Exits are reported too, which
+    lets short-lived detection skip polling.
+    """
+
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            try:
+                self._sock.setsockopt(socket.SOL_SOCKET, 33, SOCKET_RCVBUF)   # SO_RCVBUFFORCE
+            except OSError:
+                self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
+            self._sock.bind((os.getpid(), CN_IDX_PROC))
+            self._control(PROC_CN_MCAST_LISTEN)
+        except OSError:
+            self._sock.close()
+            raise
+        # child tgid → (parent tgid, fork timestamp), for children that exit before we read /proc
+        self._fork_parents = {}
+        self._events = queue.SimpleQueue()
+        self.lost = 0              # events dropped by the kernel because the socket buffer overflowed
+        self.partial = 0           # execs that exited before /proc could be read
+        self._reader = threading.Thread(target=self._read_loop, name="proc-connector", daemon=True)
+        self._reader.start()
+
+    def _control(self, op: int):
+        payload = struct.pack("=I", op)
+        cn = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0)
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(cn) + len(payload), NLMSG_DONE, 0, 0, os.getpid())
+        self._sock.send(header + cn + payload)
+
+    def _read_loop(self):
+        while True:
+            try:
+                data = self._sock.recv(RECV_BUFFER)
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    self.lost += 1
+                    log_event("PROC_CONNECTOR_OVERRUN", "Kernel dropped process events (socket buffer full)")
+                    continue
+                if e.errno != errno.EBADF:   # EBADF: closed by close()
+                    log_event("PROC_CONNECTOR_ERROR", str(e))
+                self._events.put(None)
+                return
+            for event in self._parse(data):
+                self._events.put(event)
+
+    def __iter__(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def _parse(self, data: bytes):
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            length = _NLMSGHDR.unpack_from(data, offset)[0]
+            if length < _NLMSGHDR.size:
+                break
+            event_at = offset + _NLMSGHDR.size + _CN_MSG.size
+            what, _, timestamp_ns = _PROC_EVENT.unpack_from(data, event_at)
+            body = event_at + _PROC_EVENT.size
+            if what == PROC_EVENT_FORK:
+                _, parent_tgid, child_pid, child_tgid = _FOUR_PIDS.unpack_from(data, body)
+                if child_pid == child_tgid:   # new process, not a new thread
+                    if len(self._fork_parents) >= MAX_FORK_PARENTS:
+                        self._fork_parents.clear()
+                    self._fork_parents[child_tgid] = (parent_tgid, timestamp_ns)
+            elif what == PROC_EVENT_EXEC:
+                pid, tgid = _TWO_PIDS.unpack_from(data, body)
+                if pid == tgid:
+                    info = read_proc_snapshot(tgid)
+                    if info is None:
+                        self.partial += 1
+                        # Without the fork (e.g. it was dropped) the exec time is the closest we have.
+                        ppid, fork_ns = self._fork_parents.get(tgid, (0, timestamp_ns))
+                        info = _partial_snapshot(tgid, ppid, fork_ns)
+                    yield {"pid": tgid, "parent_pid": info["ppid"], "info": info}
+            elif what == PROC_EVENT_EXIT:
+                pid, tgid = _TWO_PIDS.unpack_from(data, body)
+                if pid == tgid:
+                    self._fork_parents.pop(tgid, None)
+                    yield {"pid": tgid, "exited": True}
+            offset += (length + 3) & ~3
+
+    def close(self):
+        try:
+            self._control(PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+class ProcScanSource(EventSource):
+    """
+    Fallback for hosts without the proc connector: diffs the PID set from a
+    /proc listing every `interval` seconds. Processes that live shorter than
+    the interval can be missed entirely.
+    """
+
+    def __init__(self, interval: float = SCAN_INTERVAL):
+        self.interval = interval
+        self._known = self._pids()
+
+    @staticmethod
+    def _pids() -> set:
+        return {int(name) for name in os.listdir("/proc") if name.isdigit()}
+
+    def __iter__(self):
+        while True:
+            time.sleep(self.interval)
+            current = self._pids()
+            for pid in sorted(current - self._known):
+                info = read_proc_snapshot(pid)
+                yield {"pid": pid, "parent_pid": info["ppid"] if info else 0, "info": info}
+            for pid in self._known - current:
+                yield {"pid": pid, "exited": True}
+            self._known = current
+
+
+def linux_process_source() -> EventSource:
+    """The proc connector where permitted, otherwise the /proc scanner."""
+    try:
+        source = ProcConnectorSource()
+        log_event("PROCESS_SOURCE", "Using kernel proc connector")
+        return source
+    except OSError as e:
+        log_event("PROCESS_SOURCE", f"Proc connector unavailable ({e}); falling back to /proc scanning")
+        return ProcScanSource()
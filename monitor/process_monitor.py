@@ -1,172 +1,222 @@
-import threading
 import time
-import psutil
-import wmi
-import hashlib
 import json
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
 from pathlib import Path
-from utils.logger import log_event
+from utils.logger import log_event, log_line
+from utils.event_store import ai_interaction_event
 from utils.popups import show_popup
 from ai.mistral_analysis import analyze_text
+from ai.rules import triage_process
+from ai.model_client import model_client
+from utils.event_queue import BoundedEventQueue, start_workers
+from monitor.lifetime_reaper import LifetimeReaper
+from monitor.process_table import ProcessTable
+from monitor.event_sources import default_process_source, record, notify_verdict
+from utils.hash_cache import hash_cache
+from utils.metrics import metrics
+from utils.tracing import activate, start_trace, span
 
-_c = wmi.WMI()
 AI_LOG_FILE = Path("D:/pycharm/guardrail_system/logs/ai_interactions.log")
 
+# Creation events are analysed off the watcher thread through a bounded queue,
+# so a process storm sheds load instead of growing an unbounded backlog.
+EVENT_QUEUE_SIZE = 512
+EVENT_QUEUE_POLICY = os.environ.get("GUARDRAIL_PROCESS_QUEUE_POLICY", "coalesce")
+ANALYSIS_WORKERS = 2
 
-def _ensure_log_dir():
-    """Ensure the log directory exists."""
-    AI_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+HASH_WAIT = 10.0   # seconds an analysis worker waits for a pending executable hash
 
+PRIORITY_SHORT_LIVED = 0
+PRIORITY_CREATION = 1
 
-def _log_ai_interaction(process_info: dict, ai_response: str, analysis_type: str):
+_events = BoundedEventQueue("process_events", EVENT_QUEUE_SIZE, EVENT_QUEUE_POLICY)
+# One thread watches the lifetime of every new process.
+_reaper = LifetimeReaper()
+# Lineage of every known process, keyed by (pid, create_time).
+_table = ProcessTable()
+_workers_started = False
+_hash_wait = metrics.histogram("guardrail_stage_seconds", stage="hashing", queue="process_events")
+_hash_timeouts = metrics.counter("guardrail_hash_timeouts_total")
+
+
+def _log_ai_interaction(process_info: dict, ai_response: str, analysis_type: str, prompt: str = ""):
     """Log AI interaction to a dedicated log file."""
-    _ensure_log_dir()
     try:
         log_entry = {
             "timestamp": datetime.utcnow().isoformat(),
             "type": analysis_type,
+            "prompt": prompt,
             "process_info": process_info,
             "ai_response": ai_response
         }
 
-        with open(AI_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        log_line(AI_LOG_FILE, json.dumps(log_entry), ai_interaction_event(log_entry))
     except Exception as e:
         log_event("AI_LOG_ERROR", f"Failed to log AI interaction: {str(e)}")
 
 
-def _compute_sha256(path: str) -> str:
+def _resolve_sha256(process_info: dict, sha_future):
+    """Fill in the executable hash once the hashing pool has it, waiting at most HASH_WAIT."""
+    if sha_future is None or process_info["sha256"] != "PENDING":
+        return
+    started = time.perf_counter()
+    try:
+        with span("hash.wait"):
+            process_info["sha256"] = sha_future.result(timeout=HASH_WAIT)
+    except FutureTimeout:
+        # Still hashing (huge binary or slow disk); analyse without it rather than stall.
+        _hash_timeouts.inc()
+    _hash_wait.observe(time.perf_counter() - started)
+
+
+def _event_key(kind: str, process_info: dict):
+    # Identical launches (same binary, parent and arguments) share one analysis.
+    return (kind, process_info["name"], process_info["parent_name"], process_info["command_line"])
+
+
+def _analyze_process_event(event: dict, count: int = 1):
+    process_info = event["process_info"]
+    to_ai = event["to_ai"]
+    pid = process_info["pid"]
+    _resolve_sha256(process_info, event.get("sha256_future"))
+    if event["type"] == "SHORT_LIVED":
+        analysis_text = f"SHORT_LIVED from {process_info['parent_name']}: {to_ai}"
+        log_type, title, flag_type, what = ("SHORT_LIVED_ANALYSIS", "Guardrail Alert: Short-lived Process",
+                                            "SHORT_LIVED_FLAGGED", "short-lived process")
+    else:
+        analysis_text = f"PROCESS_CREATION: {to_ai}"
+        log_type, title, flag_type, what = ("PROCESS_CREATION_ANALYSIS", "Guardrail Alert: New Process Flagged",
+                                            "PROCESS_FLAGGED", "process creation")
     try:
-        hasher = hashlib.sha256()
-        with open(path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                hasher.update(chunk)
-        return hasher.hexdigest()
-    except:
-        return "N/A"
+        result = triage_process(process_info["name"], process_info["parent_name"],
+                                process_info.get("executable", "")) or analyze_text(analysis_text)
 
+        _log_ai_interaction(process_info, result, log_type, analysis_text)
+        notify_verdict("process", (event["type"], pid), result)
 
-def _monitor_loop():
-    process_watcher = _c.Win32_Process.watch_for("creation")
+        if result.get("DANGEROUS") is True:
+            show_popup(title, result.get("reason", ""))
+            repeats = f" (x{count})" if count > 1 else ""
+            log_event(flag_type,
+                      f"PID: {pid}{repeats} Parent: {process_info['parent_name']} Cmd: {process_info['command_line']} SHA256: {process_info['sha256']} | AI: {result}")
+    except Exception as e:
+        error_msg = f"AI analysis failed for {what}: {str(e)}"
+        log_event("AI_ANALYSIS_ERROR", error_msg)
+        show_popup("Guardrail AI Failure",
+                   f"AI analysis failed for {what}. Restarting AI service.")
+        if not model_client.health_check():
+            log_event("AI_SERVICE_RESTART_FAILED", "Model server health check failed.")
+
+
+def _enqueue(kind: str, process_info: dict, to_ai: str, priority: int, sha_future=None):
+    if sha_future is not None and sha_future.done():
+        _resolve_sha256(process_info, sha_future)
+    record("process", kind, {"process_info": process_info, "to_ai": to_ai})
+    event = {"type": kind, "process_info": process_info, "to_ai": to_ai, "sha256_future": sha_future}
+    _events.put(event, priority, _event_key(kind, process_info))
+
+
+def replay_event(kind: str, data: dict):
+    """Feeds a recorded event into the analysis path (trace replay)."""
+    _ensure_workers()
+    info = dict(data["process_info"])
+    if info.get("sha256") == "PENDING":
+        info["sha256"] = "N/A"
+    priority = PRIORITY_SHORT_LIVED if kind == "SHORT_LIVED" else PRIORITY_CREATION
+    event = {"type": kind, "process_info": info, "to_ai": data["to_ai"], "sha256_future": None}
+    _events.put(event, priority, _event_key(kind, info))
+
+
+def _handle_new_process(pid: int, parent_pid: int, info: dict = None):
+    # A sampled trace starts at intake and travels with the creation event through the queue.
+    with activate(start_trace("process", pid=pid)):
+        _intake_process(pid, parent_pid, info)
+
+
+def _intake_process(pid: int, parent_pid: int, info: dict = None):
+    # One snapshot per new process (taken by the source if it can); parent and ancestry come from the table.
+    with span("process.snapshot"):
+        rec = _table.observe(pid, parent_pid, info)
+    if rec is None:
+        log_event("PROCESS_ERROR", f"Failed to access process {pid}: process already exited")
+        return
+
+    # Hashing happens on the pool (or comes from the hash cache); the event carries the future.
+    sha_future = hash_cache.submit(rec.exe) if rec.exe else None
+    if sha_future is not None:
+        sha_future.add_done_callback(lambda f, r=rec: setattr(r, "sha256", f.result()))
+
+    parent = _table.parent(rec)
+    chain = _table.ancestry(rec)
+    if parent is None and parent_pid:
+        log_event("PARENT_PROCESS_ERROR", f"Failed to access parent process {parent_pid}")
+
+    process_info = {
+        "pid": pid,
+        "name": rec.name,
+        "parent_pid": rec.ppid or parent_pid,
+        "command_line": rec.cmdline,
+        "executable": rec.exe,
+        "sha256": "PENDING" if sha_future else "N/A",
+        "username": rec.username,
+        "parent_name": parent.name.lower() if parent else "Unknown",
+        "parent_chain": [p.name for p in chain]
+    }
+
+    # Prepare AI analysis text, oldest ancestor first
+    to_ai = f"NewProcess Name: {rec.name} PID: {pid}"
+    if chain:
+        to_ai += " Parents: " + " > ".join(p.name for p in reversed(chain))
+
+    def _on_short_lived(duration, info=process_info, text=to_ai, sha=sha_future, key=rec.key):
+        _table.exited(*key)
+        _enqueue("SHORT_LIVED", info, text, PRIORITY_SHORT_LIVED, sha)
+
+    # Watch lifetime; exits within the short-lived window are queued for analysis
+    _reaper.track(pid, _on_short_lived)
+
+    # Hand creation analysis to the workers; the watcher goes straight back to its event source.
+    _enqueue("PROCESS_CREATION", process_info, to_ai, PRIORITY_CREATION, sha_future)
+
+
+def _monitor_loop(source=None):
+    live = source is None
+    source = source or default_process_source()
+    if live:
+        log_event("MONITOR_READY", "PROCESS_MONITOR: new processes are analysed")
     while True:
-        # Initialize variables with default values at the start of each iteration
-        proc = None
-        process_info = {
-            "pid": 0,
-            "name": "Unknown",
-            "parent_pid": 0,
-            "command_line": "",
-            "executable": "",
-            "sha256": "N/A",
-            "username": "N/A",
-            "parent_name": "Unknown"
-        }
-        to_ai = ""
-        parent_name = "Unknown"
-        cmdline = ""
-
         try:
-            new_proc = process_watcher()
-            pid = int(new_proc.ProcessId)
-            parent_pid = int(new_proc.ParentProcessId)
-
-            # Update basic process info
-            process_info.update({
-                "pid": pid,
-                "parent_pid": parent_pid
-            })
-
-            try:
-                proc = psutil.Process(pid)
-
-                # Update process_info with actual process data
-                cmdline = " ".join(proc.cmdline()) if proc and proc.cmdline() else ""
-                exe = proc.exe() if proc else ""
-                sha256 = _compute_sha256(exe) if exe else "N/A"
-                process_name = proc.name() if proc else 'Unknown'
-
-                process_info.update({
-                    "name": process_name,
-                    "command_line": cmdline,
-                    "executable": exe,
-                    "sha256": sha256,
-                    "username": proc.username() if hasattr(proc, 'username') and callable(proc.username) else "N/A"
-                })
-
-                # Get parent process name if possible
-                try:
-                    parent = psutil.Process(parent_pid)
-                    parent_name = parent.name().lower()
-                    process_info["parent_name"] = parent_name
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    log_event("PARENT_PROCESS_ERROR", f"Failed to access parent process {parent_pid}: {str(e)}")
-
-                # Prepare AI analysis text
-                to_ai = f"NewProcess Name: {process_name} PID: {pid}"
-
-                def check_lifetime():
-                    nonlocal process_info, to_ai
-                    start_time = time.time()
-                    while True:
-                        if not psutil.pid_exists(pid):
-                            duration = time.time() - start_time
-                            if duration < 5:
-                                try:
-                                    analysis_text = f"SHORT_LIVED from {process_info['parent_name']}: {to_ai}"
-                                    result = analyze_text(analysis_text)
-
-                                    _log_ai_interaction(process_info, result, "SHORT_LIVED_ANALYSIS")
-
-                                    lower = result.lower()
-                                    if any(k in lower for k in ["danger", "malware", "suspicious", "harm"]):
-                                        show_popup("Guardrail Alert: Short-lived Process", result)
-                                        log_event("SHORT_LIVED_FLAGGED",
-                                                  f"PID: {pid} Parent: {process_info['parent_name']} Cmd: {process_info['command_line']} SHA256: {process_info['sha256']} | AI: {result}")
-                                except Exception as e:
-                                    error_msg = f"AI analysis failed for short-lived process: {str(e)}"
-                                    log_event("AI_ANALYSIS_ERROR", error_msg)
-                                    show_popup("Guardrail AI Failure",
-                                               "AI analysis failed for short-lived process. Restarting AI service.")
-                                    try:
-                                        analyze_text("ping")
-                                    except Exception as e:
-                                        log_event("AI_SERVICE_RESTART_FAILED", str(e))
-                            return
-                        time.sleep(0.5)
-
-                # Spawn a thread to watch lifetime
-                threading.Thread(target=check_lifetime, daemon=True).start()
-
-                # Immediately analyze creation
-                try:
-                    analysis_text = f"PROCESS_CREATION: {to_ai}"
-                    result = analyze_text(analysis_text)
-
-                    _log_ai_interaction(process_info, result, "PROCESS_CREATION_ANALYSIS")
-
-                    lower = result.lower()
-                    if any(k in lower for k in ["danger", "suspicious", "unauthorized"]):
-                        show_popup("Guardrail Alert: New Process Flagged", result)
-                        log_event("PROCESS_FLAGGED",
-                                  f"PID: {pid} Parent: {process_info['parent_name']} Cmd: {process_info['command_line']} SHA256: {process_info['sha256']} | AI: {result}")
-                except Exception as e:
-                    error_msg = f"AI analysis failed for process creation: {str(e)}"
-                    log_event("AI_ANALYSIS_ERROR", error_msg)
-                    show_popup("Guardrail AI Failure",
-                               "AI analysis failed for process creation. Restarting AI service.")
-                    try:
-                        analyze_text("ping")
-                    except Exception as e:
-                        log_event("AI_SERVICE_RESTART_FAILED", str(e))
-
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                log_event("PROCESS_ERROR", f"Failed to access process {pid}: {str(e)}")
-                continue
-
+            for event in source:
+                if event.get("exited"):
+                    _reaper.exited(event["pid"])
+                    _table.exited(event["pid"])
+                else:
+                    _handle_new_process(event["pid"], event["parent_pid"], event.get("info"))
+            if not live:
+                return
+            log_event("PROCESS_MONITOR_ERROR", "Process event source stopped; reopening")
+            source.close()
+            source = default_process_source()
         except Exception as e:
             log_event("PROCESS_MONITOR_ERROR", str(e))
             time.sleep(1)
 
+
+def queue_stats() -> dict:
+    return _events.stats()
+
+
+def _ensure_workers():
+    global _workers_started
+    if not _workers_started:
+        start_workers(_events, _analyze_process_event, ANALYSIS_WORKERS)
+        _workers_started = True
+
+
 def start_monitor():
-    _monitor_loop()
\ No newline at end of file
+    if not _workers_started:
+        _table.load_running()
+    _ensure_workers()
+    _monitor_loop()
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+import psutil
+from utils.logger import log_event
+
+SNAPSHOT_ATTRS = ["pid", "ppid", "name", "exe", "cmdline", "username", "create_time"]
+MAX_CHAIN = 8
+RETAIN_EXITED = 2048      # exited records kept so children can still resolve their ancestry
+PRUNE_INTERVAL = 30.0
+# create_time resolution differs per platform; a parent can appear to start a hair after its child.
+CREATE_TIME_SLACK = 0.5
+
+
+class ProcessRecord:
+    __slots__ = ("pid", "create_time", "ppid", "parent_key", "name", "exe", "cmdline",
+                 "username", "sha256", "exited")
+
+    def __init__(self, pid, create_time, ppid, name, exe, cmdline, username):
+        self.pid = pid
+        self.create_time = create_time
+        self.ppid = ppid
+        self.parent_key = None
+        self.name = name
+        self.exe = exe
+        self.cmdline = cmdline
+        self.username = username
+        self.sha256 = "N/A"
+        self.exited = False
+
+    @property
+    def key(self):
+        return self.pid, self.create_time
+
+
+class ProcessTable:
+    """
+    In-memory process table keyed by (pid, create_time), so a reused PID is
+    never confused with the process that held it before. Records are filled
+    from single-pass psutil snapshots and linked to their parent record, which
+    makes ancestry lookups O(1) per hop without further syscalls.
+    """
+
+    def __init__(self):
+        self._records = {}            # (pid, create_time) → ProcessRecord
+        self._live = {}               # pid → key of the process currently holding that PID
+        self._exited = deque()
+        self._lock = threading.RLock()
+        self._last_prune = time.monotonic()
+
+    def load_running(self):
+        """Seeds the table with every running process in one psutil pass."""
+        count = 0
+        for proc in psutil.process_iter(SNAPSHOT_ATTRS, ad_value=None):
+            self._insert(proc.info)
+            count += 1
+        with self._lock:
+            for rec in self._records.values():
+                self._link_parent(rec)
+        log_event("PROCESS_TABLE_LOADED", f"{count} running processes indexed")
+
+    def observe(self, pid: int, ppid_hint: int = None, info: dict = None):
+        """
+        Snapshot a (new) process and return its record, or None if it is
+        already gone. Reuses the existing record if this exact process is known.
+        `info` is a snapshot the event source already took (SNAPSHOT_ATTRS keys).
+        """
+        self._maybe_prune()
+        if info is None:
+            try:
+                info = psutil.Process(pid).as_dict(SNAPSHOT_ATTRS, ad_value=None)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                return None
+        if info.get("ppid") is None:
+            info["ppid"] = ppid_hint
+        rec = self._insert(info)
+        with self._lock:
+            self._link_parent(rec)
+        return rec
+
+    def _insert(self, info: dict) -> ProcessRecord:
+        key = (info["pid"], info["create_time"])
+        with self._lock:
+            rec = self._records.get(key)
+            if rec is None:
+                rec = ProcessRecord(info["pid"], info["create_time"], info.get("ppid"),
+                                    info.get("name") or "Unknown", info.get("exe") or "",
+                                    " ".join(info.get("cmdline") or []), info.get("username") or "N/A")
+                self._records[key] = rec
+            previous = self._live.get(rec.pid)
+            if previous is not None and previous != key:
+                # The PID was reused: the old holder must have exited.
+                self._retire(previous)
+            self._live[rec.pid] = key
+            return rec
+
+    def _link_parent(self, rec: ProcessRecord, depth: int = 0):
+        if rec.parent_key is not None or not rec.ppid or depth >= MAX_CHAIN:
+            return
+        parent_key = self._live.get(rec.ppid)
+        if parent_key is None:
+            try:
+                info = psutil.Process(rec.ppid).as_dict(SNAPSHOT_ATTRS, ad_value=None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                return
+            parent_key = self._insert(info).key
+        # A "parent" started after the child is an unrelated process that reused the PID.
+        if parent_key[1] is not None and rec.create_time is not None \
+                and parent_key[1] > rec.create_time + CREATE_TIME_SLACK:
+            return
+        rec.parent_key = parent_key
+        # Parents discovered just now need their own links for a complete chain.
+        self._link_parent(self._records[parent_key], depth + 1)
+
+    def get(self, pid: int):
+        with self._lock:
+            key = self._live.get(pid)
+            return self._records.get(key) if key else None
+
+    def parent(self, rec: ProcessRecord):
+        with self._lock:
+            return self._records.get(rec.parent_key) if rec.parent_key else None
+
+    def ancestry(self, rec: ProcessRecord, max_depth: int = MAX_CHAIN):
+        """Parent chain from the immediate parent upwards."""
+        chain = []
+        with self._lock:
+            seen = {rec.key}
+            key = rec.parent_key
+            while key and key not in seen and len(chain) < max_depth:
+                parent = self._records.get(key)
+                if parent is None:
+                    break
+                chain.append(parent)
+                seen.add(key)
+                key = parent.parent_key
+        return chain
+
+    def exited(self, pid: int, create_time: float = None):
+        with self._lock:
+            key = self._live.get(pid)
+            if key is not None and (create_time is None or key[1] == create_time):
+                self._retire(key)
+
+    def _retire(self, key):
+        rec = self._records.get(key)
+        if rec is None or rec.exited:
+            return
+        rec.exited = True
+        if self._live.get(rec.pid) == key:
+            del self._live[rec.pid]
+        self._exited.append(key)
+        while len(self._exited) > RETAIN_EXITED:
+            self._records.pop(self._exited.popleft(), None)
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        alive = set(psutil.pids())
+        with self._lock:
+            for pid in [p for p in self._live if p not in alive]:
+                self._retire(self._live[pid])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._live)
@@ -0,0 +1,194 @@
+import threading
+try:
+    import win32api
+    import win32con
+    import win32event
+    import winreg
+    import winerror
+except ImportError:
+    win32api = win32con = win32event = winreg = winerror = None
+
+from utils.logger import log_event
+
+REG_NOTIFY_CHANGE_NAME = 0x00000001
+REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+
+
+def join_key(parent: str, name: str) -> str:
+    return parent + "\\" + name if parent else name
+
+
+class RegistryBackend:
+    """
+    Read access to one registry hive plus change notification. Paths are
+    backslash-separated and relative to the hive.
+    """
+
+    def subkeys(self, path: str) -> list:
+        """Names of the direct subkeys of `path`."""
+        raise NotImplementedError
+
+    def last_write(self, path: str):
+        """The key's last-write timestamp (any monotonic integer), or None if the key is gone."""
+        raise NotImplementedError
+
+    def values(self, path: str) -> list:
+        """(name, data, type) for every value directly under `path`."""
+        raise NotImplementedError
+
+    def wait_for_change(self, path: str, timeout: float = None) -> bool:
+        """Blocks until something under `path` changes. Returns False on timeout."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class WinRegBackend(RegistryBackend):
+    """One hive (HKEY_LOCAL_MACHINE by default) through winreg, with RegNotifyChangeKeyValue for wakeups."""
+
+    def __init__(self, hive=None):
+        if isinstance(hive, str):
+            hive = getattr(winreg, hive)    # "HKEY_CURRENT_USER" etc., as written in the config
+        self.hive = hive if hive is not None else winreg.HKEY_LOCAL_MACHINE
+        self._notify_keys = {}    # path → (key handle, event handle)
+
+    def subkeys(self, path: str) -> list:
+        names = []
+        try:
+            key = winreg.OpenKey(self.hive, path, 0, winreg.KEY_READ)
+        except FileNotFoundError:
+            return names
+        try:
+            i = 0
+            while True:
+                try:
+                    names.append(winreg.EnumKey(key, i))
+                    i += 1
+                except OSError as e:
+                    if e.winerror != winerror.ERROR_NO_MORE_ITEMS:
+                        log_event("REGISTRY_ENUM_ERROR", f"Error enumerating subkey {i} under {path}: {e}")
+                    break
+        finally:
+            winreg.CloseKey(key)
+        return names
+
+    def last_write(self, path: str):
+        try:
+            with winreg.OpenKey(self.hive, path, 0, winreg.KEY_READ) as key:
+                # FILETIME in 100ns units; bumped on any value or direct-subkey change.
+                return winreg.QueryInfoKey(key)[2]
+        except FileNotFoundError:
+            return None
+
+    def values(self, path: str) -> list:
+        result = []
+        try:
+            key = winreg.OpenKey(self.hive, path, 0, winreg.KEY_READ)
+        except FileNotFoundError:
+            return result
+        try:
+            i = 0
+            while True:
+                try:
+                    result.append(winreg.EnumValue(key, i))
+                    i += 1
+                except OSError as e:
+                    if e.winerror != winerror.ERROR_NO_MORE_ITEMS:
+                        log_event("REGISTRY_HASH_ENUM_ERROR", f"Error enumerating value {i} under {path}: {e}")
+                    break
+        finally:
+            winreg.CloseKey(key)
+        return result
+
+    def wait_for_change(self, path: str, timeout: float = None) -> bool:
+        handles = self._notify_keys.get(path)
+        if handles is None:
+            hkey = win32api.RegOpenKeyEx(int(self.hive), path, 0,
+                                         int(win32con.KEY_READ | win32con.KEY_NOTIFY))
+            handles = (hkey, win32event.CreateEvent(None, False, False, None))
+            self._notify_keys[path] = handles
+        hkey, event = handles
+        # Asynchronous notify signals the event; it has to be re-armed before every wait.
+        win32api.RegNotifyChangeKeyValue(hkey, True, REG_NOTIFY_CHANGE_NAME | REG_NOTIFY_CHANGE_LAST_SET,
+                                         event, True)
+        wait_ms = win32event.INFINITE if timeout is None else int(timeout * 1000)
+        return win32event.WaitForSingleObject(event, wait_ms) == win32event.WAIT_OBJECT_0
+
+    def close(self):
+        for hkey, event in self._notify_keys.values():
+            win32api.RegCloseKey(hkey)
+            win32api.CloseHandle(event)
+        self._notify_keys.clear()
+
+
+class MemoryRegistryBackend(RegistryBackend):
+    """
+    In-memory registry for tests and benchmarks on any platform. Last-write
+    stamps follow Windows: writing a value stamps its key, creating or
+    deleting a subkey stamps the parent.
+    """
+
+    def __init__(self):
+        self._keys = {"": {"values": {}, "last_write": 0}}
+        self._cond = threading.Condition()
+        self._clock = 0
+        self._version = 0
+        self._seen_version = 0
+
+    def _touch(self, path: str):
+        self._clock += 1
+        self._keys[path]["last_write"] = self._clock
+        self._version += 1
+        self._cond.notify_all()
+
+    def create_key(self, path: str):
+        with self._cond:
+            parent = ""
+            for part in path.split("\\"):
+                current = join_key(parent, part)
+                if current not in self._keys:
+                    self._keys[current] = {"values": {}, "last_write": 0}
+                    self._touch(current)
+                    self._touch(parent)
+                parent = current
+
+    def delete_key(self, path: str):
+        with self._cond:
+            prefix = path + "\\"
+            for key in [k for k in self._keys if k == path or k.startswith(prefix)]:
+                del self._keys[key]
+            self._touch(path.rpartition("\\")[0])
+
+    def set_value(self, path: str, name: str, data, value_type: int = 1):
+        self.create_key(path)
+        with self._cond:
+            self._keys[path]["values"][name] = (data, value_type)
+            self._touch(path)
+
+    def delete_value(self, path: str, name: str):
+        with self._cond:
+            self._keys[path]["values"].pop(name, None)
+            self._touch(path)
+
+    def subkeys(self, path: str) -> list:
+        prefix = path + "\\" if path else ""
+        with self._cond:
+            return [k[len(prefix):] for k in self._keys
+                    if k.startswith(prefix) and k != path and "\\" not in k[len(prefix):]]
+
+    def last_write(self, path: str):
+        with self._cond:
+            key = self._keys.get(path)
+            return key["last_write"] if key else None
+
+    def values(self, path: str) -> list:
+        with self._cond:
+            key = self._keys.get(path)
+            return [(name, data, t) for name, (data, t) in key["values"].items()] if key else []
+
+    def wait_for_change(self, path: str, timeout: float = None) -> bool:
+        with self._cond:
+            changed = self._cond.wait_for(lambda: self._version != self._seen_version, timeout)
+            self._seen_version = self._version
+            return changed
@@ -0,0 +1,184 @@
+import hashlib
+import mmap
+import os
+import struct
+from utils.logger import log_event
+
+BASELINE_PATH = os.environ.get("GUARDRAIL_REGISTRY_BASELINE",
+                               os.path.join(os.path.dirname(__file__), '..', 'cache', 'registry_baseline.bin'))
+
+DIGEST_SIZE = 16    # bytes per digest; change detection, not integrity
+MAGIC = b"GRMB"
+VERSION = 1
+
+# header | key table | value digests | value name refs | strings
+_HEADER = struct.Struct("=4sIII16s")     # magic, version, key_count, value_count, root hash
+_KEY = struct.Struct("=16sQIIII")        # key hash, last_write, first value, value count, path offset, path length
+_NAME = struct.Struct("=II")             # name offset, name length (into strings)
+
+
+def value_digest(data, value_type) -> bytes:
+    """Leaf hash: one registry value's data and type."""
+    if isinstance(data, str):
+        raw = data.encode('utf-16le')
+    elif isinstance(data, bytes):
+        raw = data
+    else:
+        raw = str(data).encode()
+    return hashlib.blake2b(raw, digest_size=DIGEST_SIZE, salt=(value_type or 0).to_bytes(4, "little")).digest()
+
+
+def key_hash(names, digests: bytes) -> bytes:
+    """Node hash over a key's sorted value names and their leaf digests."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for name in names:
+        h.update(name.encode('utf-16le') + b"\0\0")
+    h.update(digests)
+    return h.digest()
+
+
+def root_hash(keys: dict) -> bytes:
+    """Root over {path: KeyDigest}, in path order."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for path in sorted(keys):
+        h.update(path.encode('utf-8') + b"\0" + keys[path].key_hash)
+    return h.digest()
+
+
+class KeyDigest:
+    """
+    One key's values: sorted names and their digests packed into a single
+    bytes object, plus the Merkle node hash over both. Digests loaded from a
+    baseline file stay in the mapping until something actually reads them.
+    """
+    __slots__ = ("last_write", "key_hash", "_names", "_digests", "_loader")
+
+    def __init__(self, last_write, names=None, digests=None, hash_=None, loader=None):
+        self.last_write = last_write
+        self._names = names
+        self._digests = digests
+        self._loader = loader
+        self.key_hash = hash_ if hash_ is not None else key_hash(names, digests)
+
+    def _load(self):
+        self._names, self._digests = self._loader()
+        self._loader = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._load()
+        return self._names
+
+    @property
+    def digests(self):
+        if self._digests is None:
+            self._load()
+        return self._digests
+
+    def as_dict(self) -> dict:
+        digests = self.digests
+        return {name: digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] for i, name in enumerate(self.names)}
+
+
+class RegistryBaseline:
+    """
+    Read-only, memory-mapped view of a saved baseline. Opening it reads only
+    the header and key table; a key's value names and digests are read from
+    the mapping when that key turns out to differ.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        try:
+            magic, version, self.key_count, self.value_count, self.root = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a version {VERSION} registry baseline")
+            self._keys_at = _HEADER.size
+            self._digests_at = self._keys_at + self.key_count * _KEY.size
+            self._names_at = self._digests_at + self.value_count * DIGEST_SIZE
+            self._strings_at = self._names_at + self.value_count * _NAME.size
+            if self._strings_at > len(self._mm):
+                raise ValueError("truncated registry baseline")
+        except Exception:
+            self.close()
+            raise
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_at + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def keys(self) -> dict:
+        """{path: KeyDigest} with lazily loaded values."""
+        result = {}
+        for i in range(self.key_count):
+            h, last_write, first, count, path_off, path_len = _KEY.unpack_from(self._mm, self._keys_at + i * _KEY.size)
+            result[self._string(path_off, path_len)] = KeyDigest(
+                last_write, hash_=h, loader=lambda first=first, count=count: self._values(first, count))
+        return result
+
+    def _values(self, first: int, count: int):
+        names = tuple(self._string(*_NAME.unpack_from(self._mm, self._names_at + (first + i) * _NAME.size))
+                      for i in range(count))
+        start = self._digests_at + first * DIGEST_SIZE
+        return names, bytes(self._mm[start:start + count * DIGEST_SIZE])
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def load_baseline(path: str = BASELINE_PATH):
+    """The saved baseline, or None if there is none (or it is unreadable)."""
+    try:
+        return RegistryBaseline(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_event("REGISTRY_BASELINE_LOAD_ERROR", f"Ignoring baseline {path}: {e}")
+        return None
+
+
+def save_baseline(keys: dict, path: str = BASELINE_PATH) -> bytes:
+    """Writes {path: KeyDigest} atomically and returns the root hash. Lazy digests must be loadable."""
+    ordered = sorted(keys)
+    strings = bytearray()
+    key_table = bytearray()
+    digests = bytearray()
+    name_refs = bytearray()
+    value_count = 0
+
+    def add_string(text: str):
+        raw = text.encode('utf-8')
+        offset = len(strings)
+        strings.extend(raw)
+        return offset, len(raw)
+
+    for key_path in ordered:
+        kd = keys[key_path]
+        names = kd.names
+        key_table += _KEY.pack(kd.key_hash, kd.last_write, value_count, len(names), *add_string(key_path))
+        digests += kd.digests
+        for name in names:
+            name_refs += _NAME.pack(*add_string(name))
+        value_count += len(names)
+
+    root = root_hash(keys)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(ordered), value_count, root))
+        f.write(key_table)
+        f.write(digests)
+        f.write(name_refs)
+        f.write(strings)
+    os.replace(tmp, path)
+    return root
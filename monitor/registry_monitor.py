@@ -1,184 +1,328 @@
+import atexit
+import json
 import time
-import win32api
-import win32con
-import winreg
-import hashlib
 import os
-import winerror  # <--- ADDED THIS IMPORT for ERROR_NO_MORE_ITEMS
 
 from utils.logger import log_event
 from utils.popups import show_popup
 from ai.mistral_analysis import analyze_text
-
-REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
-REG_NOTIFY_CHANGE_NAME = 0x00000001
+from ai.rules import triage
+from ai.model_client import model_client
+from utils.event_queue import BoundedEventQueue, start_workers
+from monitor.event_sources import record, notify_verdict
+from monitor.registry_backend import WinRegBackend, join_key
+from monitor.registry_baseline import (BASELINE_PATH, KeyDigest, load_baseline, root_hash, save_baseline,
+                                       value_digest)
 
 _SERVICES_PATH = r"SYSTEM\CurrentControlSet\Services"
+KEYS_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config', 'registry_keys.json')
+# Notifications are merged into one change set per service key until the tree has been
+# quiet for BATCH_WINDOW seconds, BATCH_MAX_WINDOW has passed, or BATCH_MAX_CHANGES
+# value changes have piled up.
+BATCH_WINDOW = float(os.environ.get("GUARDRAIL_REGISTRY_WINDOW", "0.5"))
+BATCH_MAX_WINDOW = float(os.environ.get("GUARDRAIL_REGISTRY_MAX_WINDOW", "3.0"))
+BATCH_MAX_CHANGES = int(os.environ.get("GUARDRAIL_REGISTRY_MAX_BATCH", "200"))
+MAX_DIFF_LINES = 40
+PREVIEW_CHARS = 160
+# The baseline is rewritten at most this often (and at exit) while changes keep coming.
+BASELINE_SAVE_INTERVAL = 30.0
+# Rehash every key at startup instead of trusting unchanged last-write times
+# (catches offline edits that also reset the timestamp).
+VERIFY_BASELINE = os.environ.get("GUARDRAIL_REGISTRY_VERIFY") == "1"
 
+# Change sets are analysed by a worker so the notify loop never waits on the model.
+_events = BoundedEventQueue("registry_events", maxsize=64, policy="coalesce")
+_workers_started = False
+_tracker = None
 
-def _hash_key_values(root, subkey_path):
-    r"""
-Returns a dict: { value_name: sha256_of_value_data } for all values under root\subkey_path.
-"""
 
-    result = {}
-    try:
-        key = winreg.OpenKey(root, subkey_path, 0, winreg.KEY_READ)
-    except FileNotFoundError:
-        return result
-    except Exception as e:
-        log_event("REGISTRY_HASH_OPEN_ERROR", f"Error opening key {subkey_path}: {e}")
-        return result
+class ServiceKeyTracker:
+    """
+    Incremental snapshot of the direct values of every key under `root`,
+    kept as a Merkle tree (root → key → values) and persisted between runs.
+    A rescan reads each subkey's last-write time and only re-enumerates and
+    rehashes keys whose timestamp moved; keys whose node hash is unchanged
+    are not descended into.
+    """
 
-    try:
-        i = 0
-        while True:
-            try:
-                name, data, _ = winreg.EnumValue(key, i)
-                if isinstance(data, str):   
-                    raw = data.encode('utf-16le')
-                elif isinstance(data, bytes):
-                    raw = data
-                else:
-                    raw = str(data).encode()
-                h = hashlib.sha256(raw).hexdigest()
-                result[name] = h
-                i += 1
-            except OSError as e:
-                # Use winerror.ERROR_NO_MORE_ITEMS
-                if e.winerror == winerror.ERROR_NO_MORE_ITEMS:  # <--- CHANGED HERE
-                    break
-                else:
-                    log_event("REGISTRY_HASH_ENUM_ERROR", f"Error enumerating value {i} under {subkey_path}: {e}")
-                    break
-    finally:
-        winreg.CloseKey(key)
-    return result
+    def __init__(self, backend, root: str = _SERVICES_PATH, baseline_path: str = BASELINE_PATH):
+        self.backend = backend
+        self.root = root
+        self.baseline_path = baseline_path
+        self._keys = {}         # full path → KeyDigest
+        self._saved = None      # RegistryBaseline backing lazily loaded digests
+        self._dirty = False
+        self._last_save = 0.0
+        self.keys_rehashed = 0
+        self.keys_skipped = 0
+
+    def _digest(self, path: str, last_write):
+        """(KeyDigest, {name: data}) for the key's current values."""
+        values = sorted(self.backend.values(path), key=lambda v: v[0])
+        digest = KeyDigest(last_write, tuple(v[0] for v in values),
+                           b"".join(value_digest(data, value_type) for _, data, value_type in values))
+        return digest, {name: data for name, data, _ in values}
+
+    def baseline(self, verify: bool = VERIFY_BASELINE) -> list:
+        """
+        Loads the saved baseline and returns change sets for everything that
+        changed while the guardrail was not running. Without a saved baseline
+        it snapshots the live tree and returns nothing.
+        """
+        self._saved = load_baseline(self.baseline_path) if self.baseline_path else None
+        if self._saved is None:
+            self._keys = {}
+            for sub in self.backend.subkeys(self.root):
+                path = join_key(self.root, sub)
+                last_write = self.backend.last_write(path)
+                if last_write is not None:
+                    self._keys[path] = self._digest(path, last_write)[0]
+                    self.keys_rehashed += 1
+            self._dirty = True
+            self.save()
+            return []
+
+        self._keys = self._saved.keys()
+        change_sets = self.changes(rehash_all=verify)
+        for cs in change_sets:
+            cs["offline"] = True
+        unchanged = root_hash(self._keys) == self._saved.root
+        log_event("REGISTRY_BASELINE", f"Warm start from {self.baseline_path}: {len(self._keys)} keys, "
+                                       f"{self.keys_rehashed} rehashed, root {'unchanged' if unchanged else 'changed'}, "
+                                       f"{len(change_sets)} keys changed while stopped")
+        self.save()
+        return change_sets
+
+    def save(self):
+        if not self._dirty or not self.baseline_path:
+            return
+        try:
+            for kd in list(self._keys.values()):
+                kd.names    # pull lazily loaded digests out of the mapping before replacing the file
+            if self._saved is not None:
+                self._saved.close()
+                self._saved = None
+            save_baseline(self._keys, self.baseline_path)
+            self._dirty = False
+        except Exception as e:
+            log_event("REGISTRY_BASELINE_SAVE_ERROR", f"Failed to save {self.baseline_path}: {e}")
+        self._last_save = time.monotonic()
+
+    def maybe_save(self):
+        if self._dirty and time.monotonic() - self._last_save >= BASELINE_SAVE_INTERVAL:
+            self.save()
+
+    def scan(self, rehash_all: bool = False) -> list:
+        """
+        (path, before, after, previews) per key that changed since the previous
+        call: before/after map value names to digests (None for a key that did
+        not exist), previews map every current value name to a preview.
+        """
+        changed = []
+        seen = set()
+        for sub in self.backend.subkeys(self.root):
+            path = join_key(self.root, sub)
+            # Read the timestamp before the values: a write during the scan shows up next time.
+            last_write = self.backend.last_write(path)
+            if last_write is None:
+                continue
+            seen.add(path)
+            old = self._keys.get(path)
+            if old is not None and old.last_write == last_write and not rehash_all:
+                self.keys_skipped += 1
+                continue
+            self.keys_rehashed += 1
+            new, data = self._digest(path, last_write)
+            self._keys[path] = new
+            self._dirty = True
+            if old is not None and old.key_hash == new.key_hash:
+                continue
+            changed.append((path, old.as_dict() if old is not None else None, new.as_dict(),
+                            {name: _preview(value) for name, value in data.items()}))
+
+        for path in set(self._keys) - seen:
+            old = self._keys.pop(path)
+            self._dirty = True
+            changed.append((path, old.as_dict(), None, {}))
+        return changed
 
+    def changes(self, rehash_all: bool = False) -> list:
+        """One change set (see `new_change_set`) per key that changed since the previous call."""
+        return [diff_change_set(*change) for change in self.scan(rehash_all)]
 
-def _snapshot_all_services():
+
+def new_change_set(key: str, key_change: str = None) -> dict:
     """
-    Takes a snapshot of all service keys and their hashed values.
+    Everything that happened to one service key within a batch: `key_change`
+    is "new", "deleted" or None; added/modified map value names to a preview
+    of the new data.
     """
-    snapshot = {}
+    return {"key": key, "key_change": key_change, "added": {}, "modified": {}, "deleted": []}
+
+
+def _preview(data) -> str:
+    if isinstance(data, bytes):
+        text = data[:PREVIEW_CHARS // 2].hex()
+    else:
+        text = str(data)
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "..."
+
+
+def diff_change_set(key: str, before, after, previews: dict) -> dict:
+    """
+    The change set taking the key from `before` to `after` (see `scan`). A
+    deleted key lists the values it had; a key that exists in neither state
+    yields an empty change set.
+    """
+    if before is None and after is None:
+        return new_change_set(key)
+    cs = new_change_set(key, "new" if before is None else "deleted" if after is None else None)
+    before, after = before or {}, after or {}
+    for name, digest in after.items():
+        if name not in before:
+            cs["added"][name] = previews[name]
+        elif before[name] != digest:
+            cs["modified"][name] = previews[name]
+    cs["deleted"] = [name for name in before if name not in after]
+    return cs
+
+
+def change_set_size(cs: dict) -> int:
+    return len(cs["added"]) + len(cs["modified"]) + len(cs["deleted"]) + (cs["key_change"] is not None)
+
+
+def describe_change_set(cs: dict) -> str:
+    """The structured diff handed to triage and the model."""
+    header = f"Registry change set under '{cs['key']}'"
+    if cs["key_change"] == "new":
+        header += " (new service key)"
+    elif cs["key_change"] == "deleted":
+        header += " (service key deleted)"
+    if cs.get("offline"):
+        header += " [changed while the guardrail was not running]"
+    lines = [f"+ {name} = {preview}" for name, preview in cs["added"].items()]
+    lines += [f"~ {name} = {preview}" for name, preview in cs["modified"].items()]
+    lines += [f"- {name}" for name in cs["deleted"]]
+    if len(lines) > MAX_DIFF_LINES:
+        lines = lines[:MAX_DIFF_LINES] + [f"... {len(lines) - MAX_DIFF_LINES} more changes"]
+    return "\n".join([header] + lines)
+
+
+def services_root(path: str = KEYS_CONFIG):
+    """(hive name, key path) of the watched tree, from "services_root" in config/registry_keys.json."""
     try:
-        root = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, _SERVICES_PATH, 0, winreg.KEY_READ)
-    except FileNotFoundError:
-        log_event("REGISTRY_SNAPSHOT_ROOT_NOT_FOUND", f"Services root path {_SERVICES_PATH} not found.")
-        return snapshot
+        with open(path, 'r', encoding='utf-8') as f:
+            full = json.load(f).get("services_root", "")
     except Exception as e:
-        log_event("REGISTRY_SNAPSHOT_OPEN_ERROR", f"Error opening services root: {e}")
-        return snapshot
+        log_event("REGISTRY_CONFIG_ERROR", f"Could not read {path}: {e}")
+        full = ""
+    hive, _, key = full.partition("\\")
+    if not key:
+        return "HKEY_LOCAL_MACHINE", _SERVICES_PATH
+    return hive, key
+
 
+def _monitor_loop(backend=None, baseline_path: str = BASELINE_PATH):
+    global _tracker
+    root = _SERVICES_PATH
+    if backend is None:
+        hive, root = services_root()
+        backend = WinRegBackend(hive)
+    tracker = _tracker = ServiceKeyTracker(backend, root=root, baseline_path=baseline_path)
+    for cs in tracker.baseline():
+        _queue_change(cs)
+    log_event("MONITOR_READY", f"REGISTRY_MONITOR: changes under {root} are analysed")
     try:
-        i = 0
         while True:
             try:
-                sub = winreg.EnumKey(root, i)
-                full = os.path.join(_SERVICES_PATH, sub)
-                snapshot[full] = _hash_key_values(winreg.HKEY_LOCAL_MACHINE, full)
-                i += 1
-            except OSError as e:
-                # Use winerror.ERROR_NO_MORE_ITEMS
-                if e.winerror == winerror.ERROR_NO_MORE_ITEMS:  # <--- CHANGED HERE
-                    break
-                else:
-                    log_event("REGISTRY_SNAPSHOT_ENUM_ERROR",
-                              f"Error enumerating subkey {i} under {_SERVICES_PATH}: {e}")
-                    break
+                backend.wait_for_change(root)
+                time.sleep(0.01)
+                for cs in _collect_batch(backend, tracker):
+                    _queue_change(cs)
+                tracker.maybe_save()
+            except Exception as e:
+                log_event("REGISTRY_MONITOR_ERROR", str(e))
+                time.sleep(5)
     finally:
-        winreg.CloseKey(root)
-    return snapshot
+        tracker.save()
+        backend.close()
 
 
-def _monitor_loop():
-    prev_snapshot = _snapshot_all_services()
-    hkey = None
+def _save_baseline():
+    if _tracker is not None:
+        _tracker.save()
 
-    try:
-        hkey = win32api.RegOpenKeyEx(
-            int(win32con.HKEY_LOCAL_MACHINE),
-            _SERVICES_PATH,
-            0,
-            int(win32con.KEY_READ | win32con.KEY_NOTIFY)
-        )
 
-        while True:
-            try:
-                # Expected type 'PyHKEY', got 'int' instead
-                # Expected type 'bool', got 'int' instead (for True/False)
-                # These warnings are likely static analysis issues with win32api stubs,
-                # the runtime behavior should be correct as PyHANDLE objects are often
-                # implicitly castable or handled correctly by the underlying C functions.
-                win32api.RegNotifyChangeKeyValue(
-                    hkey,
-                    True,
-                    REG_NOTIFY_CHANGE_NAME | REG_NOTIFY_CHANGE_LAST_SET,
-                    0,
-                    False
-                )
+atexit.register(_save_baseline)
 
-                time.sleep(0.01)
-                new_snapshot = _snapshot_all_services()
-
-                # Compare snapshots
-                for key_path, new_vals in new_snapshot.items():
-                    old_vals = prev_snapshot.get(key_path, {})
-                    for name, h in new_vals.items():
-                        if name not in old_vals:
-                            detail = f"New registry value '{name}' under '{key_path}'"
-                            _flag_registry_change(detail)
-                        elif old_vals[name] != h:
-                            detail = f"Modified registry value '{name}' under '{key_path}'"
-                            _flag_registry_change(detail)
-                    for name in old_vals:
-                        if name not in new_vals:
-                            detail = f"Deleted registry value '{name}' under '{key_path}'"
-                            _flag_registry_change(detail)
-
-                for key_path in set(prev_snapshot) - set(new_snapshot):
-                    detail = f"Deleted registry key '{key_path}' under Services"
-                    _flag_registry_change(detail)
-
-                for key_path in set(new_snapshot) - set(prev_snapshot):
-                    detail = f"New registry key '{key_path}' under Services"
-                    _flag_registry_change(detail)
-
-                prev_snapshot = new_snapshot
 
-            except Exception as e:
-                log_event("REGISTRY_MONITOR_ERROR", str(e))
-                time.sleep(5)
+def _collect_batch(backend, tracker) -> list:
+    """
+    Collects changes until the registry goes quiet or a batch limit is hit,
+    then diffs each key's state before the batch against its final state.
+    """
+    pending = {}    # path → [before the batch, latest state, previews]
+    changes = 0
+    started = time.monotonic()
+    while True:
+        for path, before, after, previews in tracker.scan():
+            state = pending.get(path)
+            if state is None:
+                pending[path] = [before, after, dict(previews)]
+            else:
+                state[1] = after
+                state[2].update(previews)
+            changes += change_set_size(diff_change_set(path, before, after, previews))
+        remaining = BATCH_MAX_WINDOW - (time.monotonic() - started)
+        if changes >= BATCH_MAX_CHANGES or remaining <= 0:
+            break
+        if not backend.wait_for_change(tracker.root, timeout=min(BATCH_WINDOW, remaining)):
+            break
+    change_sets = [diff_change_set(path, *state) for path, state in pending.items()]
+    return [cs for cs in change_sets if change_set_size(cs)]
 
-    finally:
-        if hkey:
-            win32api.RegCloseKey(hkey)
+
+def _queue_change(cs: dict):
+    detail = describe_change_set(cs)
+    record("registry", "REGISTRY_CHANGE_SET", {"detail": detail, "change_set": cs})
+    _events.put(detail, key=detail)
+
+
+def replay_event(kind: str, data: dict):
+    """Feeds a recorded event into the analysis path (trace replay)."""
+    _ensure_workers()
+    _events.put(data["detail"], key=data["detail"])
 
 
 def _flag_registry_change(detail: str):
-    if not any(term in detail.lower() for term in
-               ["cmd.exe", "powershell", "terminal", "shell", "bash", "command prompt"]):
+    verdict = triage("registry", detail)
+    if verdict is not None and verdict["DANGEROUS"] is False:
         log_event("IGNORED_CHANGE", f"Ignoring: {detail}")
+        notify_verdict("registry", detail, verdict)
         return
     try:
-        result = analyze_text(f"REGISTRY_CHANGE: {detail}")
+        result = verdict or analyze_text(f"REGISTRY_CHANGE: {detail}")
     except Exception as e:
         log_event("AI_ANALYSIS_FAILURE", f"AI analysis failed for registry change '{detail}': {e}")
         show_popup("Guardrail AI Failure", "AI analysis failed for registry change. Restarting AI service.")
-        try:
-            analyze_text("ping")
-        except:
-            pass
+        model_client.health_check()
         return
 
-    lower = result.lower()
-    if any(k in lower for k in
-           ["danger", "disable", "malicious", "unauthorized", "suspicious", "threat", "compromised"]):
-        show_popup("Guardrail Alert: Registry Change", result)
+    notify_verdict("registry", detail, result)
+    if result.get("DANGEROUS") is True:
+        show_popup("Guardrail Alert: Registry Change", result.get("reason", ""))
         log_event("REGISTRY_FLAGGED", f"{detail} | AI: {result}")
     else:
         log_event("REGISTRY_INFO", f"{detail} | AI: {result}")
 
 
+def _ensure_workers():
+    global _workers_started
+    if not _workers_started:
+        start_workers(_events, lambda detail, _count: _flag_registry_change(detail), count=1)
+        _workers_started = True
+
+
 def start_monitor():
+    _ensure_workers()
     _monitor_loop()
\ No newline at end of file
@@ -1,86 +1,107 @@
+import os
+import shlex
 import time
-import subprocess
 from utils.logger import log_event
 from utils.popups import show_popup
+from utils.shell_worker import ShellWorker, ShellWorkerError
+from utils.tracing import traced
 from ai.mistral_analysis import analyze_text
+from ai.rules import triage
+from ai.model_client import model_client
+from monitor.event_sources import record, notify_verdict
 
-def _get_firewall_state():
+# One round-trip to a persistent shell per poll, so the interval can be short.
+POLL_INTERVAL = float(os.environ.get("GUARDRAIL_SETTINGS_POLL", "2"))
+# Command line of a stand-in for PowerShell that speaks the worker protocol (tests, other hosts).
+SHELL_COMMAND = os.environ.get("GUARDRAIL_SETTINGS_SHELL")
+
+STATE_QUERIES = {
+    "firewall": "Get-NetFirewallProfile | Select-Object Name,Enabled",
+    "defender": "Get-MpPreference | Select-Object DisableRealtimeMonitoring",
+}
+
+_worker = None
+
+
+def _get_worker() -> ShellWorker:
+    global _worker
+    if _worker is None:
+        _worker = ShellWorker(shlex.split(SHELL_COMMAND) if SHELL_COMMAND else None)
+    return _worker
+
+
+def _parse_firewall_state(data) -> dict:
     # Returns a dict of Name→Enabled/Disabled for each profile
-    cmd = [
-        "powershell",
-        "-NoProfile",
-        "-Command",
-        "Get-NetFirewallProfile | Select-Object Name,Enabled | ConvertTo-Json"
-    ]
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
-        import json
-        data = json.loads(out)
-        state = {}
-        if isinstance(data, list):
-            for entry in data:
-                if isinstance(entry, dict) and "Name" in entry and "Enabled" in entry:
-                    state[entry["Name"]] = entry["Enabled"]
-        else:
-            if isinstance(data, dict) and "Name" in data and "Enabled" in data:
-                state[data["Name"]] = data["Enabled"]
-
-        return state
-    except Exception as e:
-        log_event("SETTINGS_MONITOR_ERROR", f"Firewall query failed: {str(e)}")
-        return {}
-
-def _get_defender_realtime_state():
-    cmd = [
-        "powershell",
-        "-NoProfile",
-        "-Command",
-        "Get-MpPreference | Select-Object DisableRealtimeMonitoring | ConvertTo-Json"
-    ]
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
-        import json
-        data = json.loads(out)
-        # If DisableRealtimeMonitoring == true → protection is OFF
-        return not data.get("DisableRealtimeMonitoring", False)
-    except Exception as e:
-        log_event("SETTINGS_MONITOR_ERROR", f"Defender query failed: {str(e)}")
+    state = {}
+    for entry in data if isinstance(data, list) else [data]:
+        if isinstance(entry, dict) and "Name" in entry and "Enabled" in entry:
+            state[entry["Name"]] = entry["Enabled"]
+    return state
+
+
+def _parse_defender_realtime_state(data):
+    # If DisableRealtimeMonitoring == true → protection is OFF
+    if not isinstance(data, dict):
         return None
+    return not data.get("DisableRealtimeMonitoring", False)
+
+
+def _query_state():
+    """(firewall state, defender realtime state) from a single worker round-trip."""
+    try:
+        results = _get_worker().query(STATE_QUERIES)
+    except ShellWorkerError as e:
+        log_event("SETTINGS_MONITOR_ERROR", f"State query failed: {e}")
+        return {}, None
+    fw, defender = results.get("firewall"), results.get("defender")
+    if isinstance(fw, ShellWorkerError):
+        log_event("SETTINGS_MONITOR_ERROR", f"Firewall query failed: {fw}")
+        fw = None
+    if isinstance(defender, ShellWorkerError):
+        log_event("SETTINGS_MONITOR_ERROR", f"Defender query failed: {defender}")
+        defender = None
+    return _parse_firewall_state(fw), _parse_defender_realtime_state(defender)
+
 
 def _monitor_loop():
-    prev_fw = _get_firewall_state()
-    prev_def = _get_defender_realtime_state()
+    prev_fw, prev_def = _query_state()
+    log_event("MONITOR_READY", "SETTINGS_MONITOR: firewall and Defender state are polled")
     while True:
-        time.sleep(10)
-        fw = _get_firewall_state()
-        def_state = _get_defender_realtime_state()
+        time.sleep(POLL_INTERVAL)
+        fw, def_state = _query_state()
         # Compare firewall
         for profile, status in fw.items():
             old = prev_fw.get(profile)
             if old is not None and old != status:
                 detail = f"Firewall profile '{profile}' changed from {old} to {status}"
-                _flag_settings_change(detail)
+                record("settings", "SETTINGS_CHANGE", {"detail": detail})
+                with traced("settings", profile=profile):
+                    _flag_settings_change(detail)
         # Compare defender
         if prev_def is not None and def_state is not None and prev_def != def_state:
             detail = f"Defender RealTimeProtection changed from {prev_def} to {def_state}"
-            _flag_settings_change(detail)
-        prev_fw = fw
-        prev_def = def_state
+            record("settings", "SETTINGS_CHANGE", {"detail": detail})
+            with traced("settings", setting="defender"):
+                _flag_settings_change(detail)
+        # A failed query keeps the last known state instead of forgetting it.
+        prev_fw = fw or prev_fw
+        prev_def = def_state if def_state is not None else prev_def
 
 def _flag_settings_change(detail: str):
     try:
-        result = analyze_text(f"SETTINGS_CHANGE: {detail}")
+        result = triage("settings", detail) or analyze_text(f"SETTINGS_CHANGE: {detail}")
     except Exception:
         show_popup("Guardrail AI Failure", "AI analysis failed for settings change. Restarting AI service.")
-        try:
-            analyze_text("ping")
-        except:
-            pass
+        model_client.health_check()
         return
-    lower = result.lower()
-    if any(k in lower for k in ["danger", "disabled", "unauthorized", "vulnerable"]):
-        show_popup("Guardrail Alert: Settings Change", result)
+    notify_verdict("settings", detail, result)
+    if result.get("DANGEROUS") is True:
+        show_popup("Guardrail Alert: Settings Change", result.get("reason", ""))
         log_event("SETTINGS_FLAGGED", f"{detail} | AI: {result}")
 
+def replay_event(kind: str, data: dict):
+    """Feeds a recorded event into the analysis path (trace replay)."""
+    _flag_settings_change(data["detail"])
+
 def start_monitor():
     _monitor_loop()
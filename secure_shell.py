@@ -1,8 +1,19 @@
 import subprocess
 import ctypes
-from ai.mistral_analysis import analyze_text
+import sys
+import time
+from ai.mistral_analysis import analyze_text_streaming
+from ai.rules import triage
+from ai.speculation import Speculator, DEBOUNCE
 from utils.logger import log_event
 
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+_speculator = Speculator("CMD", "command")
+
 def is_dangerous_by_ai(response) -> (bool, str):
     """
     Determine danger from AI response.
@@ -46,11 +57,50 @@ def execute_command(command: str):
         log_event("SECURE_SHELL_EXEC_ERROR", f"{command} | Error: {e}")
         print(f"[ERROR] Execution failed: {e}")
 
+def read_command(prompt: str) -> str:
+    """
+    Reads one line. On a Windows console it is read key by key so every
+    typing pause can start analysing the partial command; elsewhere it is
+    a plain input().
+    """
+    if msvcrt is None or not sys.stdin.isatty():
+        return input(prompt)
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    chars = []
+    last_key, pending = time.monotonic(), False
+    while True:
+        if not msvcrt.kbhit():
+            if pending and time.monotonic() - last_key >= DEBOUNCE:
+                pending = False
+                _speculator.update("".join(chars))
+            time.sleep(0.02)
+            continue
+        ch = msvcrt.getwch()
+        if ch in ("\r", "\n"):
+            sys.stdout.write("\n")
+            return "".join(chars)
+        if ch == "\x03":
+            raise KeyboardInterrupt
+        if ch in ("\x00", "\xe0"):
+            msvcrt.getwch()    # arrow/function keys come as two characters; ignore them
+            continue
+        if ch == "\b":
+            if chars:
+                chars.pop()
+                sys.stdout.write("\b \b")
+        else:
+            chars.append(ch)
+            sys.stdout.write(ch)
+        sys.stdout.flush()
+        last_key, pending = time.monotonic(), True
+
 def shell_loop():
     log_event("SECURE_SHELL_START", "Secure Shell started.")
     while True:
         try:
-            command = input("C:\\> ").strip()
+            command = read_command("C:\\> ").strip()
+            _speculator.finish(command)
             if not command:
                 continue
             if command.lower() in ("exit", "quit"):
@@ -60,8 +110,13 @@ def shell_loop():
 
             log_event("CMD_INPUT", command)
 
-            # Single AI call expecting a dict
-            ai_result = analyze_text(f"CMD: {command}")
+            # Obvious commands are decided by the triage rules. The rest are streamed from the
+            # model, which returns at the DANGEROUS flag; a dangerous verdict's reason is logged
+            # once it has been generated.
+            ai_result = triage("command", command) or analyze_text_streaming(
+                f"CMD: {command}",
+                on_reason=lambda v, c=command: log_event("CMD_AI_REASON", f"{c} | AI: {v}")
+            )
             log_event("CMD_AI_RESPONSE", f"{command} | AI: {ai_result}")
 
             # Determine if dangerous
@@ -0,0 +1,27 @@
+"""
+Every cache, log and snapshot the modules under test would write goes to a
+temporary directory, and nothing opens a popup or the metrics port.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="guardrail-tests-")
+os.environ.update(GUARDRAIL_HEADLESS="1", GUARDRAIL_METRICS_PORT="0", OLLAMA_HOST="http://127.0.0.1:9")
+for var, name in (("GUARDRAIL_VERDICT_CACHE", "verdicts.json"), ("GUARDRAIL_HASH_CACHE", "hashes.json"),
+                  ("GUARDRAIL_REGISTRY_BASELINE", "registry_baseline.bin"),
+                  ("GUARDRAIL_METRICS_SNAPSHOT", "metrics.json"), ("GUARDRAIL_TRACE_PATH", "traces.jsonl"),
+                  ("GUARDRAIL_EVENT_STORE", "events")):
+    os.environ[var] = os.path.join(TMP, name)
+os.environ.pop("GUARDRAIL_TRACE_FILE", None)
+
+import utils.logger  # noqa: E402
+
+utils.logger.LOG_PATH = os.path.join(TMP, "guardrail_log.txt")
+
+from ai.semantic_index import semantic_index  # noqa: E402
+
+semantic_index.audit_path = os.path.join(TMP, "semantic_reuse.log")
@@ -0,0 +1,39 @@
+import os
+import struct
+
+import pytest
+
+linux_sources = pytest.importorskip("monitor.linux_sources")
+if not os.path.exists("/proc/stat"):
+    pytest.skip("needs /proc", allow_module_level=True)
+
+from monitor.linux_sources import (CN_IDX_PROC, CN_VAL_PROC, PROC_EVENT_EXEC, PROC_EVENT_FORK, ProcConnectorSource,
+                                   _CLK_TCK, _CN_MSG, _NLMSGHDR, _PROC_EVENT, _btime)
+
+GONE_PID = 4194303   # above the default pid_max, so /proc never has it
+
+
+def _message(what: int, timestamp_ns: int, body: bytes) -> bytes:
+    event = _PROC_EVENT.pack(what, 0, timestamp_ns) + body
+    cn = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(event), 0)
+    return _NLMSGHDR.pack(_NLMSGHDR.size + len(cn) + len(event), 3, 0, 0, 0) + cn + event
+
+
+def _source():
+    # The parser without the netlink socket, which needs CAP_NET_ADMIN.
+    source = ProcConnectorSource.__new__(ProcConnectorSource)
+    source._fork_parents = {}
+    source.partial = 0
+    return source
+
+
+def test_exited_process_gets_the_fork_time_in_clock_ticks():
+    fork_ns, exec_ns = 5_123_456_789, 5_900_000_000
+    data = (_message(PROC_EVENT_FORK, fork_ns, struct.pack("=iiii", 100, 100, GONE_PID, GONE_PID))
+            + _message(PROC_EVENT_EXEC, exec_ns, struct.pack("=ii", GONE_PID, GONE_PID)))
+    events = list(_source()._parse(data))
+    assert len(events) == 1
+    info = events[0]["info"]
+    assert info["ppid"] == 100
+    ticks = fork_ns * _CLK_TCK // 1_000_000_000
+    assert info["create_time"] == float(ticks) / _CLK_TCK + _btime()
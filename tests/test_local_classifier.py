@@ -0,0 +1,58 @@
+import json
+import random
+
+from ai.local_classifier import LocalClassifier, featurize, load_dataset
+
+SAFE_COMMANDS = ["cd ..", "dir C:\\Users\\{}", "type notes{}.txt", "echo build {}", "git status",
+                 "git log -n {}", "ping host{}", "copy report{}.docx D:\\backup", "mkdir project{}", "cls"]
+DANGEROUS_COMMANDS = ["format D: /q /label:x{}", "del /s /q C:\\Windows\\System32\\drv{}",
+                      "net user bench{} P@ss /add", "vssadmin delete shadows /all /quiet",
+                      "reg delete HKLM\\SYSTEM\\CurrentControlSet\\Services\\svc{} /f",
+                      "bcdedit /set {{default}} recoveryenabled no"]
+PROCESSES = ["notepad.exe", "chrome.exe", "explorer.exe", "code.exe", "teams.exe", "bench{}.exe"]
+
+
+def _streamed(dangerous: bool) -> dict:
+    # What analyze_text_streaming returns: safe verdicts are cut at the DANGEROUS flag.
+    if dangerous:
+        return {"DANGEROUS": True, "reason": "Flagged by AI; explanation pending (see log).",
+                "provisional": True, "streamed": True}
+    return {"DANGEROUS": False, "reason": "Streamed verdict: safe.", "streamed": True}
+
+
+def _write_logs(tmp_path):
+    rng = random.Random(3)
+    guardrail_log = tmp_path / "guardrail_log.txt"
+    with open(guardrail_log, "w", encoding="utf-8") as f:
+        for i in range(300):
+            dangerous = i % 5 == 0
+            command = rng.choice(DANGEROUS_COMMANDS if dangerous else SAFE_COMMANDS).format(i)
+            f.write(f"[2026-01-01 00:00:00] [CMD_AI_RESPONSE] {command} | AI: {_streamed(dangerous)}\n")
+    ai_log = tmp_path / "ai_interactions.log"
+    with open(ai_log, "w", encoding="utf-8") as f:
+        for i in range(400):
+            name = rng.choice(PROCESSES).format(i)
+            prompt = f"PROCESS_CREATION: NewProcess Name: {name} PID: {2000 + i} Parents: explorer.exe"
+            verdict = {"DANGEROUS": name.startswith("bench"), "reason": "Model explanation."}
+            f.write(json.dumps({"type": "PROCESS_CREATION_ANALYSIS", "prompt": prompt, "ai_response": verdict}) + "\n")
+    return str(ai_log), str(guardrail_log)
+
+
+def test_streamed_command_verdicts_are_learned(tmp_path):
+    prompts, y = load_dataset(*_write_logs(tmp_path))
+    commands = [label for prompt, label in zip(prompts, y) if prompt.startswith("CMD: ")]
+    assert len(commands) > 200 and 0 < sum(commands) < len(commands)
+
+    model = LocalClassifier.train(featurize(prompts), y)
+    for benign in ("CMD: cd ..", "CMD: dir C:\\Users"):
+        verdict = model.classify(benign)
+        assert verdict is None or verdict["DANGEROUS"] is False, (benign, verdict)
+    verdict = model.classify("CMD: vssadmin delete shadows /all /quiet")
+    assert verdict is None or verdict["DANGEROUS"] is True
+
+
+def test_sources_outside_the_training_set_are_not_classified(tmp_path):
+    prompts, y = load_dataset(*_write_logs(tmp_path))
+    model = LocalClassifier.train(featurize(prompts), y)
+    assert model.classify("REGISTRY_CHANGE: Registry change set under 'HKLM\\SYSTEM\\x'") is None
+    assert model.classify("SETTINGS_CHANGE: firewall profile disabled") is None
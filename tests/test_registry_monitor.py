@@ -0,0 +1,56 @@
+from monitor.registry_backend import MemoryRegistryBackend
+from monitor.registry_monitor import ServiceKeyTracker, _collect_batch, _SERVICES_PATH
+
+SVC = _SERVICES_PATH + "\\BenchSvc"
+
+
+class ScriptedBackend(MemoryRegistryBackend):
+    """Applies the next scripted change each time the batch waits, so every step is a separate scan."""
+
+    def __init__(self):
+        super().__init__()
+        self.steps = []
+
+    def wait_for_change(self, path: str, timeout: float = None) -> bool:
+        if not self.steps:
+            return False
+        self.steps.pop(0)(self)
+        return True
+
+
+def _batch(*steps):
+    backend = ScriptedBackend()
+    backend.set_value(SVC, "ImagePath", "C:\\Windows\\System32\\bench.exe")
+    backend.set_value(SVC, "Start", 2, 4)
+    tracker = ServiceKeyTracker(backend, baseline_path=None)
+    tracker.baseline()
+    steps[0](backend)
+    backend.steps = list(steps[1:])
+    return _collect_batch(backend, tracker)
+
+
+def test_deleted_and_recreated_key_diffs_against_the_original():
+    change_sets = _batch(lambda b: b.delete_key(SVC),
+                         lambda b: (b.set_value(SVC, "ImagePath", "C:\\evil.exe"), b.set_value(SVC, "Brand", "x")))
+    assert len(change_sets) == 1
+    cs = change_sets[0]
+    assert cs["key_change"] is None
+    assert cs["added"] == {"Brand": "x"}
+    assert cs["modified"] == {"ImagePath": "C:\\evil.exe"}
+    assert cs["deleted"] == ["Start"]
+
+
+def test_value_added_then_key_deleted_reports_only_the_original_values():
+    change_sets = _batch(lambda b: b.set_value(SVC, "Payload", "C:\\evil.dll"),
+                         lambda b: b.delete_key(SVC))
+    assert len(change_sets) == 1
+    cs = change_sets[0]
+    assert cs["key_change"] == "deleted"
+    assert cs["added"] == {} and cs["modified"] == {}
+    assert sorted(cs["deleted"]) == ["ImagePath", "Start"]
+
+
+def test_key_created_and_deleted_in_one_batch_is_not_reported():
+    other = _SERVICES_PATH + "\\Transient"
+    assert _batch(lambda b: b.set_value(other, "ImagePath", "C:\\tmp\\x.exe"),
+                  lambda b: b.delete_key(other)) == []
@@ -0,0 +1,45 @@
+from ai.rules import RuleEngine
+
+rules = RuleEngine()
+
+
+def _rule(verdict):
+    return verdict["rule"] if verdict else None
+
+
+def test_delete_under_windows_is_denied():
+    assert _rule(rules.triage("command", "del /s /q C:\\Windows\\System32")) == "cmd-recursive-delete-root"
+    assert _rule(rules.triage("command", "rd /s C:\\windows")) == "cmd-recursive-delete-root"
+
+
+def test_delete_of_a_folder_that_only_starts_with_windows_is_not_denied():
+    assert rules.triage("command", "del C:\\windowsapp_backup\\x") is None
+
+
+def test_core_process_is_only_allowed_from_the_windows_directory():
+    system = rules.triage_process("svchost.exe", "services.exe", "C:\\Windows\\System32\\svchost.exe")
+    assert system is not None and system["DANGEROUS"] is False
+    wow64 = rules.triage_process("dllhost.exe", "", "C:\\Windows\\SysWOW64\\dllhost.exe")
+    assert wow64 is not None and wow64["DANGEROUS"] is False
+    assert rules.triage_process("svchost.exe", "services.exe", "C:\\Users\\bob\\AppData\\svchost.exe") is None
+    assert rules.triage_process("dllhost.exe", "explorer.exe", "C:\\ProgramData\\dllhost.exe") is None
+    assert rules.triage_process("svchost.exe", "services.exe") is None
+
+
+def test_known_tools_are_denied_by_path_or_name():
+    assert _rule(rules.triage_process("mimikatz.exe", "", "C:\\temp\\mimikatz.exe")) == "proc-known-tools"
+    assert _rule(rules.triage_process("mimikatz.exe")) == "proc-known-tools"
+    assert rules.triage_process("notmimikatz.exe", "", "C:\\temp\\notmimikatz.exe") is None
+
+
+def test_uncounted_lookups_leave_the_hit_counters_alone():
+    engine = RuleEngine()
+    engine.triage("command", "dir", count=False)
+    assert engine.stats() == {}
+    engine.triage("command", "dir")
+    assert engine.stats() == {"cmd-readonly-builtin": 1}
+
+
+def test_parent_child_rules_match_the_child_by_path():
+    verdict = rules.triage_process("cmd.exe", "winword.exe", "C:\\Windows\\System32\\cmd.exe")
+    assert _rule(verdict) == "pc-office-spawns-shell"
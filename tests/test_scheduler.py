@@ -0,0 +1,40 @@
+import threading
+import time
+
+from ai.scheduler import InferenceScheduler, stop_requested
+
+
+def test_cancelled_running_request_can_stop_and_free_its_slot():
+    scheduler = InferenceScheduler(max_in_flight=1)
+    started = threading.Event()
+
+    def streaming_request():
+        started.set()
+        while not stop_requested():
+            time.sleep(0.005)
+        return "stopped"
+
+    running = scheduler.submit(streaming_request)
+    assert started.wait(2)
+    queued = scheduler.submit(lambda: "next")
+    assert running.cancel() is False    # already running: asked to stop, not dropped
+    assert running.result(timeout=2) == "stopped"
+    assert queued.result(timeout=2) == "next"
+
+
+def test_cancelled_queued_request_never_runs():
+    scheduler = InferenceScheduler(max_in_flight=1)
+    release = threading.Event()
+    blocker = scheduler.submit(lambda: release.wait(2))
+    ran = []
+    queued = scheduler.submit(lambda: ran.append(1))
+    assert queued.cancel() is True
+    release.set()
+    blocker.result(timeout=2)
+    assert scheduler.submit(lambda: "after").result(timeout=2) == "after"
+    assert ran == [] and scheduler.stats()["cancelled"] == 1
+
+
+def test_other_requests_do_not_see_a_stop():
+    scheduler = InferenceScheduler(max_in_flight=1)
+    assert scheduler.submit(stop_requested).result(timeout=2) is False
@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+
+import pytest
+
+from ai import mistral_analysis
+from ai.mistral_analysis import _StreamingVerdictParser, analyze_text_streaming
+from ai.model_client import model_client
+from ai.verdict_cache import verdict_cache
+from bench.fake_ollama import REASON_DANGEROUS, _tokens, fake_verdict, start_server
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    server = start_server(token_delay=0.005)
+    monkeypatch.setattr(model_client, "host", server.url)
+    monkeypatch.setattr(model_client, "_client", None)
+    monkeypatch.setattr(model_client, "_probe_client", None)
+    # Every prompt must reach the model.
+    monkeypatch.setattr(mistral_analysis, "local_classifier", None)
+    monkeypatch.setattr(mistral_analysis.semantic_index, "threshold", 2.0)
+    yield server
+    server.shutdown()
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_parser_has_the_flag_before_the_reason_is_complete():
+    parser = _StreamingVerdictParser()
+    tokens = list(_tokens(json.dumps(fake_verdict("Command:\ndel C:\\temp\\x.log"))))
+    for i, tok in enumerate(tokens):
+        parser.feed(tok)
+        if parser.dangerous is not None:
+            break
+    assert parser.dangerous is True and parser.reason is None
+    assert i < len(tokens) - 1
+    for tok in tokens[i + 1:]:
+        parser.feed(tok)
+    assert parser.reason == REASON_DANGEROUS
+
+
+def test_safe_verdict_closes_the_stream_early(fake_ollama):
+    verdict = analyze_text_streaming("CMD: dir C:\\Users\\streaming-test")
+    assert verdict["DANGEROUS"] is False and verdict["streamed"] is True
+    assert _wait_for(lambda: fake_ollama.aborted_streams == 1)
+
+
+def test_dangerous_verdict_is_provisional_until_the_reason_arrives(fake_ollama):
+    prompt = "CMD: del C:\\temp\\streaming-test.log"
+    reasons = []
+    arrived = threading.Event()
+    verdict = analyze_text_streaming(prompt, on_reason=lambda v: (reasons.append(v), arrived.set()))
+    assert verdict["DANGEROUS"] is True and verdict["provisional"] is True
+    assert arrived.wait(5)
+    assert reasons == [{"DANGEROUS": True, "reason": REASON_DANGEROUS}]
+    assert verdict_cache.get(prompt) == reasons[0]
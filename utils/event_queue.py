@@ -0,0 +1,180 @@
+import random
+import threading
+import time
+from collections import deque
+from utils.logger import log_event
+from utils.metrics import metrics
+from utils import tracing
+
+POLICY_COALESCE = "coalesce"        # merge identical queued events, drop new ones when full
+POLICY_DROP_LOWEST = "drop_lowest"  # evict the oldest lowest-priority event to make room
+POLICY_SAMPLE = "sample"            # above the high-water mark, admit only 1 in `sample_every`
+
+DROP_REPORT_INTERVAL = 10.0
+
+
+class BoundedEventQueue:
+    """
+    Fixed-capacity, priority-aware queue between a monitor and its analysis
+    workers. Lower priority numbers are served first. Identical events (same
+    `key`) are always coalesced while queued; what happens when the queue is
+    full is decided by `policy`. Memory stays bounded by `maxsize`.
+    """
+
+    def __init__(self, name: str, maxsize: int = 256, policy: str = POLICY_COALESCE,
+                 levels: int = 3, high_water: float = 0.5, sample_every: int = 4):
+        if policy not in (POLICY_COALESCE, POLICY_DROP_LOWEST, POLICY_SAMPLE):
+            raise ValueError(f"Unknown overflow policy '{policy}'")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.high_water = int(maxsize * high_water)
+        self.sample_every = max(1, sample_every)
+        self._levels = [deque() for _ in range(levels)]
+        self._by_key = {}   # key → queued entry, for coalescing
+        self._size = 0
+        self._cond = threading.Condition()
+        self._last_drop_report = 0.0
+        self._reported_drops = 0
+        self.enqueued = 0
+        self.dequeued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.max_depth = 0
+        metrics.collect("guardrail_queue", self.stats, queue=name)
+
+    def put(self, event, priority: int = 1, key=None) -> bool:
+        """Returns False if the event was dropped or sampled out."""
+        priority = min(max(priority, 0), len(self._levels) - 1)
+        with self._cond:
+            if key is not None and key in self._by_key:
+                self._by_key[key]["count"] += 1
+                self.coalesced += 1
+                return True
+
+            if self.policy == POLICY_SAMPLE and self._size >= self.high_water:
+                if random.randrange(self.sample_every):
+                    self.sampled_out += 1
+                    self._report_drops()
+                    return False
+
+            if self._size >= self.maxsize and not self._make_room(priority):
+                self.dropped += 1
+                self._report_drops()
+                return False
+
+            entry = {"event": event, "key": key, "count": 1, "enqueued_at": time.monotonic(),
+                     "trace": tracing.current()}
+            self._levels[priority].append(entry)
+            if key is not None:
+                self._by_key[key] = entry
+            self._size += 1
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self._size)
+            self._cond.notify()
+            return True
+
+    def _make_room(self, priority: int) -> bool:
+        if self.policy != POLICY_DROP_LOWEST:
+            return False
+        # Evict from the lowest-priority non-empty level, but never for an event less important than it.
+        for level in range(len(self._levels) - 1, priority, -1):
+            if self._levels[level]:
+                victim = self._levels[level].popleft()
+                self._forget(victim)
+                self._size -= 1
+                self.dropped += 1
+                return True
+        return False
+
+    def _forget(self, entry):
+        if entry["key"] is not None and self._by_key.get(entry["key"]) is entry:
+            del self._by_key[entry["key"]]
+
+    def get(self, timeout: float = None):
+        """
+        Returns (event, count, queued_seconds, trace); count > 1 when identical
+        events were coalesced into this one. Returns None on timeout.
+        """
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            for level in self._levels:
+                if level:
+                    entry = level.popleft()
+                    break
+            self._forget(entry)
+            self._size -= 1
+            self.dequeued += 1
+            return entry["event"], entry["count"], time.monotonic() - entry["enqueued_at"], entry["trace"]
+
+    def depth(self) -> int:
+        with self._cond:
+            return self._size
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "name": self.name,
+                "policy": self.policy,
+                "depth": self._size,
+                "max_depth": self.max_depth,
+                "capacity": self.maxsize,
+                "enqueued": self.enqueued,
+                "dequeued": self.dequeued,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "sampled_out": self.sampled_out,
+            }
+
+    def _report_drops(self):
+        # Called with the lock held; rate-limited so a burst doesn't flood the log.
+        now = time.monotonic()
+        lost = self.dropped + self.sampled_out
+        if now - self._last_drop_report >= DROP_REPORT_INTERVAL and lost > self._reported_drops:
+            log_event("EVENT_QUEUE_OVERFLOW",
+                      f"{self.name}: {lost - self._reported_drops} events shed "
+                      f"(policy={self.policy}, depth={self._size}/{self.maxsize})")
+            self._last_drop_report = now
+            self._reported_drops = lost
+
+
+def start_workers(queue: BoundedEventQueue, handler, count: int = 2):
+    """Starts `count` daemon threads feeding queued events to `handler(event, count)`."""
+    # Time spent queued is how far the workers are behind their monitor.
+    intake = metrics.histogram("guardrail_stage_seconds", stage="intake", queue=queue.name)
+    handling = metrics.histogram("guardrail_stage_seconds", stage="handle", queue=queue.name)
+    errors = metrics.counter("guardrail_worker_errors_total", queue=queue.name)
+
+    def _worker():
+        while True:
+            item = queue.get()
+            if item is None:
+                continue
+            event, n, waited, trace = item
+            intake.observe(waited)
+            started = time.perf_counter()
+            # Events traced since intake keep their trace; the rest may start one here.
+            if trace is None:
+                trace = tracing.start_trace(queue.name, age=waited)
+            if trace is not None:
+                trace.add("queue.wait", started - waited, started)
+            with tracing.activate(trace, finish=True):
+                try:
+                    handler(event, n)
+                except Exception as e:
+                    errors.inc()
+                    log_event("EVENT_WORKER_ERROR", f"{queue.name}: {e}")
+            handling.observe(time.perf_counter() - started)
+
+    threads = []
+    for i in range(count):
+        t = threading.Thread(target=_worker, name=f"{queue.name}-worker-{i}", daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
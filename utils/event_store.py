@@ -0,0 +1,367 @@
+"""
+Append-only store of guardrail events for incident investigation.
+
+Events are written to one SQLite segment per day (events-YYYYMMDD.sqlite)
+with indexes on time, event type, PID, SHA256 and command, so a query only
+opens the segments its time range covers and only reads matching rows.
+The live logger feeds it (see attach()); old text logs are imported with
+
+    python -m utils.event_store import logs/guardrail_log.txt logs/ai_interactions.log
+    python -m utils.event_store query --since 2h --type CMD_FLAGGED
+    python -m utils.event_store query --since "2025-06-06 10:00" --until "2025-06-06 11:00" --pid 4312
+    python -m utils.event_store count --by type --since 7d
+"""
+import argparse
+import datetime
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+STORE_DIR = os.environ.get("GUARDRAIL_EVENT_STORE",
+                           os.path.join(os.path.dirname(__file__), '..', 'logs', 'events'))
+
+SEGMENT_PATTERN = re.compile(r"events-(\d{8})\.sqlite$")
+FIELDS = ("pid", "sha256", "command")
+OPEN_SEGMENTS = 2    # writer connections kept open (today and yesterday, around midnight)
+GROUP_BY = {"type": "type", "pid": "pid", "sha256": "sha256", "command": "command",
+            "hour": "strftime('%Y-%m-%d %H:00', ts, 'unixepoch', 'localtime')"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    detail TEXT NOT NULL,
+    pid INTEGER,
+    sha256 TEXT,
+    command TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_type ON events (type, ts);
+CREATE INDEX IF NOT EXISTS events_pid ON events (pid, ts);
+CREATE INDEX IF NOT EXISTS events_sha256 ON events (sha256, ts);
+CREATE INDEX IF NOT EXISTS events_command ON events (command, ts);
+"""
+
+# Fields the monitors put into log_event details.
+_PID = re.compile(r"\bPID: (\d+)")
+_SHA256 = re.compile(r"\bSHA256: ([0-9A-Fa-f]{64})\b")
+_PROCESS_CMD = re.compile(r"\bCmd: (.*?) SHA256: ")
+_COMMAND = re.compile(r"^(?:Analyzing command|Command|User blocked command|User allowed command|"
+                      r"Command deemed safe): (.*?)(?: \| AI(?: Response)?: .*)?$", re.S)
+_SHELL_CMD = re.compile(r"^(.*?)(?: \| (?:AI|Reason|Error): .*| blocked by user| allowed by user| deemed safe)$", re.S)
+_LOG_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] \[([A-Z0-9_]+)\] ?(.*)$")
+
+
+def extract_fields(event_type: str, detail: str) -> dict:
+    """PID, SHA256 and command found in a log_event detail string."""
+    fields = {}
+    m = _PID.search(detail)
+    if m:
+        fields["pid"] = int(m.group(1))
+    m = _SHA256.search(detail)
+    if m:
+        fields["sha256"] = m.group(1).lower()
+    m = _PROCESS_CMD.search(detail)
+    if m:
+        fields["command"] = m.group(1)
+    elif event_type.startswith("CMD_"):
+        m = _COMMAND.match(detail)
+        if m is None and event_type != "CMD_INPUT":
+            m = _SHELL_CMD.match(detail)
+        fields["command"] = m.group(1) if m else detail
+    return fields
+
+
+def parse_time(text: str, now: float = None) -> float:
+    """'2h' / '30m' / '7d' ago, or a local 'YYYY-MM-DD[ HH:MM[:SS]]'."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", text.strip())
+    if m:
+        unit = {"s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)]
+        return (now if now is not None else time.time()) - float(m.group(1)) * unit
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text.strip(), fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised time '{text}'")
+
+
+def _day(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y%m%d")
+
+
+class EventStore:
+    """
+    Day-partitioned event segments under `root`. Writes are meant for a
+    single thread (the log writer or an importer); queries open their own
+    read-only connections.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._writers = {}    # day → connection
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.root, f"events-{day}.sqlite")
+
+    def _writer(self, day: str):
+        conn = self._writers.get(day)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self._segment_path(day), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._writers[day] = conn
+            for old in sorted(self._writers)[:-OPEN_SEGMENTS]:
+                if old != day:
+                    self._writers.pop(old).close()
+        return conn
+
+    def append_many(self, events) -> int:
+        """Stores (ts, type, detail, fields or None) tuples; fields are extracted when None."""
+        by_day = {}
+        for ts, event_type, detail, fields in events:
+            if fields is None:
+                fields = extract_fields(event_type, detail)
+            extra = {k: v for k, v in fields.items() if k not in FIELDS}
+            by_day.setdefault(_day(ts), []).append(
+                (ts, event_type, detail, fields.get("pid"), fields.get("sha256"), fields.get("command"),
+                 json.dumps(extra) if extra else None))
+        count = 0
+        for day, rows in by_day.items():
+            conn = self._writer(day)
+            with conn:
+                conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            count += len(rows)
+        return count
+
+    def append(self, event_type: str, detail: str, ts: float = None, **fields):
+        self.append_many([(ts if ts is not None else time.time(), event_type, detail, fields or None)])
+
+    def segments(self, start: float = None, end: float = None) -> list:
+        """Segment paths whose day overlaps [start, end], oldest first."""
+        first = _day(start) if start is not None else None
+        last = _day(end) if end is not None else None
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.root, "events-*.sqlite"))):
+            m = SEGMENT_PATTERN.search(path)
+            if m and (first is None or m.group(1) >= first) and (last is None or m.group(1) <= last):
+                paths.append(path)
+        return paths
+
+    @staticmethod
+    def _where(start, end, filters: dict):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(end)
+        for name in ("type", "pid", "sha256", "command"):
+            value = filters.get(name)
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value.lower() if name == "sha256" else value)
+        if filters.get("contains"):
+            clauses.append("detail LIKE ?")
+            params.append(f"%{filters['contains']}%")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _read(self, path: str):
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def query(self, start: float = None, end: float = None, limit: int = None, **filters):
+        """
+        Yields event dicts in time order. Filters: type, pid, sha256, command
+        (exact, indexed) and contains (substring of the detail, scanned).
+        """
+        where, params = self._where(start, end, filters)
+        remaining = limit
+        for path in self.segments(start, end):
+            sql = f"SELECT ts, type, detail, pid, sha256, command, data FROM events{where} ORDER BY ts"
+            if remaining is not None:
+                sql += f" LIMIT {int(remaining)}"
+            conn = self._read(path)
+            try:
+                for ts, event_type, detail, pid, sha256, command, data in conn.execute(sql, params):
+                    event = {"ts": ts, "type": event_type, "detail": detail, "pid": pid,
+                             "sha256": sha256, "command": command}
+                    if data:
+                        event.update(json.loads(data))
+                    yield event
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining <= 0:
+                            return
+            finally:
+                conn.close()
+
+    def count(self, by: str, start: float = None, end: float = None, **filters) -> dict:
+        """{group value: event count} over the matching events."""
+        column = GROUP_BY[by]
+        where, params = self._where(start, end, filters)
+        totals = {}
+        for path in self.segments(start, end):
+            conn = self._read(path)
+            try:
+                for key, n in conn.execute(f"SELECT {column}, COUNT(*) FROM events{where} GROUP BY 1", params):
+                    totals[key] = totals.get(key, 0) + n
+            finally:
+                conn.close()
+        return totals
+
+    def close(self):
+        for conn in self._writers.values():
+            conn.close()
+        self._writers.clear()
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def read_text_log(path: str):
+    """(ts, type, detail, None) from a guardrail_log.txt (or a rotated .gz segment)."""
+    current = None
+    with _open_text(path) as f:
+        for raw in f:
+            line = raw.rstrip("\n")
+            m = _LOG_LINE.match(line)
+            if m:
+                if current is not None:
+                    yield current
+                stamp = datetime.datetime.strptime(m.group(1), '%Y-%m-%d %H:%M:%S').timestamp()
+                current = (stamp, m.group(2), m.group(3), None)
+            elif current is not None:
+                # Details with newlines (exception text) continue on the following lines.
+                current = (current[0], current[1], current[2] + "\n" + line, None)
+    if current is not None:
+        yield current
+
+
+def ai_interaction_event(entry: dict):
+    """An ai_interactions.log entry as a (ts, type, detail, fields) event."""
+    stamp = entry.get("timestamp")
+    try:
+        ts = datetime.datetime.fromisoformat(stamp).replace(tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        ts = time.time()
+    info = entry.get("process_info") or {}
+    fields = {"analysis_type": entry.get("type"), "ai_response": entry.get("ai_response")}
+    if info.get("pid") is not None:
+        fields["pid"] = info["pid"]
+    if info.get("sha256") and len(str(info["sha256"])) == 64:
+        fields["sha256"] = str(info["sha256"]).lower()
+    if info.get("command_line"):
+        fields["command"] = info["command_line"]
+    return ts, "AI_INTERACTION", entry.get("prompt") or "", fields
+
+
+def read_ai_log(path: str):
+    with _open_text(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict):
+                yield ai_interaction_event(entry)
+
+
+def import_log(store: EventStore, path: str, batch: int = 5000) -> int:
+    """Imports a text or ai_interactions log (JSON lines); returns the number of events."""
+    with _open_text(path) as f:
+        first = f.readline().lstrip()
+    reader = read_ai_log if first.startswith("{") else read_text_log
+    total = 0
+    pending = []
+    for event in reader(path):
+        pending.append(event)
+        if len(pending) >= batch:
+            total += store.append_many(pending)
+            pending = []
+    if pending:
+        total += store.append_many(pending)
+    return total
+
+
+def attach(root: str = STORE_DIR) -> EventStore:
+    """Feeds every log_event and logged AI interaction into a store from the log writer thread."""
+    from utils.logger import writer
+    store = EventStore(root)
+    writer.add_sink(store.append_many)
+    return store
+
+
+def _print_event(event: dict):
+    stamp = datetime.datetime.fromtimestamp(event["ts"]).strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{stamp}] [{event['type']}] {event['detail']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m utils.event_store", description="Query guardrail events.")
+    ap.add_argument("--store", default=STORE_DIR)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="import guardrail_log.txt / ai_interactions.log files")
+    imp.add_argument("paths", nargs="+")
+
+    def add_filters(p):
+        p.add_argument("--since", help="start time: '2h', '7d' or 'YYYY-MM-DD[ HH:MM[:SS]]'")
+        p.add_argument("--until", help="end time, same formats")
+        p.add_argument("--type")
+        p.add_argument("--pid", type=int)
+        p.add_argument("--sha256")
+        p.add_argument("--cmd", help="exact command line")
+        p.add_argument("--contains", help="substring of the detail text (not indexed)")
+
+    q = sub.add_parser("query", help="list matching events")
+    add_filters(q)
+    q.add_argument("--limit", type=int, default=1000)
+    q.add_argument("--json", action="store_true", help="one JSON object per line")
+
+    c = sub.add_parser("count", help="count matching events per group")
+    add_filters(c)
+    c.add_argument("--by", choices=sorted(GROUP_BY), default="type")
+    c.add_argument("--top", type=int, default=20)
+
+    args = ap.parse_args(argv)
+    store = EventStore(args.store)
+    try:
+        if args.command == "import":
+            for path in args.paths:
+                t0 = time.perf_counter()
+                n = import_log(store, path)
+                print(f"{path}: {n} events in {time.perf_counter() - t0:.1f} s")
+            return 0
+        start = parse_time(args.since) if args.since else None
+        end = parse_time(args.until) if args.until else None
+        filters = {"type": args.type, "pid": args.pid, "sha256": args.sha256, "command": args.cmd,
+                   "contains": args.contains}
+        if args.command == "query":
+            for event in store.query(start, end, limit=args.limit, **filters):
+                if args.json:
+                    print(json.dumps(event))
+                else:
+                    _print_event(event)
+        else:
+            totals = store.count(args.by, start, end, **filters)
+            for key, n in sorted(totals.items(), key=lambda kv: -kv[1])[:args.top]:
+                print(f"{n:10d}  {key}")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.logger import log_event
+from utils.metrics import metrics
+from utils.tracing import propagate, span
+
+CACHE_PATH = os.environ.get("GUARDRAIL_HASH_CACHE",
+                            os.path.join(os.path.dirname(__file__), '..', 'cache', 'hash_cache.json'))
+
+MAX_ENTRIES = 50000
+HASH_WORKERS = 2
+READ_BUFFER = 1 << 20        # 1 MiB reads when mmap isn't possible
+SAVE_EVERY = 100
+SAVE_INTERVAL = 60.0
+
+
+def _file_identity(path: str):
+    """(size, mtime_ns, device, file id). Any change in these invalidates a cached hash."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino
+
+
+def _sha256_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        try:
+            # One hashlib.update over the whole mapping; the GIL is released while it runs.
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                hasher.update(m)
+                return hasher.hexdigest()
+        except (ValueError, OSError):
+            # Empty files and some special files can't be mapped.
+            f.seek(0)
+        buf = bytearray(READ_BUFFER)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+class HashCache:
+    """
+    Persistent executable-hash cache keyed by (path, size, mtime, file id),
+    with hashing done on a small worker pool. Concurrent requests for the
+    same file share one hashing job.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES, workers: int = HASH_WORKERS):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # normcased path → [size, mtime_ns, dev, ino, sha256]
+        self._pending = {}              # (path, identity) → Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hasher")
+        # Hasher threads and atexit all save; one writes at a time.
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        self._last_save = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, path: str) -> Future:
+        """Returns a Future resolving to the file's SHA256 hex digest, or "N/A" if unreadable."""
+        key = os.path.normcase(os.path.abspath(path))
+        try:
+            identity = _file_identity(path)
+        except OSError:
+            return _done("N/A")
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and tuple(entry[:4]) == identity:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _done(entry[4])
+            pending = self._pending.get((key, identity))
+            if pending is not None:
+                self.hits += 1
+                return pending
+            self.misses += 1
+            future = self._pool.submit(propagate(self._hash), key, path, identity)
+            self._pending[(key, identity)] = future
+            return future
+
+    def hash_file(self, path: str) -> str:
+        return self.submit(path).result()
+
+    def _hash(self, key, path, identity) -> str:
+        try:
+            with span("hash.compute"):
+                digest = _sha256_file(path)
+        except Exception:
+            digest = "N/A"
+        with self._lock:
+            self._pending.pop((key, identity), None)
+            if digest != "N/A":
+                self._entries[key] = [*identity, digest]
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._dirty += 1
+            due = self._dirty >= SAVE_EVERY or (self._dirty and time.time() - self._last_save >= SAVE_INTERVAL)
+        if due:
+            self.save()
+        return digest
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "pending": len(self._pending),
+                    "hits": self.hits, "misses": self.misses}
+
+    def _read(self) -> list:
+        """[[key, entry]] stored on disk, oldest first."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            log_event("HASH_CACHE_LOAD_ERROR", f"Failed to load {self.path}: {e}")
+            return []
+
+    def load(self):
+        entries = self._read()
+        with self._lock:
+            for key, entry in entries:
+                if isinstance(entry, list) and len(entry) == 5:
+                    self._entries[key] = entry
+
+    def _merge_saved(self):
+        """Adopts hashes other processes saved meanwhile (as least recent); call with _save_lock held."""
+        entries = self._read()
+        with self._lock:
+            for key, entry in reversed(entries):
+                if key not in self._entries and isinstance(entry, list) and len(entry) == 5:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key, last=False)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+            self._merge_saved()
+            with self._lock:
+                entries = list(self._entries.items())
+                self._dirty = 0
+                self._last_save = time.time()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = f"{self.path}.{os.getpid()}.tmp"    # isolated monitors save from several processes
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({"version": 1, "entries": entries}, f)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                log_event("HASH_CACHE_SAVE_ERROR", f"Failed to save {self.path}: {e}")
+
+
+def _done(value) -> Future:
+    f = Future()
+    f.set_result(value)
+    return f
+
+
+hash_cache = HashCache()
+hash_cache.load()
+metrics.collect("guardrail_hash_cache", hash_cache.stats)
+atexit.register(hash_cache.save)
@@ -1,13 +1,224 @@
-import threading
+import atexit
+import collections
 import datetime
+import gzip
 import os
+import shutil
+import sys
+import threading
+import time
 
-_lock = threading.Lock()
 LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'logs', 'guardrail_log.txt')
 
+# Lines wait in memory and are written by one background thread, so callers never touch the disk.
+MAX_PENDING = int(os.environ.get("GUARDRAIL_LOG_QUEUE", "10000"))
+FLUSH_INTERVAL = float(os.environ.get("GUARDRAIL_LOG_FLUSH_INTERVAL", "0.5"))
+BATCH_LINES = 256           # the writer is woken early once this many lines are pending
+MAX_BYTES = int(os.environ.get("GUARDRAIL_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+BACKUPS = int(os.environ.get("GUARDRAIL_LOG_BACKUPS", "5"))
+
+
+def rotate(path: str, backups: int = BACKUPS):
+    """Compresses `path` into path.1.gz, shifting older segments up and dropping the oldest."""
+    if backups <= 0:
+        os.remove(path)
+        return
+    oldest = f"{path}.{backups}.gz"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for i in range(backups - 1, 0, -1):
+        segment = f"{path}.{i}.gz"
+        if os.path.exists(segment):
+            os.replace(segment, f"{path}.{i + 1}.gz")
+    with open(path, 'rb') as src, gzip.open(f"{path}.1.gz", 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+class LogWriter:
+    """
+    Append-only log files behind one writer thread. `write` only appends to
+    a deque (safe without a lock) and drops the line, counting it, once
+    MAX_PENDING lines are waiting. The writer drains every FLUSH_INTERVAL seconds or as soon
+    as BATCH_LINES are pending, writes each file's lines in one call and
+    rotates a file into compressed segments once it passes MAX_BYTES.
+    Lines may carry a structured event, which sinks receive in batches.
+    In a monitor's child process the writer forwards its batches to the
+    parent's writer instead of touching the files (see `forward`).
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING, flush_interval: float = FLUSH_INTERVAL,
+                 max_bytes: int = MAX_BYTES, backups: int = BACKUPS):
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._pending = collections.deque()
+        self._wake = threading.Event()
+        self._files = {}    # path → open file
+        self._sinks = []
+        self._forward = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._reported_drops = 0
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def write(self, path: str, line: str, event=None):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((path, line, event))
+        if self._thread is None:
+            self._start()
+        if len(self._pending) >= BATCH_LINES and not self._wake.is_set():
+            self._wake.set()
+
+    def write_batch(self, entries):
+        """Queues (path, line, event) entries forwarded from another process; path "" is LOG_PATH."""
+        for path, line, event in entries:
+            self.write(path or LOG_PATH, line, event)
+
+    def forward(self, send):
+        """From now on each drained batch goes to `send(entries)` instead of the files and sinks."""
+        self._forward = send
+
+    def add_sink(self, fn):
+        """`fn(events)` gets each batch of (ts, type, detail, fields) events on the writer thread."""
+        self._sinks.append(fn)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Blocks until everything written so far is on disk. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        # A marker behind the pending lines; it is passed over by the queue bound.
+        done = threading.Event()
+        self._pending.append((None, done, None))
+        self._wake.set()
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self):
+        entries = []
+        flushed = []
+        while True:
+            try:
+                entry = self._pending.popleft()
+            except IndexError:
+                break
+            if entry[0] is None:
+                flushed.append(entry[1])
+            else:
+                entries.append(entry)
+        dropped = self.dropped - self._reported_drops
+        if dropped:
+            self._reported_drops += dropped
+            line = _format("LOG_DROPPED", f"{dropped} lines dropped, log queue full", time.time())
+            entries.append((LOG_PATH, line, None))
+        if self._forward is not None:
+            self._send(entries)
+        else:
+            self._store(entries)
+        for done in flushed:
+            done.set()
+
+    def _send(self, entries):
+        if not entries:
+            return
+        try:
+            # The parent's LOG_PATH may differ from this process's, so the main log travels as "".
+            self._forward([("" if path == LOG_PATH else path, line, event) for path, line, event in entries])
+            self.written += len(entries)
+        except Exception as e:
+            self.errors += 1
+            print(f"[guardrail] log forwarding failed: {e}", file=sys.stderr)
+
+    def _store(self, entries):
+        batches = {}
+        events = []
+        for path, line, event in entries:
+            batches.setdefault(path, []).append(line)
+            if event is not None:
+                events.append(event)
+        for path, lines in batches.items():
+            self._write_file(path, "".join(lines))
+            self.written += len(lines)
+        if events:
+            for sink in self._sinks:
+                try:
+                    sink(events)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[guardrail] log sink failed: {e}", file=sys.stderr)
+
+    def _write_file(self, path: str, data: str):
+        try:
+            f = self._files.get(path)
+            if f is None:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                f = self._files[path] = open(path, 'a', encoding='utf-8')
+            f.write(data)
+            f.flush()
+            if self.max_bytes and f.tell() >= self.max_bytes:
+                f.close()
+                del self._files[path]
+                rotate(path, self.backups)
+                self.rotations += 1
+        except Exception as e:
+            # Logging about the logger would only feed the same failure.
+            self.errors += 1
+            self._files.pop(path, None)
+            print(f"[guardrail] log write to {path} failed: {e}", file=sys.stderr)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations, "errors": self.errors}
+
+
+# (second, formatted): the timestamp is only re-formatted when the second changes.
+_stamp = (0, "")
+
+
+def _format(event_type: str, detail: str, ts: float) -> str:
+    global _stamp
+    second, timestamp = _stamp
+    if int(ts) != second:
+        timestamp = datetime.datetime.fromtimestamp(int(ts)).strftime('%Y-%m-%d %H:%M:%S')
+        _stamp = (int(ts), timestamp)
+    return f'[{timestamp}] [{event_type}] {detail}\n'
+
+
+writer = LogWriter()
+
+
 def log_event(event_type: str, detail: str):
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    entry = f'[{timestamp}] [{event_type}] {detail}\n'
-    with _lock:
-        with open(LOG_PATH, 'a', encoding='utf-8') as f:
-            f.write(entry)
+    ts = time.time()
+    writer.write(LOG_PATH, _format(event_type, detail, ts), (ts, event_type, detail, None))
+
+
+def log_line(path, line: str, event=None):
+    """
+    Appends one line (newline added) to another log file through the same
+    writer; `event` is an optional (ts, type, detail, fields) tuple for sinks.
+    """
+    writer.write(str(path), line + '\n', event)
+
+
+def flush(timeout: float = 5.0) -> bool:
+    return writer.flush(timeout)
+
+
+atexit.register(flush)
@@ -0,0 +1,276 @@
+"""
+Process-wide metrics: counters, gauges and latency histograms, plus
+collectors that export the stats() dicts the caches and queues already keep.
+Served as Prometheus-style text on localhost and written to a JSON snapshot.
+
+    curl http://127.0.0.1:9310/metrics
+"""
+from bisect import bisect_left
+import json
+import os
+import threading
+import time
+from utils.logger import log_event, writer as log_writer
+
+PORT = int(os.environ.get("GUARDRAIL_METRICS_PORT", "9310"))
+SNAPSHOT_PATH = os.environ.get("GUARDRAIL_METRICS_SNAPSHOT",
+                               os.path.join(os.path.dirname(__file__), '..', 'logs', 'metrics.json'))
+SNAPSHOT_INTERVAL = float(os.environ.get("GUARDRAIL_METRICS_INTERVAL", "30"))
+
+# Latency buckets in seconds: sub-millisecond cache hits up to minute-long model calls.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    # Updates take no lock: an increment lost to a thread switch is cheaper than a lock per event.
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, n=1):
+        self.value += n
+
+    def dec(self, n=1):
+        self.value -= n
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; the last bucket collects everything above BUCKETS."""
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+
+    def time(self) -> _Timer:
+        """Context manager timing its block; about 1 us, so hot paths observe perf_counter deltas."""
+        return _Timer(self)
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-quantile; None if it is above the last bound."""
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for bound, n in zip(self.bounds, counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+
+def _label_text(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Metrics are keyed by name and labels; asking for the same pair again
+    returns the same object. A lookup costs about a microsecond, so hot
+    paths look their metrics up once and keep them.
+    """
+
+    def __init__(self):
+        self._metrics = {}       # (name, labels) → metric
+        self._collectors = []    # (prefix, labels, fn)
+        self._remote = {}        # process name → (name, labels) → metric, see add_remote
+        self._lock = threading.Lock()
+        self._server = None
+        self._snapshotter = None
+
+    def _get(self, cls, name: str, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls()
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(Histogram, name, labels)
+
+    def collect(self, prefix: str, fn, **labels):
+        """Exports the numeric values of `fn()` (a stats dict) as `<prefix>_<key>` gauges."""
+        with self._lock:
+            self._collectors.append((prefix, tuple(sorted(labels.items())), fn))
+
+    def _collected(self):
+        for prefix, labels, fn in list(self._collectors):
+            try:
+                stats = fn()
+            except Exception as e:
+                log_event("METRICS_COLLECT_ERROR", f"{prefix}: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield f"{prefix}_{key}", labels, value
+
+    def export(self) -> list:
+        """Every metric and collected value as picklable (name, labels, value or (counts, sum)) tuples."""
+        exported = []
+        for (name, labels), metric in self._items(remote=False):
+            if isinstance(metric, Histogram):
+                exported.append((name, labels, (list(metric.counts), metric.sum)))
+            else:
+                exported.append((name, labels, metric.value))
+        exported.extend(self._collected())
+        return exported
+
+    def add_remote(self, process: str, exported: list):
+        """
+        Replaces the metrics last exported by another process (a monitor's
+        child process); they are served with a process="<name>" label.
+        """
+        remote = {}
+        for name, labels, value in exported:
+            if isinstance(value, tuple):
+                metric = Histogram()
+                metric.counts, metric.sum = list(value[0]), value[1]
+            else:
+                metric = Gauge()
+                metric.value = value
+            remote[(name, tuple(labels) + (("process", process),))] = metric
+        with self._lock:
+            self._remote[process] = remote
+
+    def _items(self, remote: bool = True):
+        with self._lock:
+            items = list(self._metrics.items())
+            if remote:
+                for metrics_of_process in self._remote.values():
+                    items.extend(metrics_of_process.items())
+        return sorted(items, key=lambda kv: kv[0])
+
+    def render(self) -> str:
+        lines = []
+        for (name, labels), metric in self._items():
+            if isinstance(metric, Histogram):
+                counts = list(metric.counts)
+                cumulative = 0
+                for bound, n in zip(metric.bounds + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {metric.sum:.6f}")
+                lines.append(f"{name}_count{_label_text(labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_label_text(labels)} {metric.value}")
+        for name, labels, value in self._collected():
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """{"taken_at", "metrics": [{name, labels, value | count/sum/p50/p99}]}."""
+        entries = []
+        for (name, labels), metric in self._items():
+            entry = {"name": name, "labels": dict(labels)}
+            if isinstance(metric, Histogram):
+                entry.update(count=sum(metric.counts), sum=round(metric.sum, 6),
+                             p50=metric.quantile(0.5), p99=metric.quantile(0.99))
+            else:
+                entry["value"] = metric.value
+            entries.append(entry)
+        for name, labels, value in self._collected():
+            entries.append({"name": name, "labels": dict(labels), "value": value})
+        return {"taken_at": time.time(), "metrics": entries}
+
+    def write_snapshot(self, path: str = SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def serve(self, port: int = PORT):
+        """Starts the localhost /metrics endpoint on a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+    def start(self, port: int = PORT, snapshot_path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_INTERVAL):
+        """Endpoint (unless port is 0) plus a snapshot file rewritten every `interval` seconds."""
+        if port:
+            try:
+                self.serve(port)
+                log_event("METRICS", f"Metrics on http://127.0.0.1:{self._server.server_address[1]}/metrics")
+            except OSError as e:
+                log_event("METRICS_ERROR", f"Could not listen on port {port}: {e}")
+        if snapshot_path and self._snapshotter is None:
+            def loop():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.write_snapshot(snapshot_path)
+                    except Exception as e:
+                        log_event("METRICS_SNAPSHOT_ERROR", str(e))
+
+            self._snapshotter = threading.Thread(target=loop, name="metrics-snapshot", daemon=True)
+            self._snapshotter.start()
+
+
+metrics = MetricsRegistry()
+metrics.collect("guardrail_log", log_writer.stats)
@@ -1,8 +1,37 @@
 import ctypes
-import tkinter as tk
-from tkinter import messagebox
+import functools
+import os
+import time
+from utils.logger import log_event
+from utils.metrics import metrics
+from utils.tracing import span
 
+# Headless runs (trace replay, benchmarks, non-Windows hosts) log popups instead of showing them.
+HEADLESS = os.environ.get("GUARDRAIL_HEADLESS") == "1"
+
+_popup_time = metrics.histogram("guardrail_stage_seconds", stage="popup")
+
+
+def _timed(fn):
+    # Modal boxes block their worker until the user answers; that wait is the popup stage.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with span("popup"):
+                return fn(*args, **kwargs)
+        finally:
+            _popup_time.observe(time.perf_counter() - started)
+    return wrapper
+
+
+@_timed
 def ask_user_choice(title, message):
+    if HEADLESS:
+        log_event("POPUP_HEADLESS", f"{title}: {message} -> Continue")
+        return "Continue"
+    import tkinter as tk
+    from tkinter import messagebox
     root = tk.Tk()
     root.withdraw()
     result = messagebox.askyesno(title, message + "\n\nYes = Continue, No = Stop")
@@ -10,6 +39,20 @@ def ask_user_choice(title, message):
     return "Continue" if result else "Stop"
 
 
+@_timed
 def show_popup(title: str, message: str):
+    if HEADLESS:
+        log_event("POPUP_HEADLESS", f"{title}: {message}")
+        return
     # MB_SYSTEMMODAL = 0x1000, MB_OK = 0x0
     ctypes.windll.user32.MessageBoxW(0, message, title, 0x00001000)
+
+
+@_timed
+def confirm_popup(title: str, message: str) -> bool:
+    """OK/Cancel box. Returns True if the user chose OK (continue)."""
+    if HEADLESS:
+        log_event("POPUP_HEADLESS", f"{title}: {message} -> OK")
+        return True
+    # MB_OKCANCEL = 0x1; IDOK = 1, IDCANCEL = 2
+    return ctypes.windll.user32.MessageBoxW(0, message, title, 1) != 2
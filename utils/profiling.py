@@ -0,0 +1,126 @@
+"""
+Profilers for `python main.py --profile sample|cprofile`.
+
+sample   samples every thread's stack with sys._current_frames() and writes
+         folded stacks (flamegraph.pl, speedscope, inferno) per thread group:
+         one file per monitor thread and per worker pool, plus all.folded.
+cprofile runs each monitor thread under its own cProfile.Profile and writes
+         <monitor>.pstats (snakeviz, flameprof, gprof2dot).
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from utils.logger import log_event
+from utils.watchdog_timer import resolve_target
+
+SAMPLE_INTERVAL = float(os.environ.get("GUARDRAIL_PROFILE_INTERVAL", "0.005"))
+MAX_DEPTH = 128
+
+_POOL_SUFFIX = re.compile(r"[-_]\d+$")
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def thread_group(name: str) -> str:
+    """'process_events-worker-1' and 'process_events-worker-0' profile together."""
+    return _POOL_SUFFIX.sub("", name)
+
+
+class SamplingProfiler:
+    """Counts folded stacks of every other thread, `interval` seconds apart."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()     # (group, folded stack) → samples
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                group = thread_group(names.get(ident, f"thread-{ident}"))
+                self.stacks[(group, ";".join(reversed(stack)))] += 1
+            self.samples += 1
+
+    def write(self, out_dir: str) -> list:
+        """Writes <group>.folded per thread group and all.folded (thread group as root frame)."""
+        os.makedirs(out_dir, exist_ok=True)
+        groups = {}
+        for (group, stack), n in self.stacks.items():
+            groups.setdefault(group, []).append((stack, n))
+        paths = []
+        with open(os.path.join(out_dir, "all.folded"), 'w', encoding='utf-8') as combined:
+            for group, stacks in sorted(groups.items()):
+                path = os.path.join(out_dir, re.sub(r"[^\w.-]", "_", group) + ".folded")
+                with open(path, 'w', encoding='utf-8') as f:
+                    for stack, n in sorted(stacks):
+                        f.write(f"{stack} {n}\n")
+                        combined.write(f"{group};{stack} {n}\n")
+                paths.append(path)
+        paths.append(os.path.join(out_dir, "all.folded"))
+        return paths
+
+
+class MonitorProfiles:
+    """cProfile per monitor thread: wrap each target, then dump them all at shutdown."""
+
+    def __init__(self):
+        self.profiles = {}    # monitor name → Profile
+
+    def wrap(self, name: str, target):
+        def profiled():
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            run = resolve_target(target)
+            # A restarted monitor keeps adding to the same profile.
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Python 3.12+ allows one active cProfile per process; use --profile sample there.
+                log_event("PROFILE_ERROR", f"{name} runs unprofiled: {e}")
+                return run()
+            try:
+                return run()
+            finally:
+                profile.disable()
+        return profiled
+
+    def write(self, out_dir: str) -> list:
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for name, profile in self.profiles.items():
+            path = os.path.join(out_dir, f"{name}.pstats")
+            try:
+                profile.dump_stats(path)
+                paths.append(path)
+            except Exception as e:
+                log_event("PROFILE_ERROR", f"Could not write {path}: {e}")
+        return paths
+
+
+def profile_dir(root: str = None) -> str:
+    root = root or os.path.join(os.path.dirname(__file__), '..', 'logs', 'profile')
+    return os.path.join(root, time.strftime("%Y%m%d-%H%M%S"))
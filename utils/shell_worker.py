@@ -0,0 +1,137 @@
+import itertools
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+from utils.logger import log_event
+
+REQUEST_TIMEOUT = 15.0
+RESTART_BACKOFF = 5.0    # minimum seconds between two starts of the worker process
+
+# Reads one JSON request per line: {"id": n, "queries": {name: command}}, runs every
+# command and answers with one line: {"id": n, "results": {name: {"ok", "value"|"error"}}}.
+POWERSHELL_LOOP = r"""
+$ErrorActionPreference = 'Stop'
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    $req = $line | ConvertFrom-Json
+    $results = @{}
+    foreach ($q in $req.queries.PSObject.Properties) {
+        try { $results[$q.Name] = @{ ok = $true; value = (Invoke-Expression $q.Value) } }
+        catch { $results[$q.Name] = @{ ok = $false; error = $_.Exception.Message } }
+    }
+    [Console]::Out.WriteLine((@{ id = $req.id; results = $results } | ConvertTo-Json -Compress -Depth 6))
+    [Console]::Out.Flush()
+}
+"""
+POWERSHELL_ARGV = ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive",
+                   "-ExecutionPolicy", "Bypass", "-Command", POWERSHELL_LOOP]
+
+
+class ShellWorkerError(Exception):
+    pass
+
+
+class ShellWorker:
+    """
+    One long-lived shell process answering batched queries over a JSON line
+    protocol (see POWERSHELL_LOOP). Any program that speaks the protocol can
+    stand in for PowerShell. The process is started on first use and
+    restarted after it dies or stops answering.
+    """
+
+    def __init__(self, argv: list = None, request_timeout: float = REQUEST_TIMEOUT):
+        self.argv = argv or POWERSHELL_ARGV
+        self.request_timeout = request_timeout
+        self._proc = None
+        self._lines = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._last_start = 0.0
+        self.starts = 0
+        self.requests = 0
+
+    def _start(self):
+        wait = RESTART_BACKOFF - (time.monotonic() - self._last_start)
+        if self.starts and wait > 0:
+            time.sleep(wait)
+        self._last_start = time.monotonic()
+        flags = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
+        self._proc = subprocess.Popen(self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True, encoding="utf-8",
+                                      bufsize=1, creationflags=flags)
+        self._lines = queue.SimpleQueue()
+        threading.Thread(target=self._read_loop, args=(self._proc, self._lines),
+                         name="shell-worker-reader", daemon=True).start()
+        self.starts += 1
+        if self.starts > 1:
+            log_event("SHELL_WORKER_RESTART", f"Restarted {self.argv[0]} worker (start #{self.starts})")
+
+    @staticmethod
+    def _read_loop(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def query(self, queries: dict) -> dict:
+        """
+        Runs every {name: command} in one round-trip. Returns {name: value};
+        a failed command maps to a ShellWorkerError instance.
+        """
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._start()
+            request_id = next(self._ids)
+            try:
+                self._proc.stdin.write(json.dumps({"id": request_id, "queries": queries}) + "\n")
+                self._proc.stdin.flush()
+                response = self._read_response(request_id)
+            except (OSError, ValueError, ShellWorkerError) as e:
+                self._kill()
+                raise ShellWorkerError(f"{self.argv[0]} worker failed: {e}") from e
+            self.requests += 1
+        results = {}
+        for name, result in response.get("results", {}).items():
+            results[name] = result.get("value") if result.get("ok") else ShellWorkerError(result.get("error"))
+        return results
+
+    def _read_response(self, request_id: int) -> dict:
+        deadline = time.monotonic() + self.request_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ShellWorkerError("timed out")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                raise ShellWorkerError("timed out")
+            if line is None:
+                raise ShellWorkerError("exited")
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue    # stray output from a query
+            # Answers to requests that already timed out are skipped.
+            if isinstance(response, dict) and response.get("id") == request_id:
+                return response
+
+    def _kill(self):
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+            except OSError:
+                pass
+            self._proc = None
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=2)
+                except Exception:
+                    pass
+            self._kill()
@@ -0,0 +1,212 @@
+"""
+Per-event span tracing. A trace follows one event from intake to verdict:
+it is started where the event enters (or is taken off its queue), rides
+along through event queues and scheduler jobs, and code on the way records
+spans with `with span("name"):`. Finished traces that are sampled (or
+slower than the threshold) are appended to logs/traces.jsonl.
+
+    GUARDRAIL_TRACE_SAMPLE=0.05    trace 5% of events
+    GUARDRAIL_TRACE_SLOW=2         also dump any event that took over 2 s (traces every event)
+
+    python -m utils.tracing top logs/traces.jsonl
+    python -m utils.tracing chrome logs/traces.jsonl trace.json    # chrome://tracing, Perfetto
+"""
+import argparse
+import contextvars
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from utils.logger import log_line
+
+TRACE_PATH = os.environ.get("GUARDRAIL_TRACE_PATH",
+                            os.path.join(os.path.dirname(__file__), '..', 'logs', 'traces.jsonl'))
+SAMPLE_RATE = float(os.environ.get("GUARDRAIL_TRACE_SAMPLE", "0"))
+SLOW_THRESHOLD = float(os.environ.get("GUARDRAIL_TRACE_SLOW", "0"))
+
+_current = contextvars.ContextVar("guardrail_trace", default=None)
+_ids = itertools.count(1)
+
+
+class Trace:
+    __slots__ = ("id", "name", "attrs", "wall", "started", "spans", "sampled", "finished")
+
+    def __init__(self, name: str, attrs: dict, sampled: bool, age: float = 0.0):
+        self.id = f"{os.getpid():x}-{next(_ids):x}"
+        self.name = name
+        self.attrs = attrs
+        self.wall = time.time() - age
+        self.started = time.perf_counter() - age
+        self.spans = []     # (name, thread, start, end); list.append is safe across threads
+        self.sampled = sampled
+        self.finished = False
+
+    def add(self, name: str, start: float, end: float):
+        """Records a span measured elsewhere (perf_counter times)."""
+        self.spans.append((name, threading.current_thread().name, start, end))
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        duration = time.perf_counter() - self.started
+        if not self.sampled and not (SLOW_THRESHOLD and duration >= SLOW_THRESHOLD):
+            return
+        log_line(TRACE_PATH, json.dumps(self.to_dict(duration)))
+
+    def to_dict(self, duration: float = None) -> dict:
+        if duration is None:
+            duration = time.perf_counter() - self.started
+        return {
+            "trace_id": self.id, "name": self.name, "attrs": self.attrs, "start": self.wall,
+            "duration_ms": round(duration * 1000, 3),
+            "spans": [{"name": name, "thread": thread, "offset_ms": round((start - self.started) * 1000, 3),
+                       "duration_ms": round((end - start) * 1000, 3)}
+                      for name, thread, start, end in sorted(list(self.spans), key=lambda s: s[2])],
+        }
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_start")
+
+    def __init__(self, trace, name):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._trace.add(self._name, self._start, time.perf_counter())
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def start_trace(name: str, age: float = 0.0, **attrs):
+    """A new Trace for an event that began `age` seconds ago, or None when it isn't traced."""
+    if SLOW_THRESHOLD:
+        return Trace(name, attrs, SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE, age)
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return Trace(name, attrs, True, age)
+    return None
+
+
+def current():
+    return _current.get()
+
+
+def span(name: str):
+    """Times a block into the current trace; a no-op when there is none."""
+    trace = _current.get()
+    return _Span(trace, name) if trace is not None else _NO_SPAN
+
+
+class activate:
+    """Makes `trace` (may be None) current for the block; finishes it afterwards if `finish`."""
+    __slots__ = ("_trace", "_finish", "_token")
+
+    def __init__(self, trace, finish: bool = False):
+        self._trace = trace
+        self._finish = finish
+
+    def __enter__(self):
+        self._token = _current.set(self._trace)
+        return self._trace
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        if self._finish and self._trace is not None:
+            self._trace.finish()
+
+
+def traced(name: str, **attrs) -> activate:
+    """Starts, activates and finally finishes a trace around a synchronous event."""
+    return activate(start_trace(name, **attrs), finish=True)
+
+
+def propagate(fn, wait_span: str = None):
+    """
+    Wraps `fn` to run under the caller's trace on whichever thread picks it
+    up, recording the time until it starts as `wait_span`.
+    """
+    trace = _current.get()
+    if trace is None:
+        return fn
+    queued = time.perf_counter()
+
+    def run(*args, **kwargs):
+        if wait_span:
+            trace.add(wait_span, queued, time.perf_counter())
+        token = _current.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+def read_traces(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def to_chrome(traces) -> dict:
+    """Chrome trace-event format: one process per trace, one track per thread."""
+    events = []
+    for pid, trace in enumerate(traces, 1):
+        base = trace["start"] * 1e6
+        events.append({"ph": "M", "pid": pid, "name": "process_name",
+                       "args": {"name": f"{trace['name']} {trace['trace_id']} {trace.get('attrs', {})}"}})
+        events.append({"ph": "X", "pid": pid, "tid": "event", "name": trace["name"], "ts": base,
+                       "dur": trace["duration_ms"] * 1000})
+        for s in trace["spans"]:
+            events.append({"ph": "X", "pid": pid, "tid": s["thread"], "name": s["name"],
+                           "ts": base + s["offset_ms"] * 1000, "dur": s["duration_ms"] * 1000})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m utils.tracing")
+    sub = ap.add_subparsers(dest="command", required=True)
+    top = sub.add_parser("top", help="slowest traces with their span breakdown")
+    top.add_argument("path", nargs="?", default=TRACE_PATH)
+    top.add_argument("-n", type=int, default=10)
+    chrome = sub.add_parser("chrome", help="convert to Chrome trace-event JSON")
+    chrome.add_argument("path")
+    chrome.add_argument("out")
+    args = ap.parse_args(argv)
+
+    traces = list(read_traces(args.path))
+    if args.command == "chrome":
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(to_chrome(traces), f)
+        print(f"{len(traces)} traces written to {args.out}")
+        return 0
+    for trace in sorted(traces, key=lambda t: -t["duration_ms"])[:args.n]:
+        print(f"{trace['duration_ms']:10.1f} ms  {trace['name']} {trace['trace_id']} {trace.get('attrs', {})}")
+        for s in trace["spans"]:
+            print(f"    +{s['offset_ms']:9.1f} ms {s['duration_ms']:9.1f} ms  {s['name']}  [{s['thread']}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
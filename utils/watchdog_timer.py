@@ -1,27 +1,175 @@
+import importlib
+import multiprocessing
+import os
+import sys
 import threading
 import time
+import psutil
+from ai.scheduler import MAX_IN_FLIGHT, scheduler
+from utils.logger import log_event, flush as log_flush, writer as log_writer
+from utils.metrics import metrics
+
+# "thread" runs every monitor in this interpreter; "process" gives each
+# isolated monitor its own interpreter (and GIL), supervised from here.
+# A child process has its own verdict/hash caches (merged into the shared
+# files on save) and its own InferenceScheduler. The schedulers share one
+# semaphore, so MAX_IN_FLIGHT holds across all processes; the
+# interactive-first ordering holds within each. Children's metrics are
+# served by the parent with a process="<monitor>" label.
+ISOLATION = os.environ.get("GUARDRAIL_ISOLATION", "thread")
+# Isolated monitors run below normal priority so the process holding the keyboard hook wins the CPU.
+CHILD_PRIORITY = psutil.BELOW_NORMAL_PRIORITY_CLASS if sys.platform == "win32" else 10
+# Seconds a child gets to save its caches and exit after stop() before it is terminated.
+STOP_TIMEOUT = 5.0
+# Seconds between a child's metrics exports to the parent.
+METRICS_INTERVAL = 5.0
+
+# Spawn, as on Windows, everywhere: forking a process full of threads is unsafe.
+_mp = multiprocessing.get_context("spawn")
+
+
+def resolve_target(target):
+    """
+    Monitors can be registered as "package.module:function" and are only
+    imported when they first start, on their own thread or in their own process.
+    """
+    if not isinstance(target, str):
+        return target
+    module, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module), attr or "start_monitor")
+
+
+def _child_main(name: str, target: callable, log_queue, stop, slots, metrics_queue):
+    """
+    Entry point of a monitor's process: its log lines and metrics go to the
+    parent, and its model requests take slots from the shared `slots`. The
+    monitor runs on a daemon thread while the main thread waits for it to
+    end or for `stop`, then exits normally so atexit handlers (cache and
+    baseline saves) run.
+    """
+    log_writer.forward(log_queue.put)
+    scheduler.share_slots(slots)
+    try:
+        psutil.Process().nice(CHILD_PRIORITY)
+    except Exception as e:
+        log_event("MONITOR_PRIORITY_ERROR", f"{name}: {e}")
+    result = {"code": 0}
+
+    def run():
+        try:
+            resolve_target(target)()
+            log_event("MONITOR_EXIT", f"{name} returned")
+        except Exception as e:
+            log_event("MONITOR_CRASH", f"{name}: {e}")
+            result["code"] = 1
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    exported = time.monotonic()
+    try:
+        while thread.is_alive() and not stop.wait(0.5):
+            if time.monotonic() - exported >= METRICS_INTERVAL:
+                metrics_queue.put((name, metrics.export()))
+                exported = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    # Requests still running die with this process; their slots must not.
+    scheduler.release_slots()
+    metrics_queue.put((name, metrics.export()))
+    log_flush()
+    sys.exit(result["code"])
+
 
 class Watchdog:
-    def __init__(self):
-        self.monitors = []  # List of tuples: (name:str, target_func:callable)
+    def __init__(self, isolation: str = ISOLATION):
+        if isolation not in ("thread", "process"):
+            raise ValueError(f"isolation must be 'thread' or 'process', not {isolation!r}")
+        self.isolation = isolation
+        self.monitors = []  # List of tuples: (name:str, target_func:callable, isolate:bool)
         self.threads = {}   # name → Thread object
+        self.processes = {} # name → Process, for isolated monitors
+        self._log_queue = None
+        self._metrics_queue = None
+        self._slots = None
+        self._stop_children = None
         self._lock = threading.Lock()
         self._running = False
 
-    def register(self, name: str, target: callable):
-        self.monitors.append((name, target))
+    def register(self, name: str, target: callable, isolate: bool = True):
+        """
+        `target` is a callable or a "module:function" string (see resolve_target).
+        In process mode a monitor registered with isolate=True runs in its own
+        process; `target` must then be a string or a module-level function so
+        it can be handed to the child.
+        """
+        self.monitors.append((name, target, isolate and self.isolation == "process"))
 
-    def _start_thread(self, name: str, target: callable):
-        thread = threading.Thread(target=self._monitor_wrapper, args=(name, target), daemon=True)
+    def _start_thread(self, name: str, target: callable, isolated: bool = False):
+        run = self._run_process if isolated else self._run_thread
+        thread = threading.Thread(target=self._monitor_wrapper, args=(name, target, run), name=name, daemon=True)
         self.threads[name] = thread
         thread.start()
 
-    def _monitor_wrapper(self, name: str, target: callable):
-        while self._running:
+    def _run_thread(self, name: str, target: callable) -> bool:
+        """Runs the monitor in this thread; True if it crashed."""
+        try:
+            resolve_target(target)()
+            # If target returns (i.e. exits), we log and restart
+            log_event("MONITOR_EXIT", f"{name} returned")
+        except Exception as e:
+            log_event("MONITOR_CRASH", f"{name}: {e}")
+            return True
+        return False
+
+    def _run_process(self, name: str, target: callable) -> bool:
+        """Runs the monitor in a child process and waits for it; True if it crashed."""
+        proc = _mp.Process(target=_child_main, args=(name, target, self._log_queue, self._stop_children,
+                                                     self._slots, self._metrics_queue),
+                           name=name, daemon=True)
+        proc.start()
+        self.processes[name] = proc
+        log_event("MONITOR_PROCESS", f"{name} running as PID {proc.pid}")
+        proc.join()
+        if not self._running or proc.exitcode == 0:
+            return False
+        # Exit code 1 is an exception the child has already logged.
+        if proc.exitcode != 1:
+            log_event("MONITOR_CRASH", f"{name}: process exited with code {proc.exitcode}")
+        return True
+
+    def _forward_logs(self):
+        while True:
+            try:
+                log_writer.write_batch(self._log_queue.get())
+            except Exception as e:
+                log_event("LOG_FORWARD_ERROR", str(e))
+
+    def _forward_metrics(self):
+        while True:
             try:
-                target()
-                # If target returns (i.e. exits), we log and restart
+                metrics.add_remote(*self._metrics_queue.get())
             except Exception as e:
+                log_event("METRICS_FORWARD_ERROR", str(e))
+
+    def _monitor_wrapper(self, name: str, target: callable, run=None):
+        run = run or self._run_thread
+        up = metrics.gauge("guardrail_monitor_up", monitor=name)
+        starts = metrics.counter("guardrail_monitor_starts_total", monitor=name)
+        crashes = metrics.counter("guardrail_monitor_crashes_total", monitor=name)
+        uptime = metrics.histogram("guardrail_monitor_run_seconds", monitor=name)
+        while self._running:
+            starts.inc()
+            if starts.value > 1:
+                log_event("MONITOR_RESTART", f"{name}: restart #{starts.value - 1}")
+            up.set(1)
+            started = time.perf_counter()
+            crashed = run(name, target)
+            if crashed:
+                crashes.inc()
+            up.set(0)
+            # Short runs in this histogram mean the monitor is restart-looping.
+            uptime.observe(time.perf_counter() - started)
+            if crashed:
                 # Swallow exception, but sleep briefly before restart
                 time.sleep(1)
             # If it naturally exits, restart after a short delay
@@ -29,9 +177,29 @@ class Watchdog:
 
     def start(self):
         self._running = True
-        for name, target in self.monitors:
-            self._start_thread(name, target)
+        if any(isolated for _, _, isolated in self.monitors) and self._log_queue is None:
+            self._log_queue = _mp.Queue()
+            self._metrics_queue = _mp.Queue()
+            self._stop_children = _mp.Event()
+            # Every process's model requests take a slot from this one semaphore.
+            self._slots = _mp.BoundedSemaphore(max(1, MAX_IN_FLIGHT))
+            scheduler.share_slots(self._slots)
+            threading.Thread(target=self._forward_logs, name="log-forward", daemon=True).start()
+            threading.Thread(target=self._forward_metrics, name="metrics-forward", daemon=True).start()
+        for name, target, isolated in self.monitors:
+            self._start_thread(name, target, isolated)
 
     def stop(self):
         self._running = False
-        # Threads are daemonized; they’ll exit on process end.
+        # Threads are daemonized; they’ll exit on process end. Child processes
+        # are asked to exit (saving their caches) and terminated if they don't.
+        if self._stop_children is not None:
+            self._stop_children.set()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for proc in self.processes.values():
+            proc.join(timeout=max(0.0, deadline - time.monotonic()))
+        for proc in self.processes.values():
+            if proc.is_alive():
+                log_event("MONITOR_STOP_TIMEOUT", f"{proc.name} did not exit; terminating")
+                proc.terminate()
+                proc.join(timeout=2)